@@ -0,0 +1,118 @@
+import os
+import sys
+import json
+import time
+import resource
+import argparse
+import tempfile
+
+from brain.chunking import iter_chunks
+
+# Benchmark results are written with the other iteration outputs
+output_dir = os.path.join(os.path.dirname(__file__), '../iteration/output_files')
+
+# Source line repeated to build the input; includes multi-byte characters so chunk ends land inside them
+sample_line = "def example_function(x, y):  # naïve café ✓ 🐼\n    return x + y\n"
+
+def current_rss_mb():
+    """
+    Get the resident set size of this process in MB (Linux only).
+
+    Returns:
+        float: Current RSS in MB, or None where /proc is not available.
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        return None
+
+def peak_rss_mb():
+    """
+    Get the peak resident set size of this process in MB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def write_input_file(path, size_mb):
+    """
+    Write a generated source file of about size_mb megabytes.
+
+    Parameters:
+        path (str): Path of the file to write.
+        size_mb (int): Target size in MB.
+    """
+    block = sample_line * (1024 * 1024 // len(sample_line.encode('utf-8')))
+    with open(path, 'w', encoding='utf-8') as f:
+        for _ in range(size_mb):
+            f.write(block)
+
+def run_benchmark(input_path, chunk_size=5000, sample_every=10000):
+    """
+    Stream a file through the chunker and sample RSS along the way.
+
+    Parameters:
+        input_path (str): The file to chunk.
+        chunk_size (int): Chunk size in bytes.
+        sample_every (int): Number of chunks between RSS samples.
+
+    Returns:
+        dict: File size, chunk count, throughput and RSS before, during and after.
+    """
+    rss_before = current_rss_mb()
+    samples = []
+    chunks = 0
+    characters = 0
+    start_time = time.perf_counter()
+    for reference, content in iter_chunks(input_path, chunk_size):
+        chunks += 1
+        characters += len(content)
+        if chunks % sample_every == 0:
+            samples.append(current_rss_mb())
+    elapsed = time.perf_counter() - start_time
+    size_mb = os.path.getsize(input_path) / (1024 * 1024)
+    measured = [sample for sample in samples if sample is not None]
+    return {
+        "input_mb": size_mb,
+        "chunk_size": chunk_size,
+        "chunks": chunks,
+        "characters": characters,
+        "seconds": elapsed,
+        "mb_per_second": size_mb / elapsed if elapsed > 0 else 0.0,
+        "rss_before_mb": rss_before,
+        "rss_min_during_mb": min(measured) if measured else None,
+        "rss_max_during_mb": max(measured) if measured else None,
+        "rss_after_mb": current_rss_mb(),
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show that chunking a huge file keeps memory use flat.")
+    parser.add_argument('--input', help="File to chunk; by default a generated file is used and removed afterwards")
+    parser.add_argument('--size-mb', type=int, default=2048, help="Size of the generated file")
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    temp_dir = None
+    input_path = args.input
+    if input_path is None:
+        temp_dir = tempfile.TemporaryDirectory()
+        input_path = os.path.join(temp_dir.name, 'generated.py')
+        print(f"Generating {args.size_mb} MB input file...")
+        write_input_file(input_path, args.size_mb)
+    try:
+        results = run_benchmark(input_path, args.chunk_size)
+    finally:
+        if temp_dir is not None:
+            temp_dir.cleanup()
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_file = os.path.join(output_dir, "chunking_benchmark.json")
+    with open(output_file, 'w') as f:
+        json.dump(results, f, indent=4)
+    print(f"Chunked {results['input_mb']:.0f} MB into {results['chunks']} chunks "
+          f"in {results['seconds']:.1f}s ({results['mb_per_second']:.0f} MB/s)")
+    print(f"RSS before: {results['rss_before_mb']:.1f} MB, during: {results['rss_min_during_mb']:.1f}-"
+          f"{results['rss_max_during_mb']:.1f} MB, peak: {results['peak_rss_mb']:.1f} MB")
+    print(f"Benchmark results saved to {output_file}")
@@ -0,0 +1,263 @@
+import os
+import mmap
+import zlib
+import hashlib
+from collections import namedtuple
+
+# A chunk of a file, identified by position instead of by a copy of its content
+ChunkRef = namedtuple('ChunkRef', ['path', 'offset', 'length', 'hash'])
+
+# Directory to write chunk contents to for debugging; chunks are only kept in memory when unset
+materialize_chunks_dir = os.getenv('GPT_CHUNK_DIR')
+
+# About one in this many top-level lines ends a block chunk, chosen by the line's content
+boundary_modulus = 4
+
+# Lines starting with these bytes continue a statement or comment instead of starting one
+_continuation_starts = b" \t\r\n#)]}'\""
+
+# Definitions inside a class body that may also start a block chunk
+_method_starts = (b"    def ", b"    async def ", b"    class ", b"    @")
+
+def _utf8_boundary(view, end):
+    """
+    Move a chunk end back to the start of the UTF-8 character it would split.
+    """
+    start = end
+    # Continuation bytes look like 0b10xxxxxx; a character has at most three of them
+    while start > end - 3 and (view[start] & 0xC0) == 0x80:
+        start -= 1
+    return start
+
+def _fill(f, buffer, filled, target):
+    """
+    Read from f into buffer until it holds target bytes or the file ends.
+    Streams without readinto, such as some WSGI inputs, are read with read.
+    """
+    readinto = getattr(f, 'readinto', None)
+    while filled < target:
+        if readinto is not None:
+            read = readinto(buffer[filled:target])
+        else:
+            data = f.read(target - filled)
+            read = len(data)
+            buffer[filled:filled + read] = data
+        if not read:
+            break
+        filled += read
+    return filled
+
+def _iter_stream_views(f, chunk_size):
+    """
+    Stream a binary file object as (offset, memoryview) chunks of at most
+    chunk_size bytes through a single reused buffer, so memory use does not
+    depend on the input size. A view is only valid until the next chunk is
+    produced.
+    """
+    # One extra byte shows whether the next chunk starts inside a character
+    buffer = memoryview(bytearray(chunk_size + 1))
+    offset = 0
+    filled = 0
+    while True:
+        filled = _fill(f, buffer, filled, chunk_size + 1)
+        if filled == 0:
+            break
+        end = filled
+        if filled > chunk_size:
+            end = _utf8_boundary(buffer, chunk_size) or chunk_size
+        yield offset, buffer[:end]
+        remainder = filled - end
+        buffer[:remainder] = bytes(buffer[end:filled])
+        offset += end
+        filled = remainder
+
+def _iter_chunk_views(file_path, chunk_size):
+    """
+    Stream a file as (offset, memoryview) chunks; see _iter_stream_views.
+    """
+    with open(file_path, 'rb', buffering=0) as f:
+        yield from _iter_stream_views(f, chunk_size)
+
+def chunk_references(file_path, chunk_size=5000):
+    """
+    Split a file into chunk references of at most chunk_size bytes. Chunk
+    boundaries never split a UTF-8 character, so every chunk decodes on its own.
+    The file is streamed, so files of any size are split in constant memory.
+
+    Parameters:
+        file_path (str): Path to the file.
+        chunk_size (int): Maximum size of each chunk in bytes.
+
+    Yields:
+        ChunkRef: Reference to each chunk, in file order.
+    """
+    for offset, view in _iter_chunk_views(file_path, chunk_size):
+        yield ChunkRef(file_path, offset, len(view), hashlib.sha256(view).hexdigest())
+
+def iter_chunks(file_path, chunk_size=5000):
+    """
+    Stream a file as chunks of at most chunk_size bytes together with their
+    references, reading the file once in constant memory.
+
+    Parameters:
+        file_path (str): Path to the file.
+        chunk_size (int): Maximum size of each chunk in bytes.
+
+    Yields:
+        tuple: (ChunkRef, str) for each chunk, in file order.
+    """
+    for offset, view in _iter_chunk_views(file_path, chunk_size):
+        reference = ChunkRef(file_path, offset, len(view), hashlib.sha256(view).hexdigest())
+        yield reference, str(view, 'utf-8', errors='replace')
+
+def iter_stream_chunks(stream, name, chunk_size=5000):
+    """
+    Chunk a binary stream, such as an upload, while it is being read. Chunks
+    are produced as soon as enough bytes have arrived, and their references
+    name the stream instead of a file on disk.
+
+    Parameters:
+        stream (file-like): Binary stream with readinto or read.
+        name (str): Name of the content, used as the path of the references.
+        chunk_size (int): Maximum size of each chunk in bytes.
+
+    Yields:
+        tuple: (ChunkRef, str) for each chunk, in stream order.
+    """
+    for offset, view in _iter_stream_views(stream, chunk_size):
+        reference = ChunkRef(name, offset, len(view), hashlib.sha256(view).hexdigest())
+        yield reference, str(view, 'utf-8', errors='replace')
+
+def _is_block_boundary(line, previous_line):
+    """
+    Whether a block chunk may end before line: it must start a top-level
+    statement or a method, not be decorated by the previous line, and its
+    hash must select it. Selecting by content rather than by position keeps boundaries
+    in place when code before them grows or shrinks.
+    """
+    starts_block = line[:1] not in _continuation_starts or line.startswith(_method_starts)
+    return (starts_block and not previous_line.lstrip(b" ").startswith(b"@")
+            and zlib.crc32(line) % boundary_modulus == 0)
+
+def iter_block_chunks(file_path, chunk_size=5000):
+    """
+    Stream a file as chunks of at most chunk_size bytes that end before
+    top-level statements or methods. Unlike fixed-size chunks, an edit only changes the
+    chunk it is in (and at most the chunks up to the next boundary when it
+    grows a chunk past chunk_size), so the other chunks keep their hashes and
+    their cached summaries stay valid. Lines longer than chunk_size are split
+    like fixed-size chunks. Lines are read at most chunk_size bytes at a
+    time, so memory use is bounded by chunk_size, not by the longest line.
+
+    Parameters:
+        file_path (str): Path to the file.
+        chunk_size (int): Maximum size of each chunk in bytes.
+
+    Yields:
+        tuple: (ChunkRef, str) for each chunk, in file order.
+    """
+    # Chunks are at least this large unless a line would overflow them
+    min_size = chunk_size // 4
+    offset = 0
+    buffer = bytearray()
+    previous_line = b""
+
+    def chunk(data):
+        reference = ChunkRef(file_path, offset, len(data), hashlib.sha256(data).hexdigest())
+        return reference, str(data, 'utf-8', errors='replace')
+
+    with open(file_path, 'rb') as f:
+        line_start = True
+        while True:
+            # Long lines are read in pieces, so they never sit in memory whole
+            line = f.readline(chunk_size)
+            if not line:
+                break
+            if buffer and line_start and (len(buffer) + len(line) > chunk_size
+                                          or (len(buffer) >= min_size and _is_block_boundary(line, previous_line))):
+                yield chunk(bytes(buffer))
+                offset += len(buffer)
+                buffer.clear()
+            buffer += line
+            if line_start:
+                previous_line = line
+            line_start = line.endswith(b"\n")
+            while len(buffer) > chunk_size:
+                end = _utf8_boundary(buffer, chunk_size) or chunk_size
+                yield chunk(bytes(buffer[:end]))
+                offset += end
+                del buffer[:end]
+    if buffer:
+        yield chunk(bytes(buffer))
+
+def chunk_file(file_path, chunk_size=5000):
+    """
+    Chunk a file into smaller parts without reading it into memory at once.
+    
+    Parameters:
+        file_path (str): Path to the file.
+        chunk_size (int): Maximum size of each chunk in UTF-8 bytes.
+
+    Yields:
+        str: Chunk of file content.
+    """
+    for offset, view in _iter_chunk_views(file_path, chunk_size):
+        yield str(view, 'utf-8', errors='replace')
+
+def read_chunk(reference):
+    """
+    Read the content of a chunk by mapping only its part of the file.
+
+    Parameters:
+        reference (ChunkRef): The chunk to read.
+
+    Returns:
+        str: The chunk content.
+    """
+    if reference.length == 0:
+        return ""
+    # Mappings must start at a multiple of the allocation granularity
+    start = reference.offset - reference.offset % mmap.ALLOCATIONGRANULARITY
+    with open(reference.path, 'rb') as f, \
+            mmap.mmap(f.fileno(), reference.offset - start + reference.length, access=mmap.ACCESS_READ, offset=start) as mapped:
+        view = memoryview(mapped)
+        try:
+            return str(view[reference.offset - start:], 'utf-8', errors='replace')
+        finally:
+            view.release()
+
+def chunk_label(reference):
+    """
+    Name a chunk by reference for logs and reports, e.g. "src/big.py@5000+4998".
+
+    Parameters:
+        reference (ChunkRef): The chunk to name.
+
+    Returns:
+        str: Label of the chunk.
+    """
+    return f"{reference.path}@{reference.offset}+{reference.length}"
+
+def materialize_chunk(reference, content, directory=None):
+    """
+    Write a chunk's content to disk for debugging, when enabled with
+    GPT_CHUNK_DIR or an explicit directory. File names include a hash of the
+    source path, so chunks of files with the same name do not collide.
+
+    Parameters:
+        reference (ChunkRef): The chunk to write.
+        content (str): The chunk content.
+        directory (str): Directory to write to. Defaults to GPT_CHUNK_DIR.
+
+    Returns:
+        str: Path of the written chunk file, or None if materialization is disabled.
+    """
+    directory = directory or materialize_chunks_dir
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    path_hash = hashlib.sha256(os.path.abspath(reference.path).encode('utf-8')).hexdigest()[:12]
+    chunk_path = os.path.join(directory, f"{os.path.basename(reference.path)}.{path_hash}.{reference.offset}.chunk")
+    with open(chunk_path, 'w') as chunk_output:
+        chunk_output.write(content)
+    return chunk_path
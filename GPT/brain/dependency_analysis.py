@@ -1,8 +1,24 @@
 import os
-import subprocess
 import re
+import ast
+import json
+import hashlib
+import pkgutil
+import sysconfig
+import subprocess
 import sys
+import time
 import logging
+import threading
+import importlib.util
+import importlib.metadata
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -13,6 +29,35 @@ os.makedirs(output_dir, exist_ok=True)
 training_data_dir = os.path.join(os.path.dirname(__file__), '../models/Veronica/training_data')
 os.makedirs(training_data_dir, exist_ok=True)
 
+# Per-file import cache keyed by content hash, so repeat analysis only parses changed files.
+# Entries also record the file's size and mtime, so unchanged files are not even read.
+import_cache_path = os.path.join(output_dir, "import_cache.json")
+import_cache = None
+import_cache_lock = threading.Lock()
+
+# Files modified this recently may change again within the same mtime tick, so their mtime is not trusted
+racy_mtime_seconds = 2
+
+# Dependencies per root directory; an index younger than this many seconds is served without checking the files
+dependency_index_max_age = float(os.getenv('GPT_DEPENDENCY_MAX_AGE', '0'))
+dependency_indexes = {}
+
+# Below this many changed files, parsing in-process is faster than starting a pool
+parallel_parse_threshold = 32
+
+# Directories under the project root that never hold project modules
+local_module_excluded_directories = {'venv', 'site-packages', '__pycache__', 'node_modules'}
+
+# Import names whose distribution on PyPI is named differently
+import_name_aliases = {
+    "bs4": "beautifulsoup4",
+    "cv2": "opencv-python",
+    "dotenv": "python-dotenv",
+    "PIL": "Pillow",
+    "sklearn": "scikit-learn",
+    "yaml": "PyYAML",
+}
+
 
 def list_files_and_directories(root_directory):
     """
@@ -41,10 +86,67 @@ def list_files_and_directories(root_directory):
 
     return files_and_dirs
 
+def _record_import(details, names, conditional):
+    """
+    Record imported module names under the absolute or relative imports of a file.
+    """
+    for name in names:
+        if name.startswith('.'):
+            details["relative"].add(name)
+            continue
+        top_level = name.split('.')[0]
+        details["imports"].add(name)
+        details["modules"].add(top_level)
+        details["conditional" if conditional else "unconditional"].add(top_level)
+
+def _visit_imports(node, details, conditional):
+    """
+    Walk the syntax tree and record its imports. Imports that are not statements
+    of the module body (inside if/try/with blocks, loops, functions or classes)
+    only run conditionally.
+    """
+    for child in ast.iter_child_nodes(node):
+        if isinstance(child, ast.Import):
+            _record_import(details, [alias.name for alias in child.names], conditional)
+        elif isinstance(child, ast.ImportFrom):
+            module = '.' * child.level + (child.module or '')
+            # `from a import b` may import the submodule a.b, so the imported names are kept
+            names = [module] if child.module else []
+            names += [
+                f"{module}.{alias.name}" if child.module else f"{module}{alias.name}"
+                for alias in child.names if alias.name != '*'
+            ]
+            _record_import(details, names, conditional)
+        else:
+            _visit_imports(child, details, True)
+
+def parse_imports(source):
+    """
+    Parse Python source and extract its imports from the syntax tree.
+    Imports inside strings, comments and docstrings are ignored.
+
+    Parameters:
+        source (str or bytes): The content of the code file.
+
+    Returns:
+        dict: Sorted lists of top-level module names ("modules"), full dotted
+        names ("imports"), relative imports ("relative") and top-level names
+        that are only imported conditionally ("conditional"). Files that cannot
+        be parsed also have an "error".
+    """
+    details = {"modules": set(), "imports": set(), "relative": set(), "conditional": set(), "unconditional": set()}
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError) as e:
+        return {"modules": [], "imports": [], "relative": [], "conditional": [], "error": str(e)}
+    _visit_imports(tree, details, False)
+    details["conditional"] -= details.pop("unconditional")
+    return {key: sorted(values) for key, values in details.items()}
+
 def extract_imports(file_content):
     """
     Extract import statements from the given file content.
-    Returns a set of imported modules.
+    Returns a set of imported top-level modules.
 
     Parameters:
         file_content (str): The content of the code file.
@@ -52,33 +154,165 @@ def extract_imports(file_content):
     Returns:
         set: A set of imported modules or packages.
     """
-    imports = re.findall(r'^\s*import\s+(\S+)|^\s*from\s+(\S+)', file_content, re.MULTILINE)
-    return set(imp[0] or imp[1] for imp in imports)
+    return set(parse_imports(file_content)["modules"])
 
-def analyze_dependencies(root_directory):
+def load_import_cache():
     """
-    Analyze dependencies for all Python files in the root_directory.
-    Returns a set of all imported modules.
+    Load the per-file import cache from disk into memory, once per process.
+
+    Returns:
+        dict: File path to {"hash": content hash, "imports": parse_imports result}.
+    """
+    global import_cache
+    with import_cache_lock:
+        if import_cache is None:
+            import_cache = {}
+            if os.path.exists(import_cache_path):
+                try:
+                    with open(import_cache_path, 'r') as f:
+                        import_cache = json.load(f)
+                except (OSError, ValueError) as e:
+                    logging.warning(f"Ignoring unreadable import cache {import_cache_path}: {e}")
+        return import_cache
+
+def save_import_cache():
+    """
+    Merge the in-memory import cache into the one on disk and write it atomically.
+    A lock file serializes the read-merge-write across processes, so entries
+    written by another process in the meantime are kept. Entries for files that
+    no longer exist are dropped.
+    """
+    with import_cache_lock, open(f"{import_cache_path}.lock", 'w') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        merged = {}
+        if os.path.exists(import_cache_path):
+            try:
+                with open(import_cache_path, 'r') as f:
+                    merged = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Ignoring unreadable import cache {import_cache_path}: {e}")
+        merged.update(import_cache)
+        merged = {file_path: entry for file_path, entry in merged.items() if os.path.exists(file_path)}
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(import_cache_path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(merged, f)
+            os.replace(temp_path, import_cache_path)
+        except OSError as e:
+            logging.error(f"Error saving import cache {import_cache_path}: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        import_cache.clear()
+        import_cache.update(merged)
+
+def analyze_import_details(root_directory, max_workers=None):
+    """
+    Extract the imports of every Python file in the root_directory.
+    Files whose size and mtime match the cache are not read; files whose
+    content hash matches are not parsed again; the rest are parsed across a
+    process pool.
 
     Parameters:
         root_directory (str): The root directory to analyze for dependencies.
+        max_workers (int): Number of parser processes. Defaults to the CPU count.
 
     Returns:
-        set: A set of all imported modules or packages.
+        dict: File path to its parse_imports result.
     """
     files_and_dirs = list_files_and_directories(root_directory)
-    dependencies = set()
+    cache = load_import_cache()
+    results = {}
+    to_parse = []
+    restamped = {}
+    trusted_before = time.time_ns() - racy_mtime_seconds * 10**9
 
     for file in files_and_dirs["files"]:
+        if file["type"] != '.py':  # Only analyze Python files
+            continue
         file_path = file["path"]
-        if file["type"] == '.py':  # Only analyze Python files
-            with open(file_path, 'r') as f:
+        try:
+            stat = os.stat(file_path)
+        except OSError as e:
+            logging.error(f"Error reading file {file_path}: {e}")
+            continue
+        entry = cache.get(file_path)
+        if entry and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+            results[file_path] = entry["imports"]
+            continue
+        try:
+            with open(file_path, 'rb') as f:
                 content = f.read()
-                imports = extract_imports(content)
-                dependencies.update(imports)
+        except OSError as e:
+            logging.error(f"Error reading file {file_path}: {e}")
+            continue
+        content_hash = hashlib.sha256(content).hexdigest()
+        stamp = (stat.st_size, stat.st_mtime_ns if stat.st_mtime_ns < trusted_before else None)
+        if entry and entry["hash"] == content_hash:
+            results[file_path] = entry["imports"]
+            restamped[file_path] = stamp
+        else:
+            to_parse.append((file_path, content_hash, content, stamp))
+
+    if restamped:
+        with import_cache_lock:
+            for file_path, (size, mtime_ns) in restamped.items():
+                cache[file_path].update(size=size, mtime_ns=mtime_ns)
+
+    if to_parse:
+        contents = [content for _, _, content, _ in to_parse]
+        if len(to_parse) < parallel_parse_threshold:
+            parsed = [parse_imports(content) for content in contents]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                parsed = list(executor.map(parse_imports, contents, chunksize=16))
+        with import_cache_lock:
+            for (file_path, content_hash, _, (size, mtime_ns)), imports in zip(to_parse, parsed):
+                cache[file_path] = {"hash": content_hash, "size": size, "mtime_ns": mtime_ns, "imports": imports}
+                results[file_path] = imports
+        logging.info(f"Parsed {len(to_parse)} changed files, reused {len(results) - len(to_parse)} cached results.")
+    if to_parse or restamped:
+        save_import_cache()
 
+    return results
+
+def analyze_dependencies(root_directory):
+    """
+    Analyze dependencies for all Python files in the root_directory.
+    Returns a set of all imported top-level modules; relative imports are left out.
+
+    Parameters:
+        root_directory (str): The root directory to analyze for dependencies.
+
+    Returns:
+        set: A set of all imported modules or packages.
+    """
+    dependencies = set()
+    for imports in analyze_import_details(root_directory).values():
+        dependencies.update(imports["modules"])
     return dependencies
 
+def dependency_index(root_directory):
+    """
+    Get the dependencies of the root_directory with an ETag that changes only
+    when the dependencies do. Only files whose size or mtime changed since the
+    last call are read.
+
+    Parameters:
+        root_directory (str): The root directory to analyze for dependencies.
+
+    Returns:
+        tuple: (sorted list of dependencies, ETag string).
+    """
+    index = dependency_indexes.get(root_directory)
+    if index and time.monotonic() - index["checked_at"] < dependency_index_max_age:
+        return index["dependencies"], index["etag"]
+    dependencies = sorted(analyze_dependencies(root_directory))
+    etag = hashlib.sha256(json.dumps(dependencies).encode('utf-8')).hexdigest()[:32]
+    dependency_indexes[root_directory] = {"dependencies": dependencies, "etag": etag, "checked_at": time.monotonic()}
+    return dependencies, etag
+
 def update_requirements(dependencies, requirements_file="requirements.txt"):
     """
     Update the requirements.txt file with the given dependencies.
@@ -92,26 +326,150 @@ def update_requirements(dependencies, requirements_file="requirements.txt"):
         for dependency in dependencies:
             f.write(f"{dependency}\n")
 
+def get_stdlib_module_names():
+    """
+    Get the names of the standard library's top-level modules.
+
+    Returns:
+        set: Standard library module names.
+    """
+    if hasattr(sys, 'stdlib_module_names'):
+        return set(sys.stdlib_module_names)
+    # Python < 3.10: list the modules in the standard library directory
+    stdlib_path = sysconfig.get_paths()["stdlib"]
+    names = {module.name for module in pkgutil.iter_modules([stdlib_path])}
+    return names | set(sys.builtin_module_names)
+
+def get_packages_distributions():
+    """
+    Map top-level import names to the installed distributions providing them.
+
+    Returns:
+        dict: Import name to a list of distribution names.
+    """
+    if hasattr(importlib.metadata, 'packages_distributions'):
+        return importlib.metadata.packages_distributions()
+    # Python < 3.10: read top_level.txt from each installed distribution
+    mapping = {}
+    for distribution in importlib.metadata.distributions():
+        top_level = distribution.read_text('top_level.txt') or ''
+        for name in top_level.split():
+            mapping.setdefault(name, []).append(distribution.metadata['Name'])
+    return mapping
+
+def _is_environment_directory(path, name):
+    """
+    Tell whether a directory holds installed packages or tool state rather
+    than project code: virtual environments, site-packages and hidden directories.
+    """
+    return (name.startswith('.') or name in local_module_excluded_directories
+            or os.path.exists(os.path.join(path, name, 'pyvenv.cfg')))
+
+def get_local_module_names(root_directory):
+    """
+    Get the names that project-local imports can resolve to: the modules and
+    packages at the project root, including directories of Python files
+    without __init__.py, and every module and package below it, which
+    scripts run from their own directory import by name. Virtual
+    environments, site-packages and hidden directories are skipped.
+
+    Parameters:
+        root_directory (str): The root directory of the project.
+
+    Returns:
+        set: Module and package names defined in the project.
+    """
+    names = set()
+    if not root_directory:
+        return names
+    for root, dirs, files in os.walk(root_directory):
+        dirs[:] = [name for name in dirs if not _is_environment_directory(root, name)]
+        modules = [name[:-3] for name in files if name.endswith('.py')]
+        if not modules:
+            continue
+        names.update(module for module in modules if module != '__init__')
+        if '__init__' in modules:
+            names.add(os.path.basename(root))
+        top_level = os.path.relpath(root, root_directory).split(os.sep)[0]
+        if top_level != '.':
+            names.add(top_level)
+    return names
+
+def normalize_distribution_name(name):
+    """
+    Normalize a distribution name for comparison, as pip does (PEP 503).
+
+    Parameters:
+        name (str): Distribution name.
+
+    Returns:
+        str: Lowercase name with runs of -, _ and . replaced by -.
+    """
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+def resolve_dependencies(dependencies, root_directory=None):
+    """
+    Resolve import or distribution names against the installed distributions
+    in this process, without running pip.
+
+    Parameters:
+        dependencies (list): Requirement lines or import names.
+        root_directory (str): Project root whose modules are not dependencies.
+
+    Returns:
+        dict: Lists of "installed", "skipped" (standard library and project-local)
+        and "missing" requirements. Missing entries are ready to pass to pip.
+    """
+    stdlib_names = get_stdlib_module_names()
+    local_names = get_local_module_names(root_directory)
+    packages = get_packages_distributions()
+    installed_distributions = {
+        normalize_distribution_name(distribution.metadata['Name'])
+        for distribution in importlib.metadata.distributions()
+        if distribution.metadata['Name']
+    }
+
+    result = {"installed": [], "skipped": [], "missing": []}
+    for dependency in dependencies:
+        requirement = dependency.split('#')[0].strip()
+        if not requirement:
+            continue
+        name = re.split(r'[\s\[<>=!~;]', requirement, maxsplit=1)[0]
+        top_level = name.split('.')[0]
+        if top_level in stdlib_names or top_level in local_names:
+            result["skipped"].append(requirement)
+        elif top_level in packages or normalize_distribution_name(name) in installed_distributions:
+            result["installed"].append(requirement)
+        elif name == requirement and importlib.util.find_spec(top_level) is not None:
+            # Importable without distribution metadata, e.g. from a source checkout on the path
+            result["installed"].append(requirement)
+        else:
+            result["missing"].append(import_name_aliases.get(top_level, requirement))
+    return result
+
 def verify_dependencies(requirements_file="requirements.txt"):
     """
     Verify if the dependencies listed in the requirements file are installed.
-    Installs any missing dependencies.
+    Installs any missing dependencies with a single pip invocation.
 
     Parameters:
         requirements_file (str): The name of the requirements file to verify.
+
+    Returns:
+        dict: The resolve_dependencies result.
     """
     requirements_path = os.path.join(output_dir, requirements_file)
     with open(requirements_path, 'r') as f:
         dependencies = f.readlines()
 
-    for dependency in dependencies:
-        dependency = dependency.strip()
-        try:
-            subprocess.check_call([sys.executable, '-m', 'pip', 'show', dependency])
-            logging.info(f"Dependency {dependency} is installed.")
-        except subprocess.CalledProcessError:
-            logging.info(f"Dependency {dependency} is not installed. Installing...")
-            subprocess.check_call([sys.executable, '-m', 'pip', 'install', dependency])
+    result = resolve_dependencies(dependencies, os.getenv('ROOT_DIRECTORY'))
+    logging.info(f"{len(result['installed'])} dependencies installed, "
+                 f"{len(result['skipped'])} standard library or project-local, "
+                 f"{len(result['missing'])} missing.")
+    if result["missing"]:
+        logging.info(f"Installing missing dependencies: {', '.join(result['missing'])}")
+        subprocess.check_call([sys.executable, '-m', 'pip', 'install', *result["missing"]])
+    return result
 
 if __name__ == "__main__":
     root_directory = os.getenv('ROOT_DIRECTORY')
@@ -0,0 +1,150 @@
+import os
+import re
+import ast
+import logging
+import subprocess
+from collections import namedtuple
+
+# Lines of a changed file sent together, with the definitions they are nested in
+ChangeSpan = namedtuple('ChangeSpan', ['start', 'end', 'text'])
+
+# Lines around a change sent when it is not inside a Python statement
+context_lines = int(os.getenv('GPT_DIFF_CONTEXT_LINES', '5'))
+
+_hunk_header = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+
+def _git(root_directory, *args):
+    return subprocess.run(
+        ["git", "-C", root_directory, "-c", "core.quotePath=false", *args],
+        capture_output=True, text=True, check=True
+    ).stdout
+
+def head_commit(root_directory):
+    """
+    Get the commit checked out in the git repository of a directory.
+
+    Parameters:
+        root_directory (str): A directory inside a git repository.
+
+    Returns:
+        str: The commit hash, or None if the directory is not in a git
+        repository or git is not installed.
+    """
+    try:
+        return _git(root_directory, "rev-parse", "--verify", "HEAD").strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def changed_hunks(root_directory, commit):
+    """
+    Find the lines of the working tree that changed since a commit, including
+    uncommitted changes. Only files under root_directory are compared.
+
+    Parameters:
+        root_directory (str): A directory inside a git repository.
+        commit (str): The commit to compare with.
+
+    Returns:
+        dict: Normalized file path to a list of (start, end) line ranges of the
+        current file, 1-based and inclusive. Lines that were only removed are
+        reported as the lines around them. Files that changed without
+        line changes, such as binary files, map to an empty list. Deleted
+        files are left out. Returns None if the commit cannot be compared.
+    """
+    try:
+        diff = _git(root_directory, "diff", "--relative", "--unified=0", "--no-color", "--no-ext-diff",
+                    "--no-renames", commit, "--")
+    except (OSError, subprocess.CalledProcessError) as e:
+        logging.error(f"Error comparing {root_directory} with {commit}: {e}")
+        return None
+
+    hunks = {}
+    path = None
+    for line in diff.splitlines():
+        if line.startswith("diff --git "):
+            path = None
+        elif line.startswith("+++ "):
+            target = line[4:]
+            path = None if target == "/dev/null" else os.path.normpath(os.path.join(root_directory, target[2:]))
+            if path is not None:
+                hunks[path] = []
+        elif line.startswith("Binary files ") and " and b/" in line:
+            hunks[os.path.normpath(os.path.join(root_directory, line.split(" and b/", 1)[1][:-len(" differ")]))] = []
+        elif path is not None:
+            match = _hunk_header.match(line)
+            if match:
+                start, count = int(match.group(1)), int(match.group(2) or 1)
+                if count == 0:
+                    # Lines were removed after line start
+                    hunks[path].append((max(start, 1), start + 1))
+                else:
+                    hunks[path].append((start, start + count - 1))
+    return hunks
+
+def _first_line(node):
+    return min([node.lineno] + [decorator.lineno for decorator in getattr(node, 'decorator_list', [])])
+
+def _enclosing_lines(body, start, end, headers):
+    """
+    Find the statements of body that contain lines start to end. A change
+    inside a class body narrows down to the statements in the class, keeping
+    the class line as a header, so a changed method is sent without the rest
+    of its class. Returns None for changes between statements.
+    """
+    overlapping = [node for node in body if _first_line(node) <= end and node.end_lineno >= start]
+    if not overlapping:
+        return None
+    node = overlapping[0]
+    if len(overlapping) == 1 and isinstance(node, ast.ClassDef) and start >= node.body[0].lineno:
+        return _enclosing_lines(node.body, start, end, headers + [(_first_line(node), node.body[0].lineno - 1)])
+    return min(_first_line(node) for node in overlapping), max(node.end_lineno for node in overlapping), headers
+
+def change_spans(file_path, source, hunks):
+    """
+    Widen changed lines to their syntactic context: the whole statements they
+    are in, such as the enclosing function, with the lines of the classes
+    around them. For files that are not Python, or do not parse, the lines
+    around each change are used. Overlapping spans are merged.
+
+    Parameters:
+        file_path (str): Path of the file, used to tell Python files apart.
+        source (str): Current content of the file.
+        hunks (list): Changed (start, end) line ranges, as from changed_hunks.
+
+    Returns:
+        list: ChangeSpan per group of changes, in file order, with the text
+        to send for it.
+    """
+    # Lines as git counts them, split at newlines only
+    lines = [line.rstrip("\r") for line in source.split("\n")]
+    tree = None
+    if file_path.endswith('.py'):
+        try:
+            tree = ast.parse(source)
+        except (SyntaxError, ValueError):
+            tree = None
+
+    spans = []
+    for start, end in sorted(hunks):
+        end = min(end, len(lines))
+        enclosing = _enclosing_lines(tree.body, start, end, []) if tree is not None else None
+        if enclosing is None:
+            enclosing = (max(start - context_lines, 1), min(end + context_lines, len(lines)), [])
+        span_start, span_end, headers = enclosing
+        if spans and span_start <= spans[-1][1] + 1:
+            previous_start, previous_end, previous_headers = spans[-1]
+            spans[-1] = (min(previous_start, span_start), max(previous_end, span_end), previous_headers)
+        else:
+            spans.append((span_start, span_end, headers))
+
+    result = []
+    for start, end, headers in spans:
+        text = [f"Lines {start}-{end}:"]
+        for index, (header_start, header_end) in enumerate(headers):
+            text.extend(lines[header_start - 1:header_end])
+            next_line = headers[index + 1][0] if index + 1 < len(headers) else start
+            if next_line > header_end + 1:
+                text.append("...")
+        text.extend(lines[start - 1:end])
+        result.append(ChangeSpan(start, end, "\n".join(text)))
+    return result
@@ -0,0 +1,180 @@
+import os
+import json
+import heapq
+import logging
+
+from brain.dependency_analysis import analyze_import_details, output_dir
+
+# The project-internal import graph of the last analysis, for other stages and tools
+import_graph_path = os.path.join(output_dir, "import_graph.json")
+
+def module_name_for_path(file_path, root_directory):
+    """
+    Get the dotted module name of a Python file relative to the project root.
+
+    Parameters:
+        file_path (str): Path to the Python file.
+        root_directory (str): The root directory of the project.
+
+    Returns:
+        str: Module name, e.g. "brain.import_graph", or "brain" for brain/__init__.py.
+    """
+    relative_path = os.path.relpath(file_path, root_directory)
+    parts = os.path.splitext(relative_path)[0].split(os.sep)
+    if parts[-1] == '__init__':
+        parts = parts[:-1]
+    return '.'.join(parts)
+
+def _resolve_relative(name, module_name, is_package):
+    """
+    Turn a relative import such as "..utils.helper" into an absolute module name.
+    """
+    level = len(name) - len(name.lstrip('.'))
+    package_parts = module_name.split('.') if is_package else module_name.split('.')[:-1]
+    if level - 1 > len(package_parts):
+        return None
+    base = package_parts[:len(package_parts) - (level - 1)]
+    remainder = name[level:]
+    return '.'.join(base + ([remainder] if remainder else []))
+
+def _find_module(name, modules, package=""):
+    """
+    Find the longest prefix of a dotted name that is a project module,
+    optionally looking the name up inside a package.
+    """
+    parts = name.split('.')
+    for end in range(len(parts), 0, -1):
+        candidate = '.'.join(parts[:end])
+        if package:
+            candidate = f"{package}.{candidate}"
+        if candidate in modules:
+            return modules[candidate]
+    return None
+
+def _suffix_index(modules):
+    """
+    Map every dotted suffix of the module names to its file, when unambiguous.
+    This resolves imports when the analyzed root is above the directory the
+    code is run from, e.g. "brain.utils" for GPT/brain/utils.py.
+    """
+    index = {}
+    for module_name, path in modules.items():
+        parts = module_name.split('.')
+        for start in range(1, len(parts)):
+            suffix = '.'.join(parts[start:])
+            index[suffix] = path if suffix not in index else None
+    return {suffix: path for suffix, path in index.items() if path is not None}
+
+def build_import_graph(root_directory):
+    """
+    Build the graph of imports between the project's own Python files.
+    Per-file imports come from analyze_import_details, so only files whose
+    content changed are parsed again. Imports are resolved as absolute
+    imports, as relative imports, as imports of sibling modules (how scripts
+    run from their own directory import each other) and finally against
+    unambiguous module name suffixes.
+
+    Parameters:
+        root_directory (str): The root directory of the project.
+
+    Returns:
+        dict: File path to the sorted list of project files it imports directly.
+    """
+    import_details = analyze_import_details(root_directory)
+    modules = {module_name_for_path(path, root_directory): path for path in import_details}
+    suffixes = _suffix_index(modules)
+    graph = {}
+
+    for path, details in import_details.items():
+        module_name = module_name_for_path(path, root_directory)
+        is_package = os.path.basename(path) == '__init__.py'
+        package = module_name if is_package else module_name.rpartition('.')[0]
+        dependencies = set()
+        for name in details["imports"]:
+            target = _find_module(name, modules)
+            if target is None and package:
+                target = _find_module(name, modules, package)
+            if target is None:
+                target = _find_module(name, suffixes)
+            if target is not None:
+                dependencies.add(target)
+        for name in details["relative"]:
+            absolute_name = _resolve_relative(name, module_name, is_package)
+            target = _find_module(absolute_name, modules) if absolute_name else None
+            if target is not None:
+                dependencies.add(target)
+        dependencies.discard(path)
+        graph[path] = sorted(dependencies)
+
+    with open(import_graph_path, 'w') as f:
+        json.dump(graph, f, indent=4)
+    return graph
+
+def topological_order(graph):
+    """
+    Order files so that every file comes after the files it imports (leaves first).
+    Import cycles are broken at the file with the fewest unprocessed
+    dependencies, so every file is still returned exactly once.
+
+    Parameters:
+        graph (dict): File path to the list of project files it imports.
+
+    Returns:
+        list: File paths, dependencies before dependents.
+    """
+    remaining = {path: set(dependencies) & graph.keys() for path, dependencies in graph.items()}
+    dependents = {path: set() for path in graph}
+    for path, dependencies in remaining.items():
+        for dependency in dependencies:
+            dependents[dependency].add(path)
+
+    order = []
+    # Min-heap, so ready files are taken in path order
+    ready = [path for path, dependencies in remaining.items() if not dependencies]
+    heapq.heapify(ready)
+    while remaining:
+        if not ready:
+            # Every remaining file is part of or behind an import cycle
+            cycle_start = min(remaining, key=lambda path: (len(remaining[path]), path))
+            logging.info(f"Breaking import cycle at {cycle_start}")
+            ready = [cycle_start]
+        path = heapq.heappop(ready)
+        if path not in remaining:
+            continue
+        del remaining[path]
+        order.append(path)
+        for dependent in dependents[path]:
+            if dependent in remaining:
+                remaining[dependent].discard(path)
+                if not remaining[dependent]:
+                    heapq.heappush(ready, dependent)
+    return order
+
+def dependency_context(file_path, graph, summaries, max_chars_per_summary=300, max_chars=1500):
+    """
+    Build compact context for a file from the summaries of its direct
+    project-internal dependencies, instead of sending their sources.
+
+    Parameters:
+        file_path (str): Path to the file being analyzed.
+        graph (dict): File path to the list of project files it imports.
+        summaries (dict): File path to its summary, for files analyzed so far.
+        max_chars_per_summary (int): Each summary is cut to this length.
+        max_chars (int): The whole context is cut to this length.
+
+    Returns:
+        str: Context text, or an empty string if no dependency has a summary yet.
+    """
+    lines = []
+    for dependency in graph.get(file_path, []):
+        summary = summaries.get(dependency)
+        if not summary:
+            continue
+        summary = ' '.join(summary.split())
+        if len(summary) > max_chars_per_summary:
+            summary = summary[:max_chars_per_summary].rstrip() + "..."
+        lines.append(f"- {dependency}: {summary}")
+    if not lines:
+        return ""
+    context = "Summaries of the project files it imports:\n" + "\n".join(lines)
+    return context[:max_chars]
@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 import os
 import json
 import subprocess
@@ -6,13 +6,30 @@ import openai
 import re
 import sys
 import logging
+import threading
+import time
+from collections import deque
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from werkzeug.exceptions import RequestEntityTooLarge
 
-from brain.dependency_analysis import verify_dependencies, analyze_dependencies
+from brain.dependency_analysis import verify_dependencies, dependency_index
 from tests.test_iterative_improvement import run_tests
 from brain.iterative_improvement import update_requirements
+from brain.chunking import iter_chunks, iter_stream_chunks, chunk_label, materialize_chunk
+from brain.jobs import start_job, get_job, list_jobs, cancel_job, shutdown_jobs
+from brain import metrics
+from brain.uploads import MultipartUpload
+from brain.minify import prepare_content
+from brain.upstream import ResponseCache, RateLimiter, SingleFlight, content_key
+from brain.results_store import query_results, query_summaries, file_statuses, list_runs, reset_connections
 
 app = Flask(__name__)
+metrics.instrument_app(app)
+
+# Request bodies larger than this are rejected with 413, including streamed uploads without a Content-Length
+max_upload_bytes = int(os.getenv('GPT_MAX_UPLOAD_BYTES', str(64 * 1024 * 1024)))
+app.config['MAX_CONTENT_LENGTH'] = max_upload_bytes
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -25,13 +42,153 @@ output_dir = os.path.join(os.path.dirname(__file__), '../output_files')
 os.makedirs(output_dir, exist_ok=True)
 
 # Training data directory
-training_data_dir = os.path.join(os.path.dirname(__file__), '../models/Veronica/training_data')
+training_data_dir = os.getenv('GPT_TRAINING_DATA_DIR', os.path.join(os.path.dirname(__file__), '../models/Veronica/training_data'))
 os.makedirs(training_data_dir, exist_ok=True)
 
 # Error log file
 error_log_path = os.path.join(output_dir, "error.txt")
 
+# Model, prompt and token limit of each operation
+operation_prompts = {
+    "summarize": ("gpt-4o-mini", "Summarize the following code:\n\n", 150),
+    "verify": ("gpt-3.5-turbo-0125", "Verify the following code and its dependencies:\n\n", 200),
+    "corrections": ("gpt-4o-mini", "Provide corrections for the following code:\n\n", 150),
+}
+
+# Responses are cached by operation and content hash in each process; upstream requests are
+# rate limited across all processes sharing the GPT_RATE_LIMIT_STATE file (per process without one)
+response_cache = ResponseCache(int(os.getenv('GPT_CACHE_SIZE', '1024')), float(os.getenv('GPT_CACHE_TTL', '3600')))
+rate_limiter = RateLimiter(float(os.getenv('GPT_RATE_LIMIT_PER_MINUTE', '600')), state_path=os.getenv('GPT_RATE_LIMIT_STATE') or None)
+
+# Identical requests arriving while one is in flight share its upstream call
+single_flight = SingleFlight()
+
+# Streamed uploads are cut into chunks of this many bytes; up to stream_window chunks are processed at once
+stream_chunk_size = int(os.getenv('GPT_STREAM_CHUNK_SIZE', '5000'))
+stream_window = int(os.getenv('GPT_STREAM_WINDOW', '4'))
+
+# Items of batch requests are processed concurrently by this pool, created on first use
+max_batch_items = int(os.getenv('GPT_BATCH_MAX_ITEMS', '1000'))
+max_batch_workers = int(os.getenv('GPT_BATCH_WORKERS', '8'))
+batch_executor = None
+batch_lock = threading.Lock()
+
+def get_batch_executor():
+    """
+    Get the pool processing batch items, creating it on first use.
+
+    Returns:
+        ThreadPoolExecutor: The batch worker pool.
+    """
+    global batch_executor
+    with batch_lock:
+        if batch_executor is None:
+            batch_executor = ThreadPoolExecutor(max_workers=max_batch_workers, thread_name_prefix='batch')
+        return batch_executor
+
+def init_worker():
+    """
+    Prepare a server worker forked from the preloaded app. Threads and
+    database connections do not survive a fork, so each worker starts with
+    its own pools and connections; the imported modules, OpenAI client
+    configuration and caches are inherited from the parent.
+    """
+    global batch_executor
+    batch_executor = None
+    reset_connections()
+    metrics.reset()
+    metrics.start_snapshot_thread()
+    logging.info(f"Worker {os.getpid()} ready")
+
+def drain():
+    """
+    Let background work finish before a server worker exits. Running scan
+    jobs are cancelled, so files in progress finish their current request
+    and store their results, and queued batch items are dropped.
+    """
+    shutdown_jobs()
+    with batch_lock:
+        executor = batch_executor
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+    metrics.write_snapshot()
+    logging.info(f"Worker {os.getpid()} drained")
+
 # Helper functions from existing scripts
+def request_operation(operation, file_content):
+    """
+    Run an operation on the provided code content using OpenAI API, waiting
+    for the rate limiter first. The content is minified first when
+    GPT_MINIFY_PROMPTS is enabled. Errors are raised to the caller.
+
+    Parameters:
+        operation (str): The operation (summarize, verify, corrections).
+        file_content (str): The content of the code file.
+
+    Returns:
+        str: The model's response.
+    """
+    model, prompt, max_tokens = operation_prompts[operation]
+    content, tokens_saved = prepare_content(file_content, operation)
+    if tokens_saved:
+        metrics.inc("gpt_prompt_tokens_saved_total", tokens_saved, operation=operation)
+    start_time = time.perf_counter()
+    rate_limiter.acquire()
+    request_time = time.perf_counter()
+    metrics.observe("gpt_rate_limiter_wait_seconds", request_time - start_time)
+    try:
+        response = openai.Completion.create(
+            model=model,
+            prompt=f"{prompt}{content}",
+            temperature=0.5,
+            max_tokens=max_tokens
+        )
+    except Exception:
+        metrics.inc("gpt_upstream_requests_total", model=model, outcome="error")
+        raise
+    finally:
+        metrics.observe("gpt_upstream_duration_seconds", time.perf_counter() - request_time, model=model)
+    metrics.inc("gpt_upstream_requests_total", model=model, outcome="success")
+    usage = getattr(response, 'usage', None)
+    if usage is not None:
+        metrics.inc("gpt_tokens_total", usage.prompt_tokens, model=model, type="prompt")
+        metrics.inc("gpt_tokens_total", usage.completion_tokens, model=model, type="completion")
+    result = response.choices[0].text.strip()
+    log_training_data(operation, file_content, result)
+    return result
+
+def run_operation(operation, file_content):
+    """
+    Run an operation, answering from the response cache when the same content
+    was processed before. Concurrent requests for the same content share one
+    upstream call. Failed requests are not cached.
+
+    Parameters:
+        operation (str): The operation (summarize, verify, corrections).
+        file_content (str): The content of the code file.
+
+    Returns:
+        tuple: (response, True if it came from the cache).
+    """
+    key = content_key(operation, file_content)
+    cached = response_cache.get(key)
+    if cached is not None:
+        metrics.inc("gpt_cache_requests_total", result="hit")
+        return cached, True
+    metrics.inc("gpt_cache_requests_total", result="miss")
+
+    def request_and_cache():
+        result = request_operation(operation, file_content)
+        # Cached before the call leaves the in-flight table, so later requests hit the cache
+        response_cache.put(key, result)
+        return result
+
+    result, shared = single_flight.do(key, request_and_cache)
+    if shared:
+        metrics.inc("gpt_coalesced_requests_total", operation=operation)
+    return result, False
+
+@metrics.instrumented('summarize')
 def summarize_code(file_content):
     """
     Summarize the provided code content using OpenAI API.
@@ -43,20 +200,13 @@ def summarize_code(file_content):
         str: Summary of the code.
     """
     try:
-        response = openai.Completion.create(
-            model="gpt-4o-mini",
-            prompt=f"Summarize the following code:\n\n{file_content}",
-            temperature=0.5,
-            max_tokens=150
-        )
-        summary = response.choices[0].text.strip()
-        log_training_data('summarize', file_content, summary)
-        return summary
+        return run_operation('summarize', file_content)[0]
     except Exception as e:
         log_error(file_content, str(e))
         logging.error(f"Error summarizing code: {e}")
         return ""
 
+@metrics.instrumented('verify')
 def verify_code(file_content):
     """
     Verify the provided code content using OpenAI API.
@@ -68,20 +218,13 @@ def verify_code(file_content):
         str: Verification result of the code.
     """
     try:
-        response = openai.Completion.create(
-            model="gpt-3.5-turbo-0125",
-            prompt=f"Verify the following code and its dependencies:\n\n{file_content}",
-            temperature=0.5,
-            max_tokens=200
-        )
-        verification = response.choices[0].text.strip()
-        log_training_data('verify', file_content, verification)
-        return verification
+        return run_operation('verify', file_content)[0]
     except Exception as e:
         log_error(file_content, str(e))
         logging.error(f"Error verifying code: {e}")
         return ""
 
+@metrics.instrumented('corrections')
 def get_corrections(file_content):
     """
     Get corrections for the provided code content using OpenAI API.
@@ -93,15 +236,7 @@ def get_corrections(file_content):
         str: Corrections for the code.
     """
     try:
-        response = openai.Completion.create(
-            model="gpt-4o-mini",
-            prompt=f"Provide corrections for the following code:\n\n{file_content}",
-            temperature=0.5,
-            max_tokens=150
-        )
-        corrections = response.choices[0].text.strip()
-        log_training_data('corrections', file_content, corrections)
-        return corrections
+        return run_operation('corrections', file_content)[0]
     except Exception as e:
         log_error(file_content, str(e))
         logging.error(f"Error getting corrections for code: {e}")
@@ -115,7 +250,8 @@ def log_training_data(operation, input_data, output_data):
         'input': input_data,
         'output': output_data
     }
-    log_file = os.path.join(training_data_dir, f"{operation}_{timestamp}.json")
+    # Microseconds keep concurrent batch items from overwriting each other's logs
+    log_file = os.path.join(training_data_dir, f"{operation}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.json")
     with open(log_file, 'w') as f:
         json.dump(log_entry, f, indent=4)
 
@@ -225,45 +361,30 @@ def batch_verify(files):
         logging.error(f"Error in batch verifying code: {e}")
         return []
 
-def chunk_file(file_path, chunk_size=5000):
-    """
-    Chunk a file into smaller parts.
-    
-    Parameters:
-        file_path (str): Path to the file.
-        chunk_size (int): Size of each chunk in characters.
-
-    Yields:
-        str: Chunk of file content.
-    """
-    with open(file_path, 'r') as file:
-        content = file.read()
-        for i in range(0, len(content), chunk_size):
-            yield content[i:i + chunk_size]
-
 def process_large_file(file_path, log_file, corrections_file):
     """
     Process a large file by chunking, summarizing, verifying, and logging each chunk.
+    Chunks are logged by reference and only written to disk when GPT_CHUNK_DIR is set.
     
     Parameters:
         file_path (str): Path to the file.
         log_file (file): Log file to write summaries and verifications.
         corrections_file (file): File to log corrections needed.
     """
-    chunk_number = 1
-    chunks = list(chunk_file(file_path))
+    references, chunks = [], []
+    for reference, chunk in iter_chunks(file_path):
+        references.append(reference)
+        chunks.append(chunk)
     summaries = batch_summarize(chunks)
     verifications = batch_verify(chunks)
     corrections = [get_corrections(chunk) for chunk in chunks]
 
-    for chunk, summary, verification, correction in zip(chunks, summaries, verifications, corrections):
-        chunk_path = os.path.join(output_dir, f"{os.path.basename(file_path)}.chunk{chunk_number}")
-        with open(chunk_path, 'w') as chunk_file:
-            chunk_file.write(chunk)
+    for reference, chunk, summary, verification, correction in zip(references, chunks, summaries, verifications, corrections):
+        materialize_chunk(reference, chunk)
+        chunk_path = chunk_label(reference)
         log_file.write(f"File: {chunk_path}\nSummary:\n{summary}\n\nVerification:\n{verification}\n\n")
         if "Failed" in verification:
             corrections_file.write(f"{chunk_path} needs correction:\n{correction}\n")
-        chunk_number += 1
 
 def process_small_file(file_path, log_file, corrections_file):
     """
@@ -317,17 +438,305 @@ def corrections():
         return jsonify({"corrections": corrections})
     return jsonify({"error": "No content provided"}), 400
 
+# Name of the result field of each operation, as in the single-item endpoints
+operation_result_keys = {"summarize": "summary", "verify": "verification", "corrections": "corrections"}
+
+def _process_batch_item(operation, item_id, content):
+    try:
+        result, cached = run_operation(operation, content)
+        return {"id": item_id, operation_result_keys[operation]: result, "cached": cached}
+    except Exception as e:
+        log_error(content, str(e))
+        return {"id": item_id, "error": f"{type(e).__name__}: {e}"}
+
+def batch_response(operation):
+    """
+    Process a batch of items concurrently and stream one NDJSON line per item
+    as it finishes. Invalid or failed items get an "error" line instead of
+    failing the batch.
+
+    Parameters:
+        operation (str): The operation (summarize, verify, corrections).
+
+    Returns:
+        Response: Streaming NDJSON response, or a JSON error for an invalid batch.
+    """
+    body = request.get_json(silent=True) or {}
+    items = body.get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "No items provided"}), 400
+    if len(items) > max_batch_items:
+        return jsonify({"error": f"Too many items; the limit is {max_batch_items}"}), 413
+
+    invalid = []
+    futures = []
+    for index, item in enumerate(items):
+        item_id = item.get('id', index) if isinstance(item, dict) else index
+        content = item.get('content') if isinstance(item, dict) else None
+        if not isinstance(content, str) or not content:
+            invalid.append({"id": item_id, "error": "No content provided"})
+        else:
+            futures.append(get_batch_executor().submit(_process_batch_item, operation, item_id, content))
+
+    def cancel_pending():
+        # Items not started yet are dropped when the client goes away
+        for future in futures:
+            future.cancel()
+
+    def generate():
+        try:
+            for line in invalid:
+                yield json.dumps(line) + "\n"
+            for future in as_completed(futures):
+                yield json.dumps(future.result()) + "\n"
+        finally:
+            cancel_pending()
+
+    response = Response(generate(), mimetype='application/x-ndjson')
+    # Also covers a client that disconnects before the stream starts
+    response.call_on_close(cancel_pending)
+    return response
+
+def _server_sent_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _process_stream_chunk(operation, index, reference, content):
+    data = {"index": index, "offset": reference.offset, "length": reference.length}
+    try:
+        result, cached = run_operation(operation, content)
+        return "chunk", {**data, operation_result_keys[operation]: result, "cached": cached}
+    except Exception as e:
+        log_error(content, str(e))
+        return "error", {**data, "error": f"{type(e).__name__}: {e}"}
+
+def stream_response(operation):
+    """
+    Process an uploaded file chunk by chunk while it is being received, and
+    stream each chunk's result as a server-sent event as soon as it is ready.
+    The upload is a multipart form with a "file" field, or the raw request
+    body; either way it is chunked as it arrives. Chunk results are sent in
+    upload order, with up to stream_window chunks in flight.
+
+    Parameters:
+        operation (str): The operation (summarize, verify, corrections).
+
+    Returns:
+        Response: Event stream of "chunk" and "error" events and a final "done" event.
+    """
+    if request.mimetype == 'multipart/form-data':
+        boundary = request.mimetype_params.get('boundary')
+        stream = MultipartUpload(request.stream, boundary.encode('latin-1')) if boundary else None
+        try:
+            if stream is None or not stream.open():
+                return jsonify({"error": "No file provided"}), 400
+        except ValueError as e:
+            return jsonify({"error": f"Invalid multipart body: {e}"}), 400
+        name = stream.filename
+    else:
+        stream, name = request.stream, request.args.get('name', "upload")
+
+    def generate():
+        pending = deque()
+        chunks = 0
+        errors = 0
+        total_bytes = 0
+        executor = get_batch_executor()
+
+        def finish_oldest():
+            nonlocal errors
+            event, data = pending.popleft().result()
+            errors += event == "error"
+            return _server_sent_event(event, data)
+
+        try:
+            try:
+                for reference, content in iter_stream_chunks(stream, name, stream_chunk_size):
+                    pending.append(executor.submit(_process_stream_chunk, operation, chunks, reference, content))
+                    chunks += 1
+                    total_bytes += reference.length
+                    while len(pending) >= stream_window:
+                        yield finish_oldest()
+            except RequestEntityTooLarge:
+                yield _server_sent_event("error", {"error": f"Upload exceeds {max_upload_bytes} bytes"})
+                return
+            except ValueError as e:
+                yield _server_sent_event("error", {"error": f"Invalid multipart body: {e}"})
+                return
+            while pending:
+                yield finish_oldest()
+            yield _server_sent_event("done", {"name": name, "chunks": chunks, "bytes": total_bytes, "errors": errors})
+        finally:
+            # Chunks not yet started are dropped when the upload fails or the client disconnects
+            for future in pending:
+                future.cancel()
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+@app.route('/summarize/stream', methods=['POST'])
+def summarize_stream():
+    """
+    API endpoint to summarize an uploaded file chunk by chunk, streaming results as server-sent events.
+    """
+    return stream_response('summarize')
+
+@app.route('/verify/stream', methods=['POST'])
+def verify_stream():
+    """
+    API endpoint to verify an uploaded file chunk by chunk, streaming results as server-sent events.
+    """
+    return stream_response('verify')
+
+@app.route('/corrections/stream', methods=['POST'])
+def corrections_stream():
+    """
+    API endpoint to get corrections for an uploaded file chunk by chunk, streaming results as server-sent events.
+    """
+    return stream_response('corrections')
+
+@app.route('/summarize/batch', methods=['POST'])
+def summarize_batch():
+    """
+    API endpoint to summarize many items, streaming results as NDJSON.
+    """
+    return batch_response('summarize')
+
+@app.route('/verify/batch', methods=['POST'])
+def verify_batch():
+    """
+    API endpoint to verify many items, streaming results as NDJSON.
+    """
+    return batch_response('verify')
+
+@app.route('/corrections/batch', methods=['POST'])
+def corrections_batch():
+    """
+    API endpoint to get corrections for many items, streaming results as NDJSON.
+    """
+    return batch_response('corrections')
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """
+    API endpoint exposing request, operation, upstream, token, cache and rate
+    limiter metrics in the Prometheus text format.
+    """
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/upstream/stats', methods=['GET'])
+def upstream_stats():
+    """
+    API endpoint to report response cache and request coalescing counters.
+    "coalesced" counts upstream calls saved by sharing an in-flight call.
+    """
+    return jsonify({"cache": response_cache.stats(), "coalescing": single_flight.stats()})
+
 @app.route('/dependencies', methods=['GET'])
 def dependencies():
     """
     API endpoint to get the list of dependencies for the project.
+    Responses carry an ETag; a request whose If-None-Match matches gets 304 Not Modified.
     """
     root_directory = os.getenv('ROOT_DIRECTORY')
     if root_directory:
-        dependencies = analyze_dependencies(root_directory)
-        return jsonify({"dependencies": list(dependencies)})
+        with metrics.track_operation('analyze_dependencies'):
+            dependencies, etag = dependency_index(root_directory)
+        response = jsonify({"dependencies": dependencies})
+        response.set_etag(etag)
+        return response.make_conditional(request)
     return jsonify({"error": "Root directory not set"}), 400
 
+@app.route('/results', methods=['GET'])
+def results():
+    """
+    API endpoint to query the stored results of the pipeline.
+    Optional query parameters: path, verdict (Verified, Failed, Unknown), limit
+    and run_id, which defaults to the latest run.
+    """
+    rows = query_results(
+        path=request.args.get('path'),
+        verdict=request.args.get('verdict'),
+        limit=request.args.get('limit', type=int),
+        run_id=request.args.get('run_id')
+    )
+    return jsonify({"results": rows})
+
+@app.route('/results/status', methods=['GET'])
+def results_status():
+    """
+    API endpoint to get the verification status of every stored file.
+    Optional query parameter: run_id, which defaults to the latest run.
+    """
+    return jsonify({"files": file_statuses(request.args.get('run_id'))})
+
+@app.route('/summaries', methods=['GET'])
+def summaries():
+    """
+    API endpoint to get the file, directory and package summaries of a run.
+    Optional query parameters: path, kind (file, directory, package) and
+    run_id, which defaults to the latest run.
+    """
+    rows = query_summaries(
+        path=request.args.get('path'),
+        kind=request.args.get('kind'),
+        run_id=request.args.get('run_id')
+    )
+    return jsonify({"summaries": rows})
+
+@app.route('/runs', methods=['GET'])
+def runs():
+    """
+    API endpoint to list the pipeline runs, most recent first.
+    """
+    return jsonify({"runs": list_runs()})
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """
+    API endpoint to start a background scan of a project directory.
+    The request body may give "operations" (summarize, verify, corrections,
+    dependencies) and a "root_directory" inside ROOT_DIRECTORY, which it
+    defaults to.
+    """
+    body = request.get_json(silent=True) or {}
+    root_directory = body.get('root_directory') or os.getenv('ROOT_DIRECTORY')
+    if not root_directory:
+        return jsonify({"error": "Root directory not set"}), 400
+    try:
+        job = start_job(root_directory, body.get('operations', ["summarize", "verify"]))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(get_job(job.job_id)), 202
+
+@app.route('/jobs', methods=['GET'])
+def jobs():
+    """
+    API endpoint to list the scan jobs of this server, most recent first.
+    Jobs are stored in the results database, so every server worker lists
+    the jobs of all workers.
+    """
+    return jsonify({"jobs": list_jobs()})
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """
+    API endpoint to report a scan job's progress: files done and total, tokens and ETA.
+    Results are available from /results with the job ID as run_id.
+    """
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def delete_job(job_id):
+    """
+    API endpoint to cancel a scan job.
+    """
+    job = cancel_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
 @app.route('/update-requirements', methods=['POST'])
 def update_requirements_endpoint():
     """
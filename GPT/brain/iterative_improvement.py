@@ -1,12 +1,20 @@
 import os
+import re
 import json
 import subprocess
-import re
 import openai
 import sys
 import logging
 import time
+import argparse
 
+from brain.dependency_analysis import analyze_dependencies, verify_dependencies
+from brain.import_graph import build_import_graph, topological_order, dependency_context
+from brain.chunking import ChunkRef, iter_block_chunks, chunk_label, materialize_chunk
+from brain.results_store import file_hash, get_result, store_result, start_run, finish_run, last_analyzed_commit, query_results, render_log, render_corrections, render_summaries
+from brain.git_diff import head_commit, changed_hunks, change_spans
+from brain.minify import prepare_content
+from brain.summary_tree import cached_summary, reduce_summaries, summarize_tree
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -22,72 +30,180 @@ os.makedirs(output_dir, exist_ok=True)
 training_data_dir = os.path.join(os.path.dirname(__file__), '../models/Veronica/training_data')
 os.makedirs(training_data_dir, exist_ok=True)
 
-def summarize_code(file_content):
+def request_completion(model, prompt, max_tokens, temperature=0.5):
+    """
+    Request a completion from the OpenAI API and measure it.
+
+    Parameters:
+        model (str): The model to use.
+        prompt (str): The prompt to complete.
+        max_tokens (int): Maximum number of tokens to generate.
+        temperature (float): Sampling temperature.
+
+    Returns:
+        dict: The completion "text", the "model", the "prompt_tokens" and
+        "completion_tokens" used and the "latency_seconds" of the request.
+    """
+    start_time = time.perf_counter()
+    response = openai.Completion.create(
+        model=model,
+        prompt=prompt,
+        temperature=temperature,
+        max_tokens=max_tokens
+    )
+    latency_seconds = time.perf_counter() - start_time
+    usage = response.get("usage") or {}
+    return {
+        "text": response.choices[0].text.strip(),
+        "model": model,
+        "prompt_tokens": usage.get("prompt_tokens", 0),
+        "completion_tokens": usage.get("completion_tokens", 0),
+        "latency_seconds": latency_seconds
+    }
+
+def record_usage(usage, completion):
+    """
+    Add the token counts and latency of a completion to a usage total.
+
+    Parameters:
+        usage (dict): Running total to update, or None to record nothing.
+        completion (dict): Result of request_completion.
+    """
+    if usage is None:
+        return
+    for key in ("prompt_tokens", "completion_tokens", "latency_seconds"):
+        usage[key] = usage.get(key, 0) + completion[key]
+    models = usage.setdefault("models", [])
+    if completion["model"] not in models:
+        models.append(completion["model"])
+
+def record_tokens_saved(usage, tokens_saved):
+    """
+    Add the prompt tokens saved by minifying the code of a request to a usage total.
+
+    Parameters:
+        usage (dict): Running total to update, or None to record nothing.
+        tokens_saved (int): Estimated tokens saved, from prepare_content.
+    """
+    if usage is not None:
+        usage["tokens_saved"] = usage.get("tokens_saved", 0) + tokens_saved
+
+def usage_columns(usage):
+    """
+    Turn a usage total into the model and usage columns of the results database.
+
+    Parameters:
+        usage (dict): Usage total filled by record_usage.
+
+    Returns:
+        dict: "model", "prompt_tokens", "completion_tokens", "latency_seconds"
+        and "tokens_saved".
+    """
+    return {
+        "model": ",".join(usage.get("models", [])),
+        "prompt_tokens": usage.get("prompt_tokens", 0),
+        "completion_tokens": usage.get("completion_tokens", 0),
+        "latency_seconds": usage.get("latency_seconds", 0.0),
+        "tokens_saved": usage.get("tokens_saved", 0)
+    }
+
+def summarize_code(file_content, usage=None, path=None):
     """
     Summarize the provided code content using OpenAI API.
     
     Parameters:
         file_content (str): The content of the code file.
+        usage (dict): Running total of tokens and latency to add this request to.
+        path (str): Path of the code file, if known, to minify it by language.
 
     Returns:
         str: Summary of the code.
     """
+    content, tokens_saved = prepare_content(file_content, "summarize", path)
     try:
-        response = openai.Completion.create(
-            model="gpt-4o-mini",
-            prompt=f"Summarize the following code:\n\n{file_content}",
-            temperature=0.5,
-            max_tokens=150
-        )
-        summary = response.choices[0].text.strip()
+        completion = request_completion("gpt-4o-mini", f"Summarize the following code:\n\n{content}", 150)
+        record_usage(usage, completion)
+        record_tokens_saved(usage, tokens_saved)
+        summary = completion["text"]
         log_training_data('summarize', file_content, summary)
         return summary
     except Exception as e:
         logging.error(f"Error summarizing code: {e}")
         return ""
 
-def verify_code(file_content):
+# Prompts to combine summaries into the summary of a file, directory or package
+combine_prompts = {
+    "file": "Combine the following summaries of consecutive parts of one code file into a single summary:\n\n",
+    "directory": "Combine the following summaries of the files and subdirectories of one directory into a summary of the directory:\n\n",
+    "package": "Combine the following summaries of the modules and subpackages of one Python package into a summary of the package:\n\n",
+}
+
+def combine_summaries(summaries, kind, usage=None):
+    """
+    Combine summaries into the summary of a file, directory or package using OpenAI API.
+
+    Parameters:
+        summaries (str): The summaries to combine, one per paragraph.
+        kind (str): What the result summarizes: file, directory or package.
+        usage (dict): Running total of tokens and latency to add this request to.
+
+    Returns:
+        str: The combined summary.
+    """
+    try:
+        completion = request_completion("gpt-4o-mini", f"{combine_prompts[kind]}{summaries}", 200)
+        record_usage(usage, completion)
+        return completion["text"]
+    except Exception as e:
+        logging.error(f"Error combining {kind} summaries: {e}")
+        return ""
+
+def verify_code(file_content, context="", usage=None, path=None):
     """
     Verify the provided code content using OpenAI API.
     
     Parameters:
         file_content (str): The content of the code file.
+        context (str): Summaries of the project files the code imports, if any.
+        usage (dict): Running total of tokens and latency to add this request to.
+        path (str): Path of the code file, if known, to minify it by language.
 
     Returns:
         str: Verification result of the code.
     """
+    prompt = "Verify the following code and its dependencies:\n\n"
+    if context:
+        prompt += f"{context}\n\nCode:\n"
+    content, tokens_saved = prepare_content(file_content, "verify", path)
     try:
-        response = openai.Completion.create(
-            model="gpt-3.5-turbo-0125",
-            prompt=f"Verify the following code and its dependencies:\n\n{file_content}",
-            temperature=0.5,
-            max_tokens=200
-        )
-        verification = response.choices[0].text.strip()
+        completion = request_completion("gpt-3.5-turbo-0125", f"{prompt}{content}", 200)
+        record_usage(usage, completion)
+        record_tokens_saved(usage, tokens_saved)
+        verification = completion["text"]
         log_training_data('verify', file_content, verification)
         return verification
     except Exception as e:
         logging.error(f"Error verifying code: {e}")
         return ""
 
-def get_corrections(file_content):
+def get_corrections(file_content, usage=None, path=None):
     """
     Get corrections for the provided code content using OpenAI API.
     
     Parameters:
         file_content (str): The content of the code file.
+        usage (dict): Running total of tokens and latency to add this request to.
+        path (str): Path of the code file, if known, to minify it by language.
 
     Returns:
         str: Corrections for the code.
     """
+    content, tokens_saved = prepare_content(file_content, "corrections", path)
     try:
-        response = openai.Completion.create(
-            model="gpt-4o-mini",
-            prompt=f"Provide corrections for the following code:\n\n{file_content}",
-            temperature=0.5,
-            max_tokens=150
-        )
-        corrections = response.choices[0].text.strip()
+        completion = request_completion("gpt-4o-mini", f"Provide corrections for the following code:\n\n{content}", 150)
+        record_usage(usage, completion)
+        record_tokens_saved(usage, tokens_saved)
+        corrections = completion["text"]
         log_training_data('corrections', file_content, corrections)
         return corrections
     except Exception as e:
@@ -128,6 +244,8 @@ def list_files_and_directories(root_directory):
     }
 
     for root, dirs, files in os.walk(root_directory):
+        # The git repository's own files are not part of the project
+        dirs[:] = [name for name in dirs if name != '.git']
         for name in files:
             files_and_dirs["files"].append({
                 "path": os.path.join(root, name),
@@ -138,29 +256,14 @@ def list_files_and_directories(root_directory):
 
     return files_and_dirs
 
-def chunk_file(file_path, chunk_size=5000):
-    """
-    Chunk a file into smaller parts.
-    
-    Parameters:
-        file_path (str): Path to the file.
-        chunk_size (int): Size of each chunk in characters.
-
-    Yields:
-        str: Chunk of file content.
-    """
-    with open(file_path, 'r') as file:
-        content = file.read()
-        for i in range(0, len(content), chunk_size):
-            yield content[i:i + chunk_size]
-
-def save_file_list(root_directory, output_file="file_list.txt"):
+def save_file_list(root_directory, output_file="file_list.txt", diff_base=None):
     """
     Save a list of files and directories in the root directory to a JSON file.
     
     Parameters:
         root_directory (str): The root directory to list files and directories from.
         output_file (str): The name of the output file.
+        diff_base (dict): Run to analyze only the changes since, see process_files.
     """
     output_path = os.path.join(output_dir, output_file)
     files_and_dirs = list_files_and_directories(root_directory)
@@ -170,102 +273,221 @@ def save_file_list(root_directory, output_file="file_list.txt"):
 
     logging.info(f"File list saved to {output_path}")
 
-    process_files(files_and_dirs)
+    process_files(files_and_dirs, root_directory, diff_base)
 
-def process_files(files_and_dirs):
+def order_files(files_and_dirs, graph):
     """
-    Process each file by summarizing and verifying it. Logs the results.
+    Order files so each Python file comes after the project files it imports.
+    Other files have no imports and keep their listing order after the Python files.
+
+    Parameters:
+        files_and_dirs (dict): A dictionary containing lists of files and directories.
+        graph (dict): File path to the list of project files it imports.
+
+    Returns:
+        list: File paths in processing order.
+    """
+    listed = [file["path"] for file in files_and_dirs["files"]]
+    listed_set = set(listed)
+    ordered = [path for path in topological_order(graph) if path in listed_set]
+    ordered_set = set(ordered)
+    return ordered + [path for path in listed if path not in ordered_set]
+
+def process_files(files_and_dirs, root_directory=None, diff_base=None):
+    """
+    Process each file by summarizing and verifying it. Results are stored in
+    the results database, and the text reports are rendered from it.
+    Files already finished in the current run with the same content are
+    skipped, so a resumed run continues where it stopped.
+    With a root_directory, files are processed leaves first along the project's
+    import graph, and each file is verified with the summaries of the project
+    files it imports. The file summaries are then combined into directory and
+    package summaries up to the root directory.
+    With a diff_base, files that are unchanged since that run keep its
+    results, and files it analyzed that changed since its git commit are
+    analyzed from their changes only, see process_changed_file.
     
     Parameters:
         files_and_dirs (dict): A dictionary containing lists of files and directories.
-    """
-    log_file_path = os.path.join(output_dir, "GPTlog.txt")
-    corrections_file_path = os.path.join(output_dir, "corrections_list.txt")
+        root_directory (str): The root directory the files were listed from.
+        diff_base (dict): The "run_id" and "git_commit" of an earlier run of
+            root_directory, as returned by last_analyzed_commit.
+    """
+    graph = build_import_graph(root_directory) if root_directory else {}
+    summaries = {}
+    hunks = changed_hunks(root_directory, diff_base["git_commit"]) if diff_base and root_directory else None
+
+    for file_path in order_files(files_and_dirs, graph):
+        content_hash = file_hash(file_path)
+        finished = get_result(file_path, content_hash)
+        previous = get_result(file_path, None, diff_base["run_id"]) if finished is None and hunks is not None else None
+        if finished is None and previous is not None and previous["hash"] == content_hash:
+            finished = store_result(file_path, content_hash, [carried_over(chunk) for chunk in previous["chunks"]])
+            logging.info(f"Keeping the results of {file_path}, unchanged since run {diff_base['run_id']}.")
+        elif finished is not None:
+            logging.info(f"Skipping {file_path}, already finished in this run.")
+        if finished is not None:
+            # Combinations are cached, so this makes no requests
+            summaries[file_path] = reduce_summaries([chunk["summary"] for chunk in finished["chunks"]], "file", combine_summaries)
+            continue
+        context = dependency_context(file_path, graph, summaries)
+        file_hunks = hunks.get(os.path.normpath(file_path)) if previous is not None else None
+        if file_hunks:
+            summaries[file_path] = process_changed_file(file_path, previous, file_hunks, context)
+        elif os.path.getsize(file_path) > 5000:
+            summaries[file_path] = process_large_file(file_path, context)
+        else:
+            summaries[file_path] = process_small_file(file_path, context)
+
+    if root_directory:
+        summarize_tree(root_directory, summaries, combine_summaries)
+        render_summaries(os.path.join(output_dir, "summaries.txt"))
+    render_log(os.path.join(output_dir, "GPTlog.txt"))
+    render_corrections(os.path.join(output_dir, "corrections_list.txt"))
+
+def analyze_chunk(chunk_path, content, context="", file_path=None):
+    """
+    Summarize, verify and get corrections for a file or chunk. Summaries are
+    cached by content hash, so unchanged content is not summarized again.
 
-    with open(log_file_path, 'w') as log_file, open(corrections_file_path, 'w') as corrections_file:
-        corrections_file.write("Corrections:\n")
-        for file in files_and_dirs["files"]:
-            file_path = file["path"]
-            if os.path.getsize(file_path) > 5000:
-                process_large_file(file_path, log_file, corrections_file)
-            else:
-                process_small_file(file_path, log_file, corrections_file)
+    Parameters:
+        chunk_path (str): Path the results are reported under.
+        content (str): The content of the file or chunk.
+        context (str): Summaries of the project files it imports.
+        file_path (str): Path of the file a chunk is part of. Defaults to chunk_path.
 
-def process_large_file(file_path, log_file, corrections_file):
+    Returns:
+        dict: The results, with the models, tokens and latency of the requests.
+    """
+    usage = {}
+    path = file_path or chunk_path
+    summary = cached_summary("chunk", content, lambda text: summarize_code(text, usage=usage, path=path))
+    verification = verify_code(content, context, usage=usage, path=path)
+    corrections = get_corrections(content, usage=usage, path=path)
+    return {
+        "path": chunk_path,
+        "summary": summary,
+        "verification": verification,
+        "corrections": corrections,
+        **usage_columns(usage)
+    }
+
+def process_large_file(file_path, context=""):
     """
     Process a large file by chunking, summarizing, and verifying each chunk.
+    The file is streamed one chunk at a time, and chunks are reported by
+    reference; they are only written to disk when GPT_CHUNK_DIR is set.
+    Chunks end before top-level statements, so after an edit only the edited
+    chunk is summarized again, and the chunk summaries are combined into the
+    file summary.
     
     Parameters:
         file_path (str): Path to the file.
-        log_file (file): Log file to write summaries and verifications.
-        corrections_file (file): File to log corrections needed.
-    """
-    chunk_number = 1
-    for chunk in chunk_file(file_path):
-        chunk_path = os.path.join(output_dir, f"{os.path.basename(file_path)}.chunk{chunk_number}")
-        with open(chunk_path, 'w') as chunk_file:
-            chunk_file.write(chunk)
-        summary = summarize_code(chunk)
-        verification = verify_code(chunk)
-        corrections = get_corrections(chunk)
-        log_file.write(f"File: {chunk_path}\nSummary:\n{summary}\n\nVerification:\n{verification}\n\n")
-        if "Failed" in verification:
-            corrections_file.write(f"{chunk_path} needs correction:\n{corrections}\n")
-        chunk_number += 1
-
-def process_small_file(file_path, log_file, corrections_file):
+        context (str): Summaries of the project files it imports.
+
+    Returns:
+        str: The chunk summaries combined into a summary of the file.
+    """
+    chunks = []
+    for reference, content in iter_block_chunks(file_path):
+        materialize_chunk(reference, content)
+        chunk = analyze_chunk(chunk_label(reference), content, context, file_path)
+        chunk.update(chunk_offset=reference.offset, chunk_length=reference.length, chunk_hash=reference.hash)
+        chunks.append(chunk)
+    store_result(file_path, file_hash(file_path), chunks)
+    return reduce_summaries([chunk["summary"] for chunk in chunks], "file", combine_summaries)
+
+def process_small_file(file_path, context=""):
     """
     Process a small file by summarizing and verifying it.
     
     Parameters:
         file_path (str): Path to the file.
-        log_file (file): Log file to write summaries and verifications.
-        corrections_file (file): File to log corrections needed.
+        context (str): Summaries of the project files it imports.
+
+    Returns:
+        str: Summary of the file.
     """
     with open(file_path, 'r') as f:
         content = f.read()
-        summary = summarize_code(content)
-        verification = verify_code(content)
-        corrections = get_corrections(content)
-        log_file.write(f"File: {file_path}\nSummary:\n{summary}\n\nVerification:\n{verification}\n\n")
-        if "Failed" in verification:
-            corrections_file.write(f"{file_path} needs correction:\n{corrections}\n")
+    content_hash = file_hash(file_path)
+    chunk = analyze_chunk(file_path, content, context)
+    chunk.update(chunk_offset=0, chunk_length=os.path.getsize(file_path), chunk_hash=content_hash)
+    store_result(file_path, content_hash, [chunk])
+    return chunk["summary"]
 
-def extract_imports(file_content):
+def carried_over(chunk):
     """
-    Extract import statements from the given file content.
-    
-    Parameters:
-        file_content (str): The content of the code file.
-
-    Returns:
-        set: A set of imported modules or packages.
+    Copy a stored chunk result into a new run without the usage of the
+    requests that produced it, since the new run made none.
     """
-    imports = re.findall(r'^\s*import\s+(\S+)|^\s*from\s+(\S+)', file_content, re.MULTILINE)
-    return set(imp[0] or imp[1] for imp in imports)
+    return dict(chunk, model="", prompt_tokens=0, completion_tokens=0, latency_seconds=0.0, tokens_saved=0)
 
-def analyze_dependencies(root_directory):
+def process_changed_file(file_path, previous, hunks, context=""):
     """
-    Analyze dependencies for all Python files in the root_directory.
-    
+    Analyze a file that changed since it was last analyzed by sending only
+    what changed. Chunks with unchanged content keep their stored results.
+    Changed chunks are summarized again, and verified and corrected from the
+    changed lines widened to their enclosing definitions, together with the
+    file's summary from before the change instead of the whole file. The new
+    verdicts are stored with the kept ones as the file's result.
+
     Parameters:
-        root_directory (str): The root directory to analyze for dependencies.
+        file_path (str): Path to the file.
+        previous (dict): The file's stored result from the earlier run.
+        hunks (list): Changed (start, end) line ranges, as from changed_hunks.
+        context (str): Summaries of the project files it imports.
 
     Returns:
-        set: A set of all imported modules or packages.
-    """
-    files_and_dirs = list_files_and_directories(root_directory)
-    dependencies = set()
-
-    for file in files_and_dirs["files"]:
-        file_path = file["path"]
-        if file["type"] == '.py':  # Only analyze Python files
-            with open(file_path, 'r') as f:
-                content = f.read()
-                imports = extract_imports(content)
-                dependencies.update(imports)
-
-    return dependencies
+        str: Summary of the file.
+    """
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    source = data.decode('utf-8', errors='replace')
+    spans = change_spans(file_path, source, hunks)
+    # Byte offset of the start of every line, to find the chunks a span is in
+    line_starts = [0] + [match.end() for match in re.finditer(b"\n", data)]
+
+    def span_bytes(span):
+        return line_starts[span.start - 1], line_starts[span.end] if span.end < len(line_starts) else len(data)
+
+    previous_chunks = {chunk["chunk_hash"]: chunk for chunk in previous["chunks"]}
+    # Combinations are cached, so this makes no requests
+    change_context = "Summary of the file before the change:\n" + reduce_summaries(
+        [chunk["summary"] for chunk in previous["chunks"]], "file", combine_summaries)
+    if context:
+        change_context += f"\n\n{context}"
+
+    content_hash = file_hash(file_path)
+    large = len(data) > 5000
+    if large:
+        pairs = iter_block_chunks(file_path)
+    else:
+        pairs = [(ChunkRef(file_path, 0, len(data), content_hash), source)]
+    chunks = []
+    for reference, content in pairs:
+        chunk_path = chunk_label(reference) if large else file_path
+        chunk_end = reference.offset + reference.length
+        changes = [span.text for span in spans
+                   if span_bytes(span)[0] < chunk_end and span_bytes(span)[1] > reference.offset]
+        if reference.hash in previous_chunks:
+            chunk = carried_over(previous_chunks[reference.hash])
+        elif changes:
+            usage = {}
+            changed_code = "\n\n".join(changes)
+            chunk = {
+                "summary": cached_summary("chunk", content, lambda text: summarize_code(text, usage=usage, path=file_path)),
+                "verification": verify_code(changed_code, change_context, usage=usage, path=file_path),
+                "corrections": get_corrections(changed_code, usage=usage, path=file_path),
+                **usage_columns(usage)
+            }
+        else:
+            # The chunk moved without changing inside, e.g. after a boundary shift
+            chunk = analyze_chunk(chunk_path, content, context, file_path)
+        chunk.update(path=chunk_path, chunk_offset=reference.offset, chunk_length=reference.length, chunk_hash=reference.hash)
+        chunks.append(chunk)
+    store_result(file_path, content_hash, chunks)
+    return reduce_summaries([chunk["summary"] for chunk in chunks], "file", combine_summaries)
 
 def update_requirements(dependencies, requirements_file="requirements.txt"):
     """
@@ -280,30 +502,11 @@ def update_requirements(dependencies, requirements_file="requirements.txt"):
         for dependency in dependencies:
             f.write(f"{dependency}\n")
 
-def verify_dependencies(requirements_file="requirements.txt"):
-    """
-    Verify if the dependencies listed in the requirements file are installed.
-    Installs any missing dependencies.
-    
-    Parameters:
-        requirements_file (str): The name of the requirements file to verify.
-    """
-    requirements_path = os.path.join(output_dir, requirements_file)
-    with open(requirements_path, 'r') as f:
-        dependencies = f.readlines()
-
-    for dependency in dependencies:
-        dependency = dependency.strip()
-        try:
-            subprocess.check_call([sys.executable, '-m', 'pip', 'show', dependency])
-            logging.info(f"Dependency {dependency} is installed.")
-        except subprocess.CalledProcessError:
-            logging.info(f"Dependency {dependency} is not installed. Installing...")
-            subprocess.check_call([sys.executable, '-m', 'pip', 'install', dependency])
-
 def update_status_and_logs(root_directory):
     """
     Update the status and logs for all files in the root_directory.
+    Verdicts come from the results stored by process_files; only files that
+    were not processed in this run, or changed since, are verified again.
     
     Parameters:
         root_directory (str): The root directory to update status and logs for.
@@ -315,11 +518,22 @@ def update_status_and_logs(root_directory):
     with open(status_file_path, 'w') as status_file, open(test_file_path, 'w') as test_file:
         for file in files_and_dirs["files"]:
             file_path = file["path"]
-            with open(file_path, 'r') as f:
-                content = f.read()
-                verification = verify_code(content)
-                status_file.write(f"File: {file_path}\nStatus: {'Verified' if 'Verified' in verification else 'Failed'}\n\n")
-                test_file.write(f"Test: {file_path}\nResult: {'Pass' if 'Verified' in verification else 'Fail'}\n\n")
+            content_hash = file_hash(file_path)
+            result = get_result(file_path, content_hash)
+            if result is None:
+                usage = {}
+                with open(file_path, 'r') as f:
+                    verification = verify_code(f.read(), usage=usage, path=file_path)
+                chunk = {
+                    "path": file_path,
+                    "summary": "",
+                    "verification": verification,
+                    "corrections": "",
+                    **usage_columns(usage)
+                }
+                result = store_result(file_path, content_hash, [chunk])
+            status_file.write(f"File: {file_path}\nStatus: {'Verified' if result['verified'] else 'Failed'}\n\n")
+            test_file.write(f"Test: {file_path}\nResult: {'Pass' if result['verified'] else 'Fail'}\n\n")
 
 def compare_with_scope(scope_file="project_scope.txt"):
     """
@@ -340,16 +554,15 @@ def compare_with_scope(scope_file="project_scope.txt"):
 
 def create_corrections(corrections_file="corrections_list.txt"):
     """
-    Create corrections based on the corrections list file.
+    Create corrections for every file or chunk whose verification failed.
+    The corrections list is queried from the results database and rendered
+    to the corrections list file for reference.
     
     Parameters:
         corrections_file (str): The name of the corrections list file.
     """
-    corrections_path = os.path.join(output_dir, corrections_file)
-    with open(corrections_path, 'r') as file:
-        corrections = file.readlines()
-
-    for correction in corrections:
+    render_corrections(os.path.join(output_dir, corrections_file))
+    for result in query_results(verdict="Failed"):
         # Implement correction logic here
         pass
 
@@ -364,17 +577,30 @@ def run_tests():
     logging.info(result.stdout)
 
 if __name__ == "__main__":
-    root_directory = os.getenv('ROOT_DIRECTORY')
+    parser = argparse.ArgumentParser(description="Summarize, verify and correct every file of a project.")
+    parser.add_argument('--root-directory', default=os.getenv('ROOT_DIRECTORY'), help="Project to analyze; defaults to ROOT_DIRECTORY")
+    parser.add_argument('--run-id', help="Identifier of the run; defaults to a timestamp")
+    parser.add_argument('--resume', action='store_true', help="Continue the run (or the last unfinished run), skipping finished files")
+    parser.add_argument('--diff', action='store_true', help="Only send what changed since the last run of a git commit of the root directory")
+    args = parser.parse_args()
+
+    root_directory = args.root_directory
     if not root_directory:
         logging.error("ROOT_DIRECTORY environment variable is not set.")
     else:
-        save_file_list(root_directory)
+        git_commit = head_commit(root_directory) or ""
+        run_id = start_run(args.run_id, args.resume, root_directory, git_commit)
+        diff_base = last_analyzed_commit(root_directory, run_id) if args.diff else None
+        if args.diff and diff_base is None:
+            logging.info("No earlier run of a git commit to compare with, analyzing every file.")
+        save_file_list(root_directory, diff_base=diff_base)
         dependencies = analyze_dependencies(root_directory)
         update_requirements(dependencies)
         verify_dependencies()
         update_status_and_logs(root_directory)
         compare_with_scope()
         create_corrections()
+        finish_run()
         # Commenting out run_tests() since initial tests are run on startup
         # run_tests()
 
@@ -0,0 +1,354 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from brain.chunking import iter_chunks, chunk_label
+from brain.dependency_analysis import analyze_dependencies
+from brain.metrics import process_alive
+from brain.iterative_improvement import list_files_and_directories, summarize_code, verify_code, get_corrections, usage_columns
+from brain.results_store import (file_hash, store_result, create_run, finish_run, save_job, get_job_record,
+                                 list_job_records, request_job_cancel, fail_unfinished_job, prune_jobs)
+
+# Operations a scan job can run; all but dependencies run per file
+job_operations = ("summarize", "verify", "corrections", "dependencies")
+
+# Files are processed by a pool shared by all jobs, so concurrent jobs cannot exhaust the server
+max_job_workers = int(os.getenv('GPT_JOB_WORKERS', '4'))
+job_executor = None
+# Unfinished jobs run by this process; their progress is stored in the results
+# database, where every server worker can read and cancel them
+jobs = {}
+jobs_lock = threading.Lock()
+
+# Finished jobs are forgotten after this many seconds, and beyond this many, oldest first
+finished_job_ttl = float(os.getenv('GPT_FINISHED_JOB_TTL', '3600'))
+max_finished_jobs = int(os.getenv('GPT_MAX_FINISHED_JOBS', '100'))
+
+# A running job checks at most this often whether another worker cancelled it
+cancel_poll_seconds = 1.0
+
+class ScanJob:
+    """
+    A scan of a project directory running in the background. Results are
+    stored in the results database under the job ID as run ID, and progress
+    in its jobs table.
+    """
+
+    def __init__(self, root_directory, operations):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.root_directory = root_directory
+        self.operations = list(operations)
+        self.status = "queued"
+        self.files_total = 0
+        self.files_done = 0
+        self.files_failed = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.tokens_saved = 0
+        self.dependencies = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.cancel_checked_at = time.monotonic()
+        self.lock = threading.Lock()
+        self.futures = []
+        self.pending = 0
+        self.planned = False
+
+    def save(self):
+        """
+        Store the job's progress for all server workers.
+        """
+        # Snapshots are written in the order they are taken
+        with self.lock:
+            save_job({
+                "job_id": self.job_id,
+                "root_directory": self.root_directory,
+                "operations": self.operations,
+                "dependencies": self.dependencies,
+                "status": self.status,
+                "files_total": self.files_total,
+                "files_done": self.files_done,
+                "files_failed": self.files_failed,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "tokens_saved": self.tokens_saved,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "pid": os.getpid()
+            })
+
+    def cancel_requested(self):
+        """
+        Check whether the job was cancelled, by this process or through
+        another server worker. The shared flag is read at most every
+        cancel_poll_seconds.
+        """
+        if self.cancel_event.is_set():
+            return True
+        now = time.monotonic()
+        with self.lock:
+            if now - self.cancel_checked_at < cancel_poll_seconds:
+                return False
+            self.cancel_checked_at = now
+        record = get_job_record(self.job_id)
+        if record is not None and record["cancel_requested"]:
+            _cancel(self)
+            return True
+        return False
+
+def _eta_seconds(record):
+    """
+    Estimate the remaining time from the average time per finished file.
+    """
+    finished = record["files_done"] + record["files_failed"]
+    if record["status"] != "running" or not finished or record["started_at"] is None:
+        return None
+    elapsed = time.time() - record["started_at"]
+    return elapsed / finished * (record["files_total"] - finished)
+
+def _describe(record):
+    """
+    Describe a stored job's progress for the API. An unfinished job whose
+    process has exited, e.g. a server worker that was killed, is marked failed.
+    """
+    if record["finished_at"] is None and not process_alive(record["pid"]):
+        fail_unfinished_job(record["job_id"], "The server worker running the job exited")
+        record = get_job_record(record["job_id"])
+    description = {key: value for key, value in record.items() if key not in ("pid", "cancel_requested")}
+    description["eta_seconds"] = _eta_seconds(record)
+    return description
+
+def get_executor():
+    """
+    Get the worker pool shared by all jobs, creating it on first use.
+
+    Returns:
+        ThreadPoolExecutor: The job worker pool.
+    """
+    global job_executor
+    with jobs_lock:
+        if job_executor is None:
+            job_executor = ThreadPoolExecutor(max_workers=max_job_workers, thread_name_prefix='scan-job')
+        return job_executor
+
+def start_job(root_directory, operations):
+    """
+    Start scanning a project directory in the background.
+
+    Parameters:
+        root_directory (str): The project directory to scan, which must be
+            inside ROOT_DIRECTORY.
+        operations (list): Operations to run, from job_operations.
+
+    Returns:
+        ScanJob: The queued job.
+    """
+    unknown = [operation for operation in operations if operation not in job_operations]
+    if unknown or not operations:
+        raise ValueError(f"Operations must be a non-empty list of {', '.join(job_operations)}")
+    allowed_root = os.getenv('ROOT_DIRECTORY')
+    if not allowed_root:
+        raise ValueError("Root directory not set")
+    # Resolve symlinks and .. so clients cannot scan outside ROOT_DIRECTORY
+    allowed_root = os.path.realpath(allowed_root)
+    root_directory = os.path.realpath(root_directory)
+    if os.path.commonpath([root_directory, allowed_root]) != allowed_root:
+        raise ValueError(f"Root directory must be inside ROOT_DIRECTORY: {root_directory}")
+    if not os.path.isdir(root_directory):
+        raise ValueError(f"Root directory does not exist: {root_directory}")
+    job = ScanJob(root_directory, operations)
+    prune_jobs(finished_job_ttl, max_finished_jobs)
+    job.save()
+    with jobs_lock:
+        jobs[job.job_id] = job
+    get_executor().submit(_plan_job, job)
+    return job
+
+def get_job(job_id):
+    """
+    Get a job's progress by ID, whichever server worker runs it.
+
+    Returns:
+        dict: The job's progress, or None if there is no such job.
+    """
+    record = get_job_record(job_id)
+    return None if record is None else _describe(record)
+
+def list_jobs():
+    """
+    List the progress of all jobs of the server, most recent first.
+    """
+    return [_describe(record) for record in list_job_records()]
+
+def cancel_job(job_id):
+    """
+    Cancel a job. Files not yet started are dropped, and files in progress
+    stop before their next request. A job run by another server worker is
+    flagged in the results database and stops within cancel_poll_seconds of
+    that worker's next check.
+
+    Parameters:
+        job_id (str): ID of the job to cancel.
+
+    Returns:
+        dict: The job's progress, or None if there is no such job.
+    """
+    if not request_job_cancel(job_id):
+        return None
+    with jobs_lock:
+        job = jobs.get(job_id)
+    if job is not None:
+        _cancel(job)
+    return get_job(job_id)
+
+def _cancel(job):
+    """
+    Stop a job run by this process.
+    """
+    job.cancel_event.set()
+    with job.lock:
+        if job.finished_at is None:
+            job.status = "cancelling"
+        futures = list(job.futures)
+    for future in futures:
+        future.cancel()
+    job.save()
+    _finish_if_done(job)
+
+def shutdown_jobs():
+    """
+    Cancel all unfinished jobs of this process and wait for the files in
+    progress to finish, e.g. when the server worker shuts down.
+    """
+    global job_executor
+    with jobs_lock:
+        running = list(jobs.values())
+    for job in running:
+        request_job_cancel(job.job_id)
+        _cancel(job)
+    with jobs_lock:
+        executor, job_executor = job_executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+def _plan_job(job):
+    """
+    List the job's files, run the project-wide operations and queue one task per file.
+    """
+    try:
+        cancelled = job.cancel_requested()
+        with job.lock:
+            if cancelled:
+                job.planned = True
+            else:
+                job.status = "running"
+                job.started_at = time.time()
+        if job.planned:
+            _finish_if_done(job)
+            return
+        job.save()
+        create_run(job.job_id, job.root_directory)
+        if "dependencies" in job.operations:
+            dependencies = sorted(analyze_dependencies(job.root_directory))
+            with job.lock:
+                job.dependencies = dependencies
+
+        files = []
+        if set(job.operations) - {"dependencies"}:
+            files = [file["path"] for file in list_files_and_directories(job.root_directory)["files"]]
+        with job.lock:
+            job.files_total = len(files)
+        job.save()
+        executor = get_executor()
+        for file_path in files:
+            if job.cancel_requested():
+                break
+            with job.lock:
+                job.pending += 1
+            future = executor.submit(_process_file, job, file_path)
+            with job.lock:
+                job.futures.append(future)
+            future.add_done_callback(lambda future: _file_finished(job, future))
+    except Exception as e:
+        logging.error(f"Job {job.job_id} failed: {e}")
+        with job.lock:
+            job.error = f"{type(e).__name__}: {e}"
+    with job.lock:
+        job.planned = True
+    _finish_if_done(job)
+
+def _process_file(job, file_path):
+    """
+    Run the job's per-file operations on one file and store the results.
+
+    Returns:
+        bool: True if the file was processed, False if the job was cancelled first.
+    """
+    content_hash = file_hash(file_path)
+    chunks = []
+    for reference, content in iter_chunks(file_path):
+        if job.cancel_requested():
+            return False
+        usage = {}
+        chunk = {
+            "path": chunk_label(reference),
+            "summary": summarize_code(content, usage=usage, path=file_path) if "summarize" in job.operations else "",
+            "verification": verify_code(content, usage=usage, path=file_path) if "verify" in job.operations else "",
+            "corrections": get_corrections(content, usage=usage, path=file_path) if "corrections" in job.operations else "",
+            "chunk_offset": reference.offset,
+            "chunk_length": reference.length,
+            "chunk_hash": reference.hash,
+            **usage_columns(usage)
+        }
+        chunks.append(chunk)
+        with job.lock:
+            job.prompt_tokens += chunk["prompt_tokens"]
+            job.completion_tokens += chunk["completion_tokens"]
+            job.tokens_saved += chunk["tokens_saved"]
+    if len(chunks) == 1:
+        # Files that fit in one chunk are reported under their own path
+        chunks[0]["path"] = file_path
+    store_result(file_path, content_hash, chunks, run_id=job.job_id)
+    return True
+
+def _file_finished(job, future):
+    with job.lock:
+        job.pending -= 1
+        if future.cancelled():
+            pass
+        elif future.exception() is not None:
+            logging.error(f"Job {job.job_id} failed on a file: {future.exception()}")
+            job.files_failed += 1
+        elif future.result():
+            job.files_done += 1
+    if not future.cancelled():
+        job.save()
+    _finish_if_done(job)
+
+def _finish_if_done(job):
+    """
+    Mark the job finished once it is planned and no file tasks are left.
+    """
+    with job.lock:
+        if not job.planned or job.pending or job.finished_at is not None:
+            return
+        job.finished_at = time.time()
+        if job.cancel_event.is_set():
+            job.status = "cancelled"
+        elif job.error:
+            job.status = "failed"
+        else:
+            job.status = "completed"
+    if job.started_at is not None:
+        finish_run(job.job_id)
+    job.save()
+    with jobs_lock:
+        jobs.pop(job.job_id, None)
@@ -0,0 +1,195 @@
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
+
+# Load test results are written with the other iteration outputs
+output_dir = os.path.join(os.path.dirname(__file__), '../iteration/output_files')
+
+class MockUpstreamHandler(BaseHTTPRequestHandler):
+    """
+    Answers OpenAI completion requests after a fixed delay, standing in for the real API.
+    """
+    latency = 0.5
+    received = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with self.lock:
+            type(self).received += 1
+        time.sleep(self.latency)
+        body = json.dumps({
+            "id": "cmpl-mock",
+            "object": "text_completion",
+            "model": "mock",
+            "choices": [{"text": " Mock response.", "index": 0, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 3, "total_tokens": 13}
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_mock_upstream(latency):
+    """
+    Start the mock upstream on a free local port in a background thread.
+
+    Parameters:
+        latency (float): Seconds each completion takes.
+
+    Returns:
+        ThreadingHTTPServer: The running server.
+    """
+    handler = type('Handler', (MockUpstreamHandler,), {'latency': latency, 'received': 0, 'lock': threading.Lock()})
+    # The default listen backlog of 5 resets connections when many requests arrive at once
+    server_class = type('Server', (ThreadingHTTPServer,), {'request_queue_size': 256, 'daemon_threads': True})
+    server = server_class(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def start_api(mode, port, upstream_url, workers, threads, scratch_dir):
+    """
+    Start the API in a subprocess, pointed at the mock upstream.
+
+    Parameters:
+        mode (str): "production" for brain.serve, "dev" for the Flask development server.
+        port (int): Port to serve on.
+        upstream_url (str): Base URL of the mock upstream.
+        workers (int): Worker processes (production only).
+        threads (int): Threads per worker (production only).
+        scratch_dir (str): Directory for the training data the server logs, kept out of the real training set.
+
+    Returns:
+        subprocess.Popen: The server process.
+    """
+    env = dict(os.environ, OPENAI_API_BASE=upstream_url, API_KEY='mock', GPT_RATE_LIMIT_PER_MINUTE='0',
+               GPT_TRAINING_DATA_DIR=scratch_dir)
+    if mode == "production":
+        command = [sys.executable, '-m', 'brain.serve', '--bind', f'127.0.0.1:{port}',
+                   '--workers', str(workers), '--threads', str(threads)]
+    else:
+        # As in integration_api's __main__, without the reloader's extra process
+        command = [sys.executable, '-c', f"from brain.integration_api import app; app.run(port={port}, debug=True, use_reloader=False)"]
+    process = subprocess.Popen(command, cwd=os.path.join(os.path.dirname(__file__), '..'), env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/upstream/stats", timeout=1)
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"The {mode} server did not start")
+
+def post_summarize(port, content, timeout=60):
+    """
+    Send one /summarize request and time it.
+
+    Returns:
+        tuple: (latency in seconds, True if it returned a summary).
+    """
+    request = urllib.request.Request(f"http://127.0.0.1:{port}/summarize", data=json.dumps({"content": content}).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'})
+    start_time = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            ok = bool(json.load(response).get("summary"))
+    except OSError:
+        ok = False
+    return time.perf_counter() - start_time, ok
+
+def run_load(port, requests, concurrency):
+    """
+    Send requests with distinct content, so none is answered from the cache.
+
+    Returns:
+        dict: Throughput, latency percentiles and error count.
+    """
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda i: post_summarize(port, f"value_{i} = {i}\n"), range(requests)))
+    elapsed = time.perf_counter() - start_time
+    latencies = sorted(latency for latency, ok in results if ok)
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": sum(1 for _, ok in results if not ok),
+        "seconds": elapsed,
+        "requests_per_second": requests / elapsed,
+        "p50_seconds": latencies[len(latencies) // 2] if latencies else None,
+        "p95_seconds": latencies[int(len(latencies) * 0.95) - 1] if latencies else None
+    }
+
+def run_drain_check(process, port, concurrency, upstream):
+    """
+    Stop the server with SIGTERM once all requests are waiting on the
+    upstream, and count how many of them still complete.
+
+    Returns:
+        dict: Requests in flight at shutdown and how many completed.
+    """
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(post_summarize, port, f"drain_{i} = {i}\n") for i in range(concurrency)]
+        expected = upstream.RequestHandlerClass.received + concurrency
+        deadline = time.time() + 30
+        while upstream.RequestHandlerClass.received < expected and time.time() < deadline:
+            time.sleep(0.01)
+        process.send_signal(signal.SIGTERM)
+        completed = sum(1 for future in futures if future.result()[1])
+    process.wait(60)
+    return {"in_flight": concurrency, "completed": completed}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the integration API against a mock upstream.")
+    parser.add_argument('--mode', choices=["production", "dev", "both"], default="both")
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--latency', type=float, default=0.5, help="Seconds each mock completion takes")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--port', type=int, default=5055)
+    args = parser.parse_args()
+
+    upstream = start_mock_upstream(args.latency)
+    upstream_url = f"http://127.0.0.1:{upstream.server_address[1]}/v1"
+    results = {"latency_seconds": args.latency}
+    modes = ["dev", "production"] if args.mode == "both" else [args.mode]
+    scratch_dir = tempfile.TemporaryDirectory()
+    for mode in modes:
+        process = start_api(mode, args.port, upstream_url, args.workers, args.threads, scratch_dir.name)
+        try:
+            results[mode] = run_load(args.port, args.requests, args.concurrency)
+            if mode == "production":
+                results[mode]["drain"] = run_drain_check(process, args.port, args.concurrency, upstream)
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+        line = results[mode]
+        print(f"{mode}: {line['requests_per_second']:.1f} req/s, p50 {line['p50_seconds']:.2f}s, "
+              f"p95 {line['p95_seconds']:.2f}s, {line['errors']} errors")
+    upstream.shutdown()
+    scratch_dir.cleanup()
+
+    if "drain" in results.get("production", {}):
+        drain = results["production"]["drain"]
+        print(f"Graceful shutdown: {drain['completed']} of {drain['in_flight']} in-flight requests completed")
+    os.makedirs(output_dir, exist_ok=True)
+    output_file = os.path.join(output_dir, "load_test.json")
+    with open(output_file, 'w') as f:
+        json.dump(results, f, indent=4)
+    print(f"Load test results saved to {output_file}")
@@ -0,0 +1,341 @@
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+import functools
+from contextlib import contextmanager
+
+# Metric name to (type, help text); only these names are rendered
+metric_definitions = {
+    "gpt_http_requests_total": ("counter", "HTTP requests by endpoint, method and status code."),
+    "gpt_http_request_duration_seconds": ("histogram", "Time to produce the HTTP response by endpoint; streamed bodies are not included."),
+    "gpt_http_requests_in_flight": ("gauge", "HTTP requests being handled."),
+    "gpt_operation_duration_seconds": ("histogram", "Duration of summarize, verify, corrections and dependency analysis calls."),
+    "gpt_operation_errors_total": ("counter", "Operations that raised an error."),
+    "gpt_operations_in_flight": ("gauge", "Operations being run."),
+    "gpt_upstream_duration_seconds": ("histogram", "Latency of OpenAI requests by model."),
+    "gpt_upstream_requests_total": ("counter", "OpenAI requests by model and outcome."),
+    "gpt_tokens_total": ("counter", "Tokens used by model and type (prompt, completion)."),
+    "gpt_prompt_tokens_saved_total": ("counter", "Estimated prompt tokens saved by minifying code, by operation."),
+    "gpt_cache_requests_total": ("counter", "Response cache lookups by result (hit, miss)."),
+    "gpt_cache_hit_ratio": ("gauge", "Share of response cache lookups answered from the cache."),
+    "gpt_coalesced_requests_total": ("counter", "Requests that shared an identical in-flight upstream call."),
+    "gpt_rate_limiter_wait_seconds": ("histogram", "Time spent waiting for the rate limiter before an OpenAI request."),
+}
+
+# Upper bounds of the histogram buckets in seconds; model calls take up to minutes
+histogram_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# With several server workers, each writes its metrics here and /metrics merges them
+metrics_dir = os.getenv('GPT_METRICS_DIR')
+snapshot_interval = float(os.getenv('GPT_METRICS_INTERVAL', '5'))
+# Counters and histograms of exited workers, so totals do not drop when a worker is replaced
+retired_snapshot_name = 'retired.json'
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+# (name, labels) to [count per bucket plus one for +Inf, sum, count]
+_histograms = {}
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+def inc(name, value=1, **labels):
+    """
+    Add to a counter.
+    """
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def add_gauge(name, value, **labels):
+    """
+    Add to a gauge; a negative value decreases it.
+    """
+    key = _key(name, labels)
+    with _lock:
+        _gauges[key] = _gauges.get(key, 0) + value
+
+def observe(name, value, **labels):
+    """
+    Record a value, usually a duration in seconds, in a histogram.
+    """
+    key = _key(name, labels)
+    index = bisect.bisect_left(histogram_buckets, value)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [[0] * (len(histogram_buckets) + 1), 0.0, 0]
+        histogram[0][index] += 1
+        histogram[1] += value
+        histogram[2] += 1
+
+@contextmanager
+def track_operation(operation):
+    """
+    Count an operation as in flight while it runs, then record its duration
+    and whether it raised.
+
+    Parameters:
+        operation (str): Name of the operation, used as label.
+    """
+    add_gauge("gpt_operations_in_flight", 1, operation=operation)
+    start_time = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        inc("gpt_operation_errors_total", operation=operation)
+        raise
+    finally:
+        observe("gpt_operation_duration_seconds", time.perf_counter() - start_time, operation=operation)
+        add_gauge("gpt_operations_in_flight", -1, operation=operation)
+
+def instrumented(operation):
+    """
+    Decorate a function so every call is tracked with track_operation.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with track_operation(operation):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def instrument_app(app):
+    """
+    Count, time and track in-flight requests of a Flask app. Requests are
+    labelled with their URL rule rather than the path, so IDs in URLs do not
+    create new series.
+
+    Parameters:
+        app (Flask): The app to instrument.
+    """
+    from flask import g, request
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start_time = time.perf_counter()
+        add_gauge("gpt_http_requests_in_flight", 1)
+
+    @app.after_request
+    def count_request(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def finish_request_timer(error):
+        start_time = g.pop('metrics_start_time', None)
+        if start_time is None:
+            return
+        endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        status = g.pop('metrics_status', 500)
+        add_gauge("gpt_http_requests_in_flight", -1)
+        inc("gpt_http_requests_total", endpoint=endpoint, method=request.method, status=str(status))
+        observe("gpt_http_request_duration_seconds", time.perf_counter() - start_time, endpoint=endpoint)
+
+def snapshot():
+    """
+    Copy this process's metrics in a JSON-serializable form.
+
+    Returns:
+        dict: Lists of [name, labels, value] per metric kind.
+    """
+    with _lock:
+        return {
+            "counters": [[name, list(labels), value] for (name, labels), value in _counters.items()],
+            "gauges": [[name, list(labels), value] for (name, labels), value in _gauges.items()],
+            "histograms": [[name, list(labels), [list(h[0]), h[1], h[2]]] for (name, labels), h in _histograms.items()],
+        }
+
+def write_snapshot():
+    """
+    Write this process's metrics to metrics_dir for the other workers to merge.
+    """
+    if not metrics_dir:
+        return
+    path = os.path.join(metrics_dir, f"{os.getpid()}.json")
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'w') as f:
+        json.dump(snapshot(), f)
+    os.replace(temporary_path, path)
+
+def start_snapshot_thread():
+    """
+    Write snapshots every snapshot_interval seconds in a daemon thread, when
+    metrics_dir is set.
+    """
+    if not metrics_dir:
+        return
+
+    def write_periodically():
+        while True:
+            time.sleep(snapshot_interval)
+            try:
+                write_snapshot()
+            except OSError as e:
+                logging.error(f"Error writing metrics snapshot: {e}")
+
+    threading.Thread(target=write_periodically, name='metrics-snapshot', daemon=True).start()
+
+def clear_snapshots():
+    """
+    Remove the snapshots of a previous server, e.g. when it starts.
+    """
+    if metrics_dir and os.path.isdir(metrics_dir):
+        for name in os.listdir(metrics_dir):
+            if name.endswith('.json'):
+                os.remove(os.path.join(metrics_dir, name))
+
+def process_alive(pid):
+    """
+    Check whether a process is still running.
+
+    Parameters:
+        pid (int): The process ID.
+
+    Returns:
+        bool: False if the process has exited; always True where this cannot be checked.
+    """
+    if os.name != 'posix':
+        # os.kill would terminate the process on Windows
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def retire_snapshot(pid):
+    """
+    Fold the snapshot of an exited worker into retired.json and remove it.
+    Its counters and histograms keep counting towards the server's totals;
+    its gauges, such as requests in flight, are dropped.
+
+    Parameters:
+        pid (int): The process ID of the exited worker.
+    """
+    if not metrics_dir:
+        return
+    path = os.path.join(metrics_dir, f"{pid}.json")
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError) as e:
+        logging.error(f"Error reading metrics snapshot {path}: {e}")
+        data = None
+    if data is not None:
+        retired_path = os.path.join(metrics_dir, retired_snapshot_name)
+        try:
+            with open(retired_path) as f:
+                retired = json.load(f)
+        except (OSError, ValueError):
+            retired = {"counters": [], "gauges": [], "histograms": []}
+        counters, _, histograms = _merge([retired, data])
+        temporary_path = f"{retired_path}.tmp"
+        with open(temporary_path, 'w') as f:
+            json.dump({
+                "counters": [[name, list(labels), value] for (name, labels), value in counters.items()],
+                "gauges": [],
+                "histograms": [[name, list(labels), h] for (name, labels), h in histograms.items()],
+            }, f)
+        os.replace(temporary_path, retired_path)
+    os.remove(path)
+
+def _merge(snapshots):
+    counters, gauges, histograms = {}, {}, {}
+    for data in snapshots:
+        for name, labels, value in data["counters"]:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, value in data["gauges"]:
+            key = (name, tuple(map(tuple, labels)))
+            gauges[key] = gauges.get(key, 0) + value
+        for name, labels, (buckets, total, count) in data["histograms"]:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.setdefault(key, [[0] * len(buckets), 0.0, 0])
+            merged[0] = [a + b for a, b in zip(merged[0], buckets)]
+            merged[1] += total
+            merged[2] += count
+    return counters, gauges, histograms
+
+def _merged_snapshots():
+    """
+    Merge this process's live metrics with the latest snapshots of the other
+    workers. Gauges of workers that have exited are left out.
+    """
+    snapshots = [snapshot()]
+    if metrics_dir and os.path.isdir(metrics_dir):
+        own_name = f"{os.getpid()}.json"
+        for name in os.listdir(metrics_dir):
+            if not name.endswith('.json') or name == own_name:
+                continue
+            try:
+                with open(os.path.join(metrics_dir, name)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            # Killed before its snapshot was retired
+            pid = name[:-len('.json')]
+            if pid.isdigit() and not process_alive(int(pid)):
+                data["gauges"] = []
+            snapshots.append(data)
+    return _merge(snapshots)
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def render():
+    """
+    Render all workers' metrics in the Prometheus text exposition format.
+
+    Returns:
+        str: The metrics page.
+    """
+    counters, gauges, histograms = _merged_snapshots()
+    hits = sum(value for (name, labels), value in counters.items() if name == "gpt_cache_requests_total" and ("result", "hit") in labels)
+    lookups = sum(value for (name, labels), value in counters.items() if name == "gpt_cache_requests_total")
+    gauges[("gpt_cache_hit_ratio", ())] = hits / lookups if lookups else 0.0
+
+    lines = []
+    for name, (metric_type, help_text) in metric_definitions.items():
+        source = {"counter": counters, "gauge": gauges, "histogram": histograms}[metric_type]
+        series = sorted((labels, value) for (series_name, labels), value in source.items() if series_name == name)
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in series:
+            if metric_type != "histogram":
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            buckets, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip(histogram_buckets + (float('inf'),), buckets):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float('inf') else repr(bound)
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', le)])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+def reset():
+    """
+    Forget all metrics of this process.
+    """
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
@@ -0,0 +1,154 @@
+import io
+import os
+import re
+import ast
+import tokenize
+
+# Minify code before it is sent to the model; off unless GPT_MINIFY_PROMPTS=1
+minify_enabled = os.getenv('GPT_MINIFY_PROMPTS', '0') == '1'
+
+# What each operation drops besides trailing whitespace and runs of blank lines.
+# Comments explain intent, which summaries and corrections use; verification
+# judges the code itself. Comments are only dropped from Python, where
+# tokenize tells them apart from strings.
+minify_policies = {
+    "summarize": {"license": True, "comments": False},
+    "verify": {"license": True, "comments": True},
+    "corrections": {"license": True, "comments": False},
+}
+
+_license_words = re.compile(r"licen[cs]e|copyright|spdx-license-identifier|all rights reserved|permission is hereby granted", re.IGNORECASE)
+_python_comment_line = re.compile(r"\s*#")
+_comment_line = re.compile(r"\s*(#(\s|$)|//|/\*|\*|--|;)")
+
+def estimate_tokens(text):
+    """
+    Estimate the number of model tokens of a text, at about four characters
+    per token.
+    """
+    return (len(text) + 3) // 4
+
+def _is_python(content):
+    try:
+        ast.parse(content)
+        return True
+    except (SyntaxError, ValueError, MemoryError, RecursionError):
+        # Deeply nested input exhausts the parser rather than failing to parse
+        return False
+
+def _scan_python(content):
+    """
+    Find the comments of Python code and the lines that end inside a string,
+    whose trailing whitespace and blank lines belong to the string.
+
+    Returns:
+        tuple: (list of comment (row, column), set of rows ending inside a
+        string), or None if the code does not tokenize.
+    """
+    comments = []
+    string_rows = set()
+    fstring_starts = []
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(content).readline):
+            if token.type == tokenize.COMMENT:
+                comments.append(token.start)
+            elif token.type == tokenize.STRING:
+                string_rows.update(range(token.start[0], token.end[0]))
+            # Python 3.12 and later tokenize f-strings in parts
+            elif token.type == getattr(tokenize, 'FSTRING_START', None):
+                fstring_starts.append(token.start[0])
+            elif token.type == getattr(tokenize, 'FSTRING_END', None):
+                string_rows.update(range(fstring_starts.pop(), token.end[0]))
+    except (tokenize.TokenError, SyntaxError):
+        return None
+    return comments, string_rows
+
+def _license_header(lines, python):
+    """
+    Find the leading comment block of a file if it is a license header.
+
+    Returns:
+        range: Indexes of the header lines, empty if there is none.
+    """
+    comment_line = _python_comment_line if python else _comment_line
+    # Keep a shebang line
+    start = 1 if lines and lines[0].startswith("#!") else 0
+    end = start
+    while end < len(lines) and comment_line.match(lines[end]):
+        end += 1
+    if _license_words.search("\n".join(lines[start:end])):
+        return range(start, end)
+    return range(0)
+
+def minify(content, operation, path=None):
+    """
+    Remove content that does not change the code for an operation: license
+    headers, trailing whitespace, runs of blank lines and, depending on the
+    operation's policy, comments. Python is tokenized so nothing inside
+    strings is touched; Python that does not tokenize, such as a chunk ending
+    inside a statement or a string, is sent unchanged. Other languages keep
+    their comments.
+
+    Parameters:
+        content (str): The code to send.
+        operation (str): The operation (summarize, verify, corrections).
+        path (str): Path of the file, used to tell Python apart. Without it,
+            content is treated as Python if it parses.
+
+    Returns:
+        str: The minified code.
+    """
+    policy = minify_policies[operation]
+    python = path.endswith('.py') if path else _is_python(content)
+    comments, string_rows = [], set()
+    if python:
+        scanned = _scan_python(content)
+        if scanned is None:
+            # Without tokens there is no telling which lines are inside strings
+            return content
+        comments, string_rows = scanned
+    # Rows as tokenize counts them, split at newlines only
+    lines = content.split("\n")
+    dropped = set()
+
+    if policy["license"]:
+        dropped.update(_license_header(lines, python))
+    if policy["comments"]:
+        for row, column in comments:
+            code = lines[row - 1][:column].rstrip()
+            if code:
+                lines[row - 1] = code
+            else:
+                dropped.add(row - 1)
+
+    minified = []
+    for index, line in enumerate(lines):
+        if index in dropped:
+            continue
+        if index + 1 not in string_rows:
+            line = line.rstrip()
+            if not line and minified and not minified[-1]:
+                continue
+        minified.append(line)
+    while minified and not minified[-1]:
+        minified.pop()
+    while minified and not minified[0]:
+        minified.pop(0)
+    return "\n".join(minified)
+
+def prepare_content(content, operation, path=None):
+    """
+    Minify code for an operation when GPT_MINIFY_PROMPTS is enabled.
+
+    Parameters:
+        content (str): The code to send.
+        operation (str): The operation (summarize, verify, corrections).
+        path (str): Path of the file, if known.
+
+    Returns:
+        tuple: (code to send, estimated tokens saved).
+    """
+    if not minify_enabled:
+        return content, 0
+    minified = minify(content, operation, path)
+    return minified, estimate_tokens(content) - estimate_tokens(minified)
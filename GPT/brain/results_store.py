@@ -0,0 +1,647 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+
+# Ensure the output directory exists
+output_dir = os.path.join(os.path.dirname(__file__), '../iteration/output_files')
+os.makedirs(output_dir, exist_ok=True)
+
+# Results database shared by all pipeline stages and the API
+results_db_path = os.path.join(output_dir, "results.db")
+
+# The run this process is writing results for, set by start_run
+current_run_id = None
+
+# One connection per thread and database path
+_local = threading.local()
+
+# Bumped whenever the tables change incompatibly; older runs and results are kept
+# under versioned table names (runs_v4, results_v4, ...) but no longer read
+schema_version = 5
+
+schema = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    root_directory TEXT NOT NULL DEFAULT '',
+    -- HEAD of the root directory's git repository when the run started, if any
+    git_commit TEXT NOT NULL DEFAULT '',
+    started_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    chunk_path TEXT NOT NULL,
+    chunk_offset INTEGER NOT NULL DEFAULT 0,
+    chunk_length INTEGER NOT NULL DEFAULT 0,
+    chunk_hash TEXT NOT NULL DEFAULT '',
+    content_hash TEXT NOT NULL,
+    summary TEXT NOT NULL DEFAULT '',
+    verification TEXT NOT NULL DEFAULT '',
+    verdict TEXT NOT NULL,
+    corrections TEXT NOT NULL DEFAULT '',
+    model TEXT NOT NULL DEFAULT '',
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    latency_seconds REAL NOT NULL DEFAULT 0,
+    -- Estimated prompt tokens saved by minifying the code sent
+    tokens_saved INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    -- Also serves as the index on path within a run
+    UNIQUE (run_id, path, chunk_index)
+);
+CREATE INDEX IF NOT EXISTS results_verdict ON results (run_id, verdict);
+-- Summaries by the hash of what they summarize, shared by all runs
+CREATE TABLE IF NOT EXISTS summary_cache (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+-- The file, directory and package summaries of a run
+CREATE TABLE IF NOT EXISTS summary_nodes (
+    run_id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    summary TEXT NOT NULL DEFAULT '',
+    created_at REAL NOT NULL,
+    PRIMARY KEY (run_id, path)
+);
+-- Scan jobs of the API, shared by all server workers
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    root_directory TEXT NOT NULL,
+    -- JSON lists
+    operations TEXT NOT NULL,
+    dependencies TEXT,
+    status TEXT NOT NULL,
+    files_total INTEGER NOT NULL DEFAULT 0,
+    files_done INTEGER NOT NULL DEFAULT 0,
+    files_failed INTEGER NOT NULL DEFAULT 0,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    tokens_saved INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    -- The process running the job, and whether any worker asked it to stop
+    pid INTEGER NOT NULL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0
+);
+CREATE VIEW IF NOT EXISTS file_status AS
+    SELECT run_id, path, content_hash, MIN(verdict = 'Verified') AS verified, COUNT(*) AS chunks,
+           SUM(prompt_tokens) AS prompt_tokens, SUM(completion_tokens) AS completion_tokens,
+           SUM(latency_seconds) AS latency_seconds, SUM(tokens_saved) AS tokens_saved
+    FROM results GROUP BY run_id, path;
+CREATE VIEW IF NOT EXISTS corrections_needed AS
+    SELECT run_id, path, chunk_index, chunk_path, corrections FROM results WHERE verdict = 'Failed';
+"""
+
+result_columns = ("path", "chunk_offset", "chunk_length", "chunk_hash", "summary", "verification", "verdict",
+                  "corrections", "model", "prompt_tokens", "completion_tokens", "latency_seconds", "tokens_saved")
+
+def get_connection():
+    """
+    Get this thread's connection to the results database, creating the
+    database on first use. WAL mode lets the API read while the pipeline writes,
+    and every stored file is a committed transaction that survives a crash.
+
+    Returns:
+        sqlite3.Connection: Connection returning rows as sqlite3.Row.
+    """
+    connections = _local.__dict__.setdefault('connections', {})
+    connection = connections.get(results_db_path)
+    if connection is None:
+        connection = sqlite3.connect(results_db_path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=FULL")
+        if connection.execute("PRAGMA user_version").fetchone()[0] != schema_version:
+            archive_old_tables(connection)
+        connection.executescript(schema)
+        connections[results_db_path] = connection
+    return connection
+
+def archive_old_tables(connection):
+    """
+    Move the runs and results tables of an older schema version aside, so the
+    current schema can be created without losing them.
+
+    Parameters:
+        connection (sqlite3.Connection): Connection to the results database.
+    """
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        # Another process may have upgraded the database in the meantime
+        old_version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if old_version != schema_version:
+            tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            # The views and the named index would follow the renamed tables
+            connection.execute("DROP VIEW IF EXISTS file_status")
+            connection.execute("DROP VIEW IF EXISTS corrections_needed")
+            connection.execute("DROP INDEX IF EXISTS results_verdict")
+            for table in ("runs", "results"):
+                if table not in tables:
+                    continue
+                archived = f"{table}_v{old_version}"
+                suffix = 1
+                while archived in tables:
+                    archived = f"{table}_v{old_version}_{suffix}"
+                    suffix += 1
+                connection.execute(f"ALTER TABLE {table} RENAME TO {archived}")
+                tables.add(archived)
+                logging.warning(f"{results_db_path} has schema version {old_version}, not {schema_version}; "
+                                f"its {table} table was kept as {archived} and is no longer used.")
+            connection.execute(f"PRAGMA user_version = {schema_version}")
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+
+def reset_connections():
+    """
+    Forget the connections opened so far, e.g. in a server worker forked from
+    a process that had already opened the database. SQLite connections must
+    not be shared across a fork.
+    """
+    global _local
+    _local = threading.local()
+
+def file_hash(file_path):
+    """
+    Compute the content hash of a file without reading it into memory at once.
+
+    Parameters:
+        file_path (str): Path to the file.
+
+    Returns:
+        str: SHA-256 hex digest of the file content.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def verdict_of(verification):
+    """
+    Reduce a verification response to a verdict: Failed, Verified or Unknown.
+    A response mentioning Failed is Failed even if it also mentions Verified,
+    and a file is verified only when every one of its chunks is Verified.
+    """
+    if "Failed" in verification:
+        return "Failed"
+    if "Verified" in verification:
+        return "Verified"
+    return "Unknown"
+
+def start_run(run_id=None, resume=False, root_directory="", git_commit=""):
+    """
+    Start writing results for a run. A new run starts empty; a resumed run
+    keeps the files it already finished, so they are not analyzed again.
+
+    Parameters:
+        run_id (str): Identifier of the run. Defaults to a timestamp, or with
+            resume to the most recent unfinished run.
+        resume (bool): Keep the results already stored for the run.
+        root_directory (str): The root directory the run analyzes.
+        git_commit (str): The commit of the root directory the run analyzes.
+
+    Returns:
+        str: The run ID.
+    """
+    global current_run_id
+    connection = get_connection()
+    if run_id is None and resume:
+        row = connection.execute(
+            "SELECT run_id FROM runs WHERE finished_at IS NULL ORDER BY started_at DESC LIMIT 1"
+        ).fetchone()
+        run_id = row["run_id"] if row else None
+        if run_id is None:
+            logging.info("No unfinished run to resume, starting a new run.")
+    if run_id is None:
+        run_id = time.strftime("%Y%m%d_%H%M%S")
+
+    create_run(run_id, root_directory, resume, git_commit)
+    finished = connection.execute("SELECT COUNT(DISTINCT path) FROM results WHERE run_id = ?", (run_id,)).fetchone()[0]
+    logging.info(f"{'Resuming' if resume else 'Starting'} run {run_id} with {finished} files already finished.")
+    current_run_id = run_id
+    return run_id
+
+def create_run(run_id, root_directory="", resume=False, git_commit=""):
+    """
+    Record a run without making it the current run of this process, for
+    callers such as API jobs that write several runs at once.
+
+    Parameters:
+        run_id (str): Identifier of the run.
+        root_directory (str): The root directory the run analyzes.
+        resume (bool): Keep the results already stored for the run.
+        git_commit (str): The commit of the root directory the run analyzes.
+    """
+    connection = get_connection()
+    with connection:
+        if not resume:
+            connection.execute("DELETE FROM results WHERE run_id = ?", (run_id,))
+            connection.execute("DELETE FROM summary_nodes WHERE run_id = ?", (run_id,))
+            connection.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+        connection.execute(
+            "INSERT OR IGNORE INTO runs (run_id, root_directory, git_commit, started_at) VALUES (?, ?, ?, ?)",
+            (run_id, root_directory, git_commit, time.time())
+        )
+        connection.execute("UPDATE runs SET finished_at = NULL WHERE run_id = ?", (run_id,))
+
+def finish_run(run_id=None):
+    """
+    Mark a run as finished, so a later resume does not pick it up.
+
+    Parameters:
+        run_id (str): The run to finish. Defaults to the current run.
+    """
+    run_id = run_id or current_run_id
+    if run_id is None:
+        return
+    connection = get_connection()
+    with connection:
+        connection.execute("UPDATE runs SET finished_at = ? WHERE run_id = ?", (time.time(), run_id))
+
+def latest_run_id():
+    """
+    Get the run results are read from: the current run of this process, or
+    else the most recently started run.
+
+    Returns:
+        str: The run ID, or None if no run has been started.
+    """
+    if current_run_id is not None:
+        return current_run_id
+    row = get_connection().execute("SELECT run_id FROM runs ORDER BY started_at DESC LIMIT 1").fetchone()
+    return row["run_id"] if row else None
+
+def last_analyzed_commit(root_directory, run_id=None):
+    """
+    Find the most recent finished run of a root directory that recorded its
+    git commit, for analyzing only what changed since.
+
+    Parameters:
+        root_directory (str): The root directory the run analyzed.
+        run_id (str): A run to leave out, usually the current one.
+
+    Returns:
+        dict: The run's "run_id" and "git_commit", or None if there is none.
+    """
+    row = get_connection().execute(
+        "SELECT run_id, git_commit FROM runs WHERE root_directory = ? AND git_commit != '' "
+        "AND finished_at IS NOT NULL AND run_id != ? ORDER BY started_at DESC LIMIT 1",
+        (root_directory, run_id or "")
+    ).fetchone()
+    return dict(row) if row else None
+
+def list_runs():
+    """
+    List all runs, most recent first.
+
+    Returns:
+        list: Dicts with "run_id", "root_directory", "git_commit", "started_at" and "finished_at".
+    """
+    return [dict(row) for row in get_connection().execute("SELECT * FROM runs ORDER BY started_at DESC")]
+
+job_columns = ("job_id", "root_directory", "operations", "dependencies", "status", "files_total", "files_done",
+               "files_failed", "prompt_tokens", "completion_tokens", "tokens_saved", "error", "created_at",
+               "started_at", "finished_at", "pid")
+
+def _job_record(row):
+    record = dict(row)
+    record["operations"] = json.loads(record["operations"])
+    if record["dependencies"] is not None:
+        record["dependencies"] = json.loads(record["dependencies"])
+    record["cancel_requested"] = bool(record["cancel_requested"])
+    return record
+
+def save_job(job):
+    """
+    Store a job's progress. The cancel flag is left as it is, and a job that
+    was asked to stop and has not finished is reported as cancelling.
+
+    Parameters:
+        job (dict): Values for job_columns; operations and dependencies are lists.
+    """
+    values = dict(job, operations=json.dumps(job["operations"]),
+                  dependencies=None if job["dependencies"] is None else json.dumps(job["dependencies"]))
+    updates = ", ".join(f"{column} = excluded.{column}" for column in job_columns[1:] if column != "status")
+    connection = get_connection()
+    with connection:
+        connection.execute(
+            f"INSERT INTO jobs ({', '.join(job_columns)}) VALUES ({', '.join('?' * len(job_columns))}) "
+            f"ON CONFLICT (job_id) DO UPDATE SET {updates}, status = CASE "
+            "WHEN jobs.cancel_requested AND excluded.finished_at IS NULL THEN 'cancelling' ELSE excluded.status END",
+            [values[column] for column in job_columns]
+        )
+
+def get_job_record(job_id):
+    """
+    Get a stored job, or None if there is no such job.
+
+    Returns:
+        dict: The job_columns and "cancel_requested".
+    """
+    row = get_connection().execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return None if row is None else _job_record(row)
+
+def list_job_records():
+    """
+    List all stored jobs, most recent first.
+    """
+    return [_job_record(row) for row in get_connection().execute("SELECT * FROM jobs ORDER BY created_at DESC")]
+
+def request_job_cancel(job_id):
+    """
+    Ask the process running a job to stop it. An unfinished job is reported
+    as cancelling until that process notices.
+
+    Returns:
+        bool: False if there is no such job.
+    """
+    connection = get_connection()
+    with connection:
+        cursor = connection.execute(
+            "UPDATE jobs SET cancel_requested = 1, "
+            "status = CASE WHEN finished_at IS NULL THEN 'cancelling' ELSE status END WHERE job_id = ?",
+            (job_id,)
+        )
+    return cursor.rowcount > 0
+
+def fail_unfinished_job(job_id, error):
+    """
+    Mark a job failed, unless it finished in the meantime.
+    """
+    connection = get_connection()
+    with connection:
+        connection.execute(
+            "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE job_id = ? AND finished_at IS NULL",
+            (error, time.time(), job_id)
+        )
+
+def prune_jobs(max_age, max_finished):
+    """
+    Forget finished jobs older than max_age seconds, and the oldest finished
+    jobs beyond max_finished.
+    """
+    connection = get_connection()
+    with connection:
+        connection.execute("DELETE FROM jobs WHERE finished_at < ?", (time.time() - max_age,))
+        connection.execute(
+            "DELETE FROM jobs WHERE job_id IN (SELECT job_id FROM jobs WHERE finished_at IS NOT NULL "
+            "ORDER BY finished_at DESC LIMIT -1 OFFSET ?)",
+            (max_finished,)
+        )
+
+def reset_results():
+    """
+    Remove all results of the current run.
+    """
+    connection = get_connection()
+    with connection:
+        connection.execute("DELETE FROM results WHERE run_id = ?", (latest_run_id(),))
+
+def get_result(file_path, content_hash, run_id=None):
+    """
+    Get the stored result of a file in the current run, if it was analyzed
+    with the same content.
+
+    Parameters:
+        file_path (str): Path to the file.
+        content_hash (str): Current content hash of the file, or None to get
+            the result whatever content it was analyzed with.
+        run_id (str): The run to look in. Defaults to the latest run.
+
+    Returns:
+        dict: "hash", "verified" and the per-chunk "chunks" of the file, or
+        None if the file is missing or has changed since.
+    """
+    rows = get_connection().execute(
+        f"SELECT content_hash, chunk_path, {', '.join(result_columns[1:])} FROM results "
+        "WHERE run_id = ? AND path = ? ORDER BY chunk_index",
+        (run_id or latest_run_id(), file_path)
+    ).fetchall()
+    if not rows or content_hash is not None and rows[0]["content_hash"] != content_hash:
+        return None
+    chunks = []
+    for row in rows:
+        chunk = dict(row)
+        del chunk["content_hash"]
+        chunk["path"] = chunk.pop("chunk_path")
+        chunks.append(chunk)
+    return {
+        "hash": rows[0]["content_hash"],
+        "verified": all(chunk["verdict"] == "Verified" for chunk in chunks),
+        "chunks": chunks
+    }
+
+def store_result(file_path, content_hash, chunks, run_id=None):
+    """
+    Store the results of analyzing a file in the current run, replacing any
+    earlier result. The file is committed as one transaction, so an interrupted
+    run keeps every file stored before the interruption.
+
+    Parameters:
+        file_path (str): Path to the file.
+        content_hash (str): Content hash of the analyzed file.
+        chunks (list): One dict per analyzed part of the file, with "path",
+            "summary", "verification" and "corrections", and optionally the
+            chunk reference ("chunk_offset", "chunk_length", "chunk_hash"),
+            "model", "prompt_tokens", "completion_tokens", "latency_seconds" and "tokens_saved".
+        run_id (str): The run to store in. Defaults to the current run.
+
+    Returns:
+        dict: The stored result, as returned by get_result.
+    """
+    run_id = run_id or current_run_id or start_run(resume=True)
+    now = time.time()
+    connection = get_connection()
+    with connection:
+        connection.execute("DELETE FROM results WHERE run_id = ? AND path = ?", (run_id, file_path))
+        connection.executemany(
+            "INSERT INTO results (run_id, path, chunk_index, chunk_path, chunk_offset, chunk_length, chunk_hash, "
+            "content_hash, summary, verification, verdict, corrections, model, prompt_tokens, completion_tokens, "
+            "latency_seconds, tokens_saved, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (run_id, file_path, index, chunk["path"], chunk.get("chunk_offset", 0), chunk.get("chunk_length", 0),
+                 chunk.get("chunk_hash", ""), content_hash, chunk["summary"], chunk["verification"],
+                 verdict_of(chunk["verification"]), chunk["corrections"], chunk.get("model", ""),
+                 chunk.get("prompt_tokens", 0), chunk.get("completion_tokens", 0),
+                 chunk.get("latency_seconds", 0.0), chunk.get("tokens_saved", 0), now)
+                for index, chunk in enumerate(chunks)
+            ]
+        )
+    return get_result(file_path, content_hash, run_id)
+
+def get_cached_summary(key):
+    """
+    Get a summary from the summary cache.
+
+    Parameters:
+        key (str): Cache key of the summarized content.
+
+    Returns:
+        str: The summary, or None if it is not cached.
+    """
+    row = get_connection().execute("SELECT summary FROM summary_cache WHERE key = ?", (key,)).fetchone()
+    return row["summary"] if row else None
+
+def store_cached_summary(key, kind, summary):
+    """
+    Store a summary in the summary cache.
+
+    Parameters:
+        key (str): Cache key of the summarized content.
+        kind (str): What was summarized: chunk, file, directory or package.
+        summary (str): The summary.
+    """
+    connection = get_connection()
+    with connection:
+        connection.execute(
+            "INSERT OR REPLACE INTO summary_cache (key, kind, summary, created_at) VALUES (?, ?, ?, ?)",
+            (key, kind, summary, time.time())
+        )
+
+def store_summary_node(path, kind, summary, run_id=None):
+    """
+    Store the summary of a file, directory or package in the current run.
+
+    Parameters:
+        path (str): Path of the file or directory.
+        kind (str): file, directory or package.
+        summary (str): The summary.
+        run_id (str): The run to store in. Defaults to the current run.
+    """
+    run_id = run_id or current_run_id or start_run(resume=True)
+    connection = get_connection()
+    with connection:
+        connection.execute(
+            "INSERT OR REPLACE INTO summary_nodes (run_id, path, kind, summary, created_at) VALUES (?, ?, ?, ?, ?)",
+            (run_id, path, kind, summary, time.time())
+        )
+
+def query_summaries(path=None, kind=None, run_id=None):
+    """
+    Query the file, directory and package summaries of a run.
+
+    Parameters:
+        path (str): Only return the summary of this file or directory.
+        kind (str): Only return summaries of this kind.
+        run_id (str): The run to query. Defaults to the latest run.
+
+    Returns:
+        list: Dicts with "path", "kind" and "summary", ordered by path.
+    """
+    conditions = ["run_id = ?"]
+    parameters = [run_id or latest_run_id()]
+    if path is not None:
+        conditions.append("path = ?")
+        parameters.append(path)
+    if kind is not None:
+        conditions.append("kind = ?")
+        parameters.append(kind)
+    rows = get_connection().execute(
+        f"SELECT path, kind, summary FROM summary_nodes WHERE {' AND '.join(conditions)} ORDER BY path", parameters
+    )
+    return [dict(row) for row in rows]
+
+def query_results(path=None, verdict=None, limit=None, run_id=None):
+    """
+    Query stored chunk results.
+
+    Parameters:
+        path (str): Only return results of this file.
+        verdict (str): Only return results with this verdict.
+        limit (int): Maximum number of results.
+        run_id (str): The run to query. Defaults to the latest run.
+
+    Returns:
+        list: Result dicts ordered by file and chunk.
+    """
+    conditions = ["run_id = ?"]
+    parameters = [run_id or latest_run_id()]
+    if path is not None:
+        conditions.append("path = ?")
+        parameters.append(path)
+    if verdict is not None:
+        conditions.append("verdict = ?")
+        parameters.append(verdict)
+    query = "SELECT run_id, chunk_path, content_hash, chunk_index, created_at, " + ", ".join(result_columns) + " FROM results"
+    query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY path, chunk_index"
+    if limit is not None:
+        query += " LIMIT ?"
+        parameters.append(int(limit))
+    return [dict(row) for row in get_connection().execute(query, parameters)]
+
+def file_statuses(run_id=None):
+    """
+    Get the verification status of every file stored for a run.
+
+    Parameters:
+        run_id (str): The run to query. Defaults to the latest run.
+
+    Returns:
+        list: Dicts from the file_status view, ordered by path.
+    """
+    rows = get_connection().execute(
+        "SELECT * FROM file_status WHERE run_id = ? ORDER BY path", (run_id or latest_run_id(),)
+    )
+    return [dict(row) for row in rows]
+
+def render_log(log_file_path):
+    """
+    Render the summaries and verifications of the latest run as the GPTlog.txt text report.
+
+    Parameters:
+        log_file_path (str): Path of the report to write.
+    """
+    rows = get_connection().execute(
+        "SELECT chunk_path, summary, verification FROM results WHERE run_id = ? ORDER BY created_at, id",
+        (latest_run_id(),)
+    )
+    with open(log_file_path, 'w') as log_file:
+        for row in rows:
+            log_file.write(f"File: {row['chunk_path']}\nSummary:\n{row['summary']}\n\nVerification:\n{row['verification']}\n\n")
+
+def render_corrections(corrections_file_path):
+    """
+    Render the corrections_needed view of the latest run as the corrections_list.txt text report.
+
+    Parameters:
+        corrections_file_path (str): Path of the report to write.
+    """
+    rows = get_connection().execute(
+        "SELECT chunk_path, corrections FROM corrections_needed WHERE run_id = ? ORDER BY path, chunk_index",
+        (latest_run_id(),)
+    )
+    with open(corrections_file_path, 'w') as corrections_file:
+        corrections_file.write("Corrections:\n")
+        for row in rows:
+            corrections_file.write(f"{row['chunk_path']} needs correction:\n{row['corrections']}\n")
+
+def render_summaries(summaries_file_path):
+    """
+    Render the directory and package summaries of the latest run, followed by
+    the file summaries, as the summaries.txt text report.
+
+    Parameters:
+        summaries_file_path (str): Path of the report to write.
+    """
+    rows = get_connection().execute(
+        "SELECT path, kind, summary FROM summary_nodes WHERE run_id = ? ORDER BY kind = 'file', path",
+        (latest_run_id(),)
+    )
+    with open(summaries_file_path, 'w') as summaries_file:
+        for row in rows:
+            summaries_file.write(f"{row['kind'].capitalize()}: {row['path']}\nSummary:\n{row['summary']}\n\n")
@@ -0,0 +1,109 @@
+import os
+import argparse
+import tempfile
+import multiprocessing
+
+from gunicorn.app.base import BaseApplication
+
+def server_options(bind=None, workers=None, threads=None, graceful_timeout=None):
+    """
+    Build the gunicorn settings for the API. Unset values come from the
+    environment, then from defaults suited to requests that mostly wait on the
+    upstream model: a few processes, each with many threads.
+
+    Parameters:
+        bind (str): Address to listen on, e.g. 0.0.0.0:5000.
+        workers (int): Number of worker processes.
+        threads (int): Number of request threads per worker.
+        graceful_timeout (int): Seconds a stopping worker has to finish in-flight requests.
+
+    Returns:
+        dict: gunicorn settings.
+    """
+    graceful_timeout = graceful_timeout or int(os.getenv('GPT_GRACEFUL_TIMEOUT', '120'))
+    return {
+        "bind": bind or os.getenv('GPT_BIND', '0.0.0.0:5000'),
+        "workers": workers or int(os.getenv('GPT_WORKERS', str(min(multiprocessing.cpu_count(), 4)))),
+        "worker_class": "gthread",
+        "threads": threads or int(os.getenv('GPT_THREADS', '16')),
+        # Import the app once in the master; workers fork with it already loaded
+        "preload_app": True,
+        "graceful_timeout": graceful_timeout,
+        # Upstream calls can be slow, so only kill workers that stop responding for longer than a drain
+        "timeout": max(int(os.getenv('GPT_WORKER_TIMEOUT', '180')), graceful_timeout),
+        "keepalive": 5,
+        "accesslog": "-",
+        "on_starting": on_starting,
+        "post_fork": post_fork,
+        "worker_exit": worker_exit,
+        "child_exit": child_exit,
+    }
+
+def on_starting(server):
+    """
+    gunicorn hook run in the master before workers are forked. Snapshots
+    left by a previous server in the same metrics directory are removed.
+    """
+    from brain import metrics
+    metrics.clear_snapshots()
+
+def post_fork(server, worker):
+    """
+    gunicorn hook run in each worker after it is forked.
+    """
+    from brain import integration_api
+    integration_api.init_worker()
+
+def worker_exit(server, worker):
+    """
+    gunicorn hook run in each worker once it has stopped serving requests.
+    In-flight requests have finished or the graceful timeout has passed;
+    background jobs and batch items are drained here.
+    """
+    from brain import integration_api
+    integration_api.drain()
+
+def child_exit(server, worker):
+    """
+    gunicorn hook run in the master after a worker has exited, including
+    workers killed after the timeout. The worker's metrics snapshot is
+    retired so its in-flight gauges no longer count.
+    """
+    from brain import metrics
+    try:
+        metrics.retire_snapshot(worker.pid)
+    except OSError as e:
+        server.log.error(f"Error retiring metrics snapshot of worker {worker.pid}: {e}")
+
+class ProductionServer(BaseApplication):
+    """
+    Serve integration_api under gunicorn with the given settings.
+    """
+
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from brain.integration_api import app
+        return app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the integration API with multiple workers.")
+    parser.add_argument('--bind', help="Address to listen on (GPT_BIND, default 0.0.0.0:5000)")
+    parser.add_argument('--workers', type=int, help="Worker processes (GPT_WORKERS, default min(CPUs, 4))")
+    parser.add_argument('--threads', type=int, help="Request threads per worker (GPT_THREADS, default 16)")
+    parser.add_argument('--graceful-timeout', type=int, help="Seconds to drain a stopping worker (GPT_GRACEFUL_TIMEOUT, default 120)")
+    args = parser.parse_args()
+
+    # Workers share their metrics through this directory, so /metrics covers all of them
+    os.environ.setdefault('GPT_METRICS_DIR', tempfile.mkdtemp(prefix='gpt-metrics-'))
+    # and one upstream rate limit through this file
+    os.environ.setdefault('GPT_RATE_LIMIT_STATE', os.path.join(tempfile.mkdtemp(prefix='gpt-rate-limit-'), 'bucket'))
+    options = server_options(args.bind, args.workers, args.threads, args.graceful_timeout)
+    print(f"Serving on {options['bind']} with {options['workers']} workers x {options['threads']} threads")
+    ProductionServer(options).run()
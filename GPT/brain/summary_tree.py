@@ -0,0 +1,130 @@
+import os
+import hashlib
+import logging
+from collections import defaultdict
+
+from brain.results_store import get_cached_summary, store_cached_summary, store_summary_node
+
+# Most characters of summaries combined in one request; more are combined in groups, then again
+reduce_input_chars = int(os.getenv('GPT_REDUCE_INPUT_CHARS', '12000'))
+
+def summary_key(kind, text):
+    """
+    Key a summary by what it summarizes. For a chunk this is the chunk hash,
+    so unchanged chunks are found again wherever they move in a file.
+
+    Parameters:
+        kind (str): What is summarized: chunk, file, directory or package.
+        text (str): The chunk content, or the summaries being combined.
+
+    Returns:
+        str: The cache key.
+    """
+    return f"{kind}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+def cached_summary(kind, text, produce):
+    """
+    Get the summary of a text from the summary cache, producing and caching
+    it if it is not there. Empty summaries mean the request failed and are not
+    cached, so they are requested again next time.
+
+    Parameters:
+        kind (str): What is summarized: chunk, file, directory or package.
+        text (str): The text to summarize.
+        produce (callable): Called with the text to produce the summary on a miss.
+
+    Returns:
+        str: The summary.
+    """
+    key = summary_key(kind, text)
+    summary = get_cached_summary(key)
+    if summary is None:
+        summary = produce(text)
+        if summary:
+            store_cached_summary(key, kind, summary)
+    return summary
+
+def reduce_summaries(summaries, kind, combine):
+    """
+    Combine summaries into one. Summaries that do not fit in one request are
+    combined in groups and the results combined again. Every combination is
+    cached by its input, so when one summary changes only the combinations
+    that include it are requested again. A single summary is returned as is.
+    When a combination fails, the summaries of that group are passed on
+    uncombined, so no child is dropped from the result.
+
+    Parameters:
+        summaries (list): The summaries, in order.
+        kind (str): What the result summarizes: file, directory or package.
+        combine (callable): Called with the joined summaries and the kind,
+            returns their combined summary.
+
+    Returns:
+        str: The combined summary, or "" if there are no summaries.
+    """
+    summaries = [summary for summary in summaries if summary]
+    while len(summaries) > 1:
+        groups = [[]]
+        size = 0
+        for summary in summaries:
+            if len(groups[-1]) >= 2 and size + len(summary) > reduce_input_chars:
+                groups.append([])
+                size = 0
+            groups[-1].append(summary)
+            size += len(summary) + 2
+        combined = []
+        for group in groups:
+            if len(group) == 1:
+                combined.append(group[0])
+                continue
+            text = "\n\n".join(group)
+            summary = cached_summary(kind, text, lambda text: combine(text, kind))
+            if not summary:
+                # Keep what the children say rather than losing it; it is combined again next time
+                logging.warning(f"Combining {len(group)} {kind} summaries failed; keeping them uncombined")
+                summary = text
+            combined.append(summary)
+        summaries = combined
+    return summaries[0] if summaries else ""
+
+def summarize_tree(root_directory, file_summaries, combine, run_id=None):
+    """
+    Combine file summaries into summaries of every directory up to the root
+    directory, deepest first. Directories with an __init__.py are summarized
+    as packages. All file and directory summaries are stored in the run.
+
+    Parameters:
+        root_directory (str): The root directory the files were listed from.
+        file_summaries (dict): File path to the summary of the file.
+        combine (callable): Called with the joined summaries and the kind,
+            returns their combined summary.
+        run_id (str): The run to store in. Defaults to the current run.
+
+    Returns:
+        dict: Directory path to the summary of the directory.
+    """
+    root_directory = os.path.normpath(root_directory)
+    # Directory to (name, summary) of the files and subdirectories in it
+    entries = defaultdict(list)
+    directories = {root_directory}
+    for path, summary in file_summaries.items():
+        store_summary_node(path, "file", summary, run_id)
+        directory = os.path.dirname(os.path.normpath(path))
+        entries[directory].append((os.path.basename(path), summary))
+        while len(directory) > len(root_directory) and directory not in directories:
+            directories.add(directory)
+            directory = os.path.dirname(directory)
+
+    directory_summaries = {}
+    for directory in sorted(directories, key=lambda path: (-path.count(os.sep), path)):
+        kind = "package" if os.path.exists(os.path.join(directory, "__init__.py")) else "directory"
+        named = sorted((name, summary) for name, summary in entries[directory] if summary)
+        if len(named) == 1:
+            summary = named[0][1]
+        else:
+            summary = reduce_summaries([f"{name}: {summary}" for name, summary in named], kind, combine)
+        directory_summaries[directory] = summary
+        store_summary_node(directory, kind, summary, run_id)
+        if directory != root_directory:
+            entries[os.path.dirname(directory)].append((f"{os.path.basename(directory)}/", summary))
+    return directory_summaries
@@ -0,0 +1,70 @@
+from werkzeug.sansio.multipart import MultipartDecoder, NEED_DATA, Data, Field, File, Epilogue
+
+# Bytes read from the request body at a time
+read_size = 64 * 1024
+
+class MultipartUpload:
+    """
+    Read one file field of a multipart/form-data body while it is being
+    received, instead of spooling the whole form to a temporary file first.
+    Other fields are skipped.
+    """
+
+    def __init__(self, stream, boundary, field_name='file'):
+        self.stream = stream
+        self.decoder = MultipartDecoder(boundary)
+        self.field_name = field_name
+        self.filename = None
+        self.pending = bytearray()
+        self.in_file = False
+        self.done = False
+
+    def _next_event(self):
+        event = self.decoder.next_event()
+        while event is NEED_DATA:
+            data = self.stream.read(read_size)
+            # None tells the decoder the body has ended
+            self.decoder.receive_data(data or None)
+            event = self.decoder.next_event()
+            if not data and event is NEED_DATA:
+                raise ValueError("Multipart body ended unexpectedly")
+        return event
+
+    def _advance(self):
+        event = self._next_event()
+        if isinstance(event, File) and event.name == self.field_name and self.filename is None:
+            self.in_file = True
+            self.filename = event.filename or "upload"
+        elif isinstance(event, (Field, File)):
+            self.in_file = False
+        elif isinstance(event, Data) and self.in_file:
+            self.pending += event.data
+            if not event.more_data:
+                self.done = True
+        elif isinstance(event, Epilogue):
+            self.done = True
+
+    def open(self):
+        """
+        Read the body up to the start of the file field.
+
+        Returns:
+            bool: True if the body has the file field, False otherwise.
+        """
+        while not self.in_file and not self.done:
+            self._advance()
+        return self.in_file
+
+    def read(self, size=-1):
+        """
+        Read up to size bytes of the file field; b"" once it has ended.
+        """
+        if not self.in_file:
+            return b""
+        while (size < 0 or len(self.pending) < size) and not self.done:
+            self._advance()
+        if size < 0:
+            size = len(self.pending)
+        data = bytes(self.pending[:size])
+        del self.pending[:size]
+        return data
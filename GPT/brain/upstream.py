@@ -0,0 +1,182 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+def content_key(operation, content):
+    """
+    Key an upstream request by its operation and a hash of its content.
+
+    Parameters:
+        operation (str): The operation (summarize, verify, corrections).
+        content (str): The content of the code file.
+
+    Returns:
+        tuple: (operation, SHA-256 hex digest of the content).
+    """
+    return operation, hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache of upstream responses with a time to live.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Get a cached response, or None if it is missing or expired.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or time.monotonic() - entry[1] > self.ttl_seconds:
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """
+        Cache a response, evicting the least recently used one when full.
+        """
+        if self.max_entries <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (value, time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        """
+        Get the cache size and hit and miss counts.
+        """
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+class RateLimiter:
+    """
+    Token bucket limiting upstream requests per minute across all threads.
+    Up to burst requests may start at once; after that they are spaced evenly.
+    With a state_path, the bucket is kept in that file under a lock, so all
+    processes using the same file share one limit (POSIX only; elsewhere the
+    limit is per process).
+    """
+
+    def __init__(self, requests_per_minute, burst=None, state_path=None):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = burst or max(1, int(self.rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.state_path = state_path if fcntl is not None else None
+
+    def _take(self, tokens, updated, now):
+        # Refill since updated, then take a token if there is one
+        tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            return tokens - 1, now, 0.0
+        return tokens, now, (1 - tokens) / self.rate
+
+    def _take_shared(self):
+        with self.lock, open(self.state_path, 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            state = f.read().split()
+            # Wall-clock time, as the file is shared between processes
+            now = time.time()
+            tokens, updated = (float(state[0]), float(state[1])) if len(state) == 2 else (float(self.capacity), now)
+            tokens, updated, wait = self._take(tokens, updated, now)
+            f.truncate(0)
+            f.write(f"{tokens} {updated}")
+        return wait
+
+    def acquire(self, timeout=None):
+        """
+        Wait until a request may start.
+
+        Parameters:
+            timeout (float): Longest time to wait in seconds; None waits indefinitely.
+
+        Returns:
+            bool: True if the request may start, False if the timeout expired first.
+        """
+        if self.rate <= 0:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self.state_path is not None:
+                wait = self._take_shared()
+            else:
+                with self.lock:
+                    self.tokens, self.updated, wait = self._take(self.tokens, self.updated, time.monotonic())
+            if not wait:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key: the first caller runs the
+    call, later callers wait for it and share its result or error.
+    """
+
+    def __init__(self):
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key, function):
+        """
+        Run function once for all concurrent callers with the same key.
+
+        Parameters:
+            key (hashable): Identifies identical calls, e.g. from content_key.
+            function (callable): The call to run, without arguments.
+
+        Returns:
+            tuple: (result of the call, True if it was shared with an earlier caller).
+        """
+        with self.lock:
+            future = self.in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.in_flight[key] = future
+                self.calls += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result(), True
+        try:
+            future.set_result(function())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+        return future.result(), False
+
+    def stats(self):
+        """
+        Get the number of calls run, calls saved by coalescing and calls in flight.
+        """
+        with self.lock:
+            return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self.in_flight)}
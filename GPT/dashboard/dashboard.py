@@ -1,11 +1,17 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import os
+import sys
 import subprocess
 import json
 import shutil
 import platform
 
+# env_cache lives in GPT/setup and is imported by name, as run_integration_setup.py
+# does, whether this file runs as a script or is imported from there
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'setup'))
+from env_cache import ensure_venv
+
 def run_integration():
     """
     Run the integration setup script.
@@ -25,8 +31,14 @@ def switch_model(model_choice):
     """
     try:
         config_path = os.path.join(os.path.dirname(__file__), '..', 'config.json')
+        config = {}
+        if os.path.exists(config_path):
+            with open(config_path, 'r') as config_file:
+                config = json.load(config_file)
+        # Keep other settings such as the Veronica inference backend
+        config["model"] = model_choice
         with open(config_path, 'w') as config_file:
-            json.dump({"model": model_choice}, config_file)
+            json.dump(config, config_file)
         messagebox.showinfo("Model Switch", f"Switched to {model_choice} model")
     except Exception as e:
         messagebox.showerror("Model Switch Error", f"Failed to switch model: {e}")
@@ -85,7 +97,7 @@ def prompt_user_deployment_verification():
 
 def deploy_integration():
     """
-    Deploy the integration by setting up a new virtual environment.
+    Deploy the integration by providing a virtual environment for the project's requirements.
     """
     project_root = os.getenv('PROJECT_ROOT')
     gpt_directory = os.path.join(project_root, 'GPT')
@@ -100,17 +112,10 @@ def deploy_integration():
         if os.path.exists(venv_path):
             subprocess.run(['rm', '-rf', venv_path], shell=False)
 
-    # Set up a new virtual environment in the main project directory
-    if platform.system() == 'Windows':
-        setup_command = f'python -m venv {os.path.join(project_root, "venv")}'
-        subprocess.run(setup_command, shell=True)
-        activate_command = f'call {os.path.join(project_root, "venv", "Scripts", "activate.bat")}'
-        subprocess.run(activate_command + ' && pip install -r requirements.txt', shell=True)
-    else:
-        setup_command = f'python -m venv {os.path.join(project_root, "venv")}'
-        subprocess.run(setup_command, shell=False)
-        activate_command = f'source {os.path.join(project_root, "venv", "bin", "activate")}'
-        subprocess.run(activate_command + ' && pip install -r requirements.txt', shell=True)
+    # Provide the main project's virtual environment from the requirements cache.
+    # Unchanged requirements reuse or hardlink-clone a cached environment and
+    # install from the local wheelhouse, so redeploys need no network access.
+    ensure_venv(os.path.join(project_root, "requirements.txt"), os.path.join(project_root, "venv"))
 
     print("Deployment complete. The integration is now running in the main project directory.")
 
@@ -0,0 +1,98 @@
+import os
+import json
+import time
+import argparse
+import torch
+from transformers import GPT2Tokenizer, GPT2LMHeadModel
+
+from export_onnx import load_onnx_model
+from benchmark_speculative import benchmark_prompts
+
+# Benchmark results are written next to the model code
+output_dir = os.path.join(os.path.dirname(__file__), 'benchmarks')
+
+def measure_latency(model, input_ids, max_new_tokens, pad_token_id, repeats=3):
+    """
+    Measure the mean latency of a greedy generate() call.
+
+    Parameters:
+        model: PyTorch or ONNX Runtime model with a generate() method.
+        input_ids (torch.Tensor): Token ids of the prompt.
+        max_new_tokens (int): Number of tokens to generate.
+        pad_token_id (int): Token id used for padding.
+        repeats (int): Number of timed runs.
+
+    Returns:
+        tuple: Mean latency in seconds and the generated token ids.
+    """
+    outputs = None
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        outputs = model.generate(
+            input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            max_new_tokens=max_new_tokens,
+            do_sample=False,
+            num_beams=1,
+            pad_token_id=pad_token_id
+        )
+    return (time.perf_counter() - start_time) / repeats, outputs
+
+def run_benchmark(model_dir, onnx_dir, max_new_tokens=64, repeats=3):
+    """
+    Compare the PyTorch and ONNX Runtime backends for output parity and latency on CPU.
+
+    Parameters:
+        model_dir (str): Directory where the trained model is saved.
+        onnx_dir (str): Directory where the exported ONNX model is saved.
+        max_new_tokens (int): Number of tokens to generate per prompt.
+        repeats (int): Number of timed runs per prompt.
+
+    Returns:
+        dict: Per-prompt logit difference, output parity and latencies.
+    """
+    tokenizer = GPT2Tokenizer.from_pretrained(model_dir)
+    torch_model = GPT2LMHeadModel.from_pretrained(model_dir)
+    torch_model.eval()
+    onnx_model = load_onnx_model(onnx_dir)
+
+    results = {
+        "threads": torch.get_num_threads(),
+        "max_new_tokens": max_new_tokens,
+        "prompts": []
+    }
+    for prompt in benchmark_prompts:
+        inputs = tokenizer(prompt, return_tensors='pt')
+        with torch.no_grad():
+            torch_logits = torch_model(**inputs).logits
+        onnx_logits = onnx_model(**inputs).logits
+        torch_latency, torch_outputs = measure_latency(torch_model, inputs['input_ids'], max_new_tokens, tokenizer.eos_token_id, repeats)
+        onnx_latency, onnx_outputs = measure_latency(onnx_model, inputs['input_ids'], max_new_tokens, tokenizer.eos_token_id, repeats)
+        results["prompts"].append({
+            "prompt": prompt,
+            "max_abs_logit_diff": (torch_logits - onnx_logits).abs().max().item(),
+            "outputs_match": torch.equal(torch_outputs, onnx_outputs),
+            "pytorch_latency_seconds": torch_latency,
+            "onnx_latency_seconds": onnx_latency
+        })
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the PyTorch and ONNX Runtime backends for the Veronica model.")
+    parser.add_argument('--model-dir', default="models/Veronica")
+    parser.add_argument('--onnx-dir', default=None, help="Defaults to <model-dir>/onnx")
+    parser.add_argument('--max-new-tokens', type=int, default=64)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    results = run_benchmark(args.model_dir, args.onnx_dir or os.path.join(args.model_dir, "onnx"), args.max_new_tokens, args.repeats)
+    os.makedirs(output_dir, exist_ok=True)
+    output_file = os.path.join(output_dir, "backends.json")
+    with open(output_file, 'w') as f:
+        json.dump(results, f, indent=4)
+    for result in results["prompts"]:
+        print(f"PyTorch: {result['pytorch_latency_seconds'] * 1000:.1f} ms, "
+              f"ONNX Runtime: {result['onnx_latency_seconds'] * 1000:.1f} ms, "
+              f"Max logit diff: {result['max_abs_logit_diff']:.2e}, "
+              f"Outputs match: {result['outputs_match']}")
+    print(f"Benchmark results saved to {output_file}")
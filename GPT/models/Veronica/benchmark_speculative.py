@@ -0,0 +1,71 @@
+import os
+import json
+import argparse
+import torch
+from transformers import GPT2Tokenizer, GPT2LMHeadModel
+
+from speculative import load_draft_model, greedy_generate, speculative_generate, measure_tokens_per_second
+
+# Benchmark results are written next to the model code
+output_dir = os.path.join(os.path.dirname(__file__), 'benchmarks')
+
+benchmark_prompts = [
+    "Summarize the following code:\n\ndef example_function(x, y): return x + y",
+    "Verify the following code and its dependencies:\n\nimport os\nprint(os.getcwd())",
+    "Provide corrections for the following code:\n\nfor i in range(10) print(i)",
+]
+
+def run_benchmark(model_dir, draft_model_dir, max_new_tokens=64, repeats=3):
+    """
+    Compare plain greedy decoding with speculative decoding on CPU.
+
+    Parameters:
+        model_dir (str): Directory where the Veronica model is saved.
+        draft_model_dir (str): Directory where the draft model is saved.
+        max_new_tokens (int): Number of tokens to generate per prompt.
+        repeats (int): Number of timed runs per prompt.
+
+    Returns:
+        dict: Tokens per second for each decoding path and whether their outputs matched.
+    """
+    tokenizer = GPT2Tokenizer.from_pretrained(model_dir)
+    model = GPT2LMHeadModel.from_pretrained(model_dir)
+    draft_model = load_draft_model(draft_model_dir)
+    if draft_model is None:
+        raise FileNotFoundError(f"No draft model found in {draft_model_dir}")
+
+    results = {
+        "threads": torch.get_num_threads(),
+        "max_new_tokens": max_new_tokens,
+        "prompts": []
+    }
+    for prompt in benchmark_prompts:
+        input_ids = tokenizer(prompt, return_tensors='pt')['input_ids']
+        plain = lambda ids: greedy_generate(model, ids, max_new_tokens, tokenizer.eos_token_id)
+        speculative = lambda ids: speculative_generate(model, draft_model, ids, max_new_tokens, tokenizer.eos_token_id)
+        results["prompts"].append({
+            "prompt": prompt,
+            "plain_tokens_per_second": measure_tokens_per_second(plain, input_ids, repeats),
+            "speculative_tokens_per_second": measure_tokens_per_second(speculative, input_ids, repeats),
+            "outputs_match": torch.equal(plain(input_ids), speculative(input_ids))
+        })
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark speculative decoding for the Veronica model on CPU.")
+    parser.add_argument('--model-dir', default="models/Veronica")
+    parser.add_argument('--draft-model-dir', default="models/Veronica/draft")
+    parser.add_argument('--max-new-tokens', type=int, default=64)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    results = run_benchmark(args.model_dir, args.draft_model_dir, args.max_new_tokens, args.repeats)
+    os.makedirs(output_dir, exist_ok=True)
+    output_file = os.path.join(output_dir, "speculative_decoding.json")
+    with open(output_file, 'w') as f:
+        json.dump(results, f, indent=4)
+    for result in results["prompts"]:
+        print(f"Plain: {result['plain_tokens_per_second']:.1f} tok/s, "
+              f"Speculative: {result['speculative_tokens_per_second']:.1f} tok/s, "
+              f"Outputs match: {result['outputs_match']}")
+    print(f"Benchmark results saved to {output_file}")
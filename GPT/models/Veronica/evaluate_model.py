@@ -1,151 +1,238 @@
 import os
 import json
+import math
 import time
+import zlib
+import argparse
 import torch
+import torch.nn.functional as F
 from transformers import GPT2Tokenizer, GPT2LMHeadModel
 
-# Define output directory for consistency
-output_dir = os.path.join(os.path.dirname(__file__), '../models/Veronica/training_data')
-os.makedirs(output_dir, exist_ok=True)
+# Evaluation reports are written next to the model code, one file per checkpoint and run
+report_dir = os.path.join(os.path.dirname(__file__), 'evaluation_reports')
 
-# Load the tokenizer and model
-model_dir = "models/Veronica"
-tokenizer = GPT2Tokenizer.from_pretrained(model_dir)
-model = GPT2LMHeadModel.from_pretrained(model_dir)
+# Percentage of training shards held out from training for evaluation
+held_out_percent = 10
 
-def generate_text(prompt, max_length=150):
+def is_held_out(shard_name, percent=held_out_percent):
     """
-    Generate text using the Veronica model.
+    Decide whether a training shard belongs to the held-out evaluation split.
+    The split is derived from the shard name, so it is stable across runs and
+    new shards never move existing ones between splits.
 
     Parameters:
-        prompt (str): Prompt text to generate from.
-        max_length (int): Maximum length of the generated text.
+        shard_name (str): File name of the training shard.
+        percent (int): Percentage of shards to hold out.
 
     Returns:
-        str: Generated text from the model.
+        bool: True if the shard is held out from training.
     """
-    inputs = tokenizer(prompt, return_tensors='pt')
-    outputs = model.generate(
-        inputs['input_ids'],
-        max_length=max_length,
-        num_return_sequences=1,
-        no_repeat_ngram_size=2,
-        num_beams=5,
-        temperature=0.7,
-        top_k=50,
-        top_p=0.95
-    )
-    return tokenizer.decode(outputs[0], skip_special_tokens=True)
-
-def summarize_code_veronica(file_content):
+    return zlib.crc32(shard_name.encode('utf-8')) % 100 < percent
+
+def iter_held_out_texts(training_data_dir, percent=held_out_percent):
     """
-    Summarize the provided code content using the Veronica model.
+    Stream the texts of the held-out training shards, one shard in memory at a time.
 
     Parameters:
-        file_content (str): The content of the code file.
+        training_data_dir (str): Directory containing training data files.
+        percent (int): Percentage of shards to hold out.
 
-    Returns:
-        str: Summary of the code.
+    Yields:
+        str: Input or output text of a held-out training example.
     """
-    prompt = f"Summarize the following code:\n\n{file_content}"
-    summary = generate_text(prompt)
-    log_training_data('summarize', file_content, summary)
-    return summary
-
-def verify_code_veronica(file_content):
+    for filename in sorted(os.listdir(training_data_dir)):
+        if not filename.endswith('.json') or not is_held_out(filename, percent):
+            continue
+        with open(os.path.join(training_data_dir, filename), 'r') as file:
+            data = json.load(file)
+        if isinstance(data, dict):
+            for key in ("input", "output"):
+                if data.get(key):
+                    yield data[key]
+
+def iter_batches(texts, batch_size):
     """
-    Verify the provided code content using the Veronica model.
+    Group an iterable of texts into lists of batch_size texts.
 
     Parameters:
-        file_content (str): The content of the code file.
+        texts (iterable): Texts to group.
+        batch_size (int): Number of texts per batch.
 
-    Returns:
-        str: Verification result of the code.
+    Yields:
+        list: A batch of texts.
     """
-    prompt = f"Verify the following code and its dependencies:\n\n{file_content}"
-    verification = generate_text(prompt)
-    log_training_data('verify', file_content, verification)
-    return verification
-
-def get_corrections_veronica(file_content):
+    batch = []
+    for text in texts:
+        batch.append(text)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def compute_perplexity(model, tokenizer, texts, batch_size=8, max_length=512):
     """
-    Get corrections for the provided code content using the Veronica model.
+    Compute token-level perplexity over the texts in batches.
+    Padding is excluded, so the result does not depend on the batch size.
 
     Parameters:
-        file_content (str): The content of the code file.
+        model (GPT2LMHeadModel): The model to evaluate.
+        tokenizer (GPT2Tokenizer): The model's tokenizer.
+        texts (iterable): Texts to evaluate on.
+        batch_size (int): Number of texts per forward pass.
+        max_length (int): Texts are truncated to this many tokens.
 
     Returns:
-        str: Corrections for the code.
-    """
-    prompt = f"Provide corrections for the following code:\n\n{file_content}"
-    corrections = generate_text(prompt)
-    log_training_data('corrections', file_content, corrections)
-    return corrections
-
-def log_training_data(operation, input_data, output_data):
+        dict: Perplexity, mean loss and the number of texts and tokens evaluated.
     """
-    Log training data for the Veronica model.
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    model.eval()
+    total_loss = 0.0
+    total_tokens = 0
+    total_texts = 0
 
-    Parameters:
-        operation (str): The operation performed (summarize, verify, corrections).
-        input_data (str): The input data provided to the model.
-        output_data (str): The output data generated by the model.
-    """
-    timestamp = time.strftime("%Y%m%d_%H%M%S")
-    log_entry = {
-        'operation': operation,
-        'input': input_data,
-        'output': output_data
+    with torch.no_grad():
+        for batch in iter_batches(texts, batch_size):
+            inputs = tokenizer(batch, return_tensors='pt', padding=True, truncation=True, max_length=max_length)
+            logits = model(**inputs).logits
+            # Each position predicts the next token; padded targets are ignored
+            labels = inputs['input_ids'][:, 1:].masked_fill(inputs['attention_mask'][:, 1:] == 0, -100)
+            total_loss += F.cross_entropy(
+                logits[:, :-1].reshape(-1, logits.size(-1)),
+                labels.reshape(-1),
+                ignore_index=-100,
+                reduction='sum'
+            ).item()
+            total_tokens += int((labels != -100).sum())
+            total_texts += len(batch)
+
+    mean_loss = total_loss / total_tokens if total_tokens else float('nan')
+    return {
+        "perplexity": math.exp(mean_loss) if total_tokens else float('nan'),
+        "mean_loss": mean_loss,
+        "texts": total_texts,
+        "tokens": total_tokens
     }
-    log_file = os.path.join(output_dir, f"{operation}_{timestamp}.json")
-    with open(log_file, 'w') as f:
-        json.dump(log_entry, f, indent=4)
 
-def log_error(input_data, error_message):
+def measure_generation(model, tokenizer, prompts, max_new_tokens=64, max_prompt_tokens=256):
     """
-    Log errors encountered during model operations.
+    Measure greedy generation latency and throughput.
 
     Parameters:
-        input_data (str): The input data provided to the model.
-        error_message (str): The error message encountered.
+        model (GPT2LMHeadModel): The model to evaluate.
+        tokenizer (GPT2Tokenizer): The model's tokenizer.
+        prompts (list): Prompts to generate from.
+        max_new_tokens (int): Number of tokens to generate per prompt.
+        max_prompt_tokens (int): Prompts are truncated to this many tokens.
+
+    Returns:
+        dict: Mean and p95 latency in seconds, and generated tokens per second.
     """
-    error_log_path = os.path.join(output_dir, "error.txt")
-    error_entry = {
-        'input': input_data,
-        'error': error_message
+    latencies = []
+    generated_tokens = 0
+    with torch.no_grad():
+        for prompt in prompts:
+            inputs = tokenizer(prompt, return_tensors='pt', truncation=True, max_length=max_prompt_tokens)
+            start_time = time.perf_counter()
+            outputs = model.generate(
+                **inputs,
+                max_new_tokens=max_new_tokens,
+                do_sample=False,
+                num_beams=1,
+                pad_token_id=tokenizer.eos_token_id
+            )
+            latencies.append(time.perf_counter() - start_time)
+            generated_tokens += outputs.shape[1] - inputs['input_ids'].shape[1]
+
+    if not latencies:
+        return {"samples": 0}
+    latencies.sort()
+    return {
+        "samples": len(latencies),
+        "mean_latency_seconds": sum(latencies) / len(latencies),
+        "p95_latency_seconds": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        "tokens_per_second": generated_tokens / sum(latencies) if sum(latencies) > 0 else 0.0
     }
-    with open(error_log_path, 'a') as f:
-        json.dump(error_entry, f, indent=4)
-        f.write("\n")
 
-def evaluate_model(model_dir, test_text):
+def evaluate_model(model_dir, training_data_dir, batch_size=8, generation_samples=8, max_new_tokens=64):
     """
-    Evaluate the trained model.
+    Evaluate a trained model or checkpoint on the held-out training shards and
+    write a JSON report, so runs can be compared over time.
 
     Parameters:
-        model_dir (str): Directory where the trained model is saved.
-        test_text (str): Text to evaluate the model on.
+        model_dir (str): Directory where the trained model or checkpoint is saved.
+        training_data_dir (str): Directory containing training data files.
+        batch_size (int): Number of texts per forward pass.
+        generation_samples (int): Number of held-out texts used to time generation.
+        max_new_tokens (int): Number of tokens to generate per timed prompt.
+
+    Returns:
+        dict: The evaluation report.
     """
     tokenizer = GPT2Tokenizer.from_pretrained(model_dir)
     model = GPT2LMHeadModel.from_pretrained(model_dir)
 
-    inputs = tokenizer(test_text, return_tensors='pt')
-    with torch.no_grad():
-        outputs = model(**inputs)
+    start_time = time.perf_counter()
+    quality = compute_perplexity(model, tokenizer, iter_held_out_texts(training_data_dir), batch_size)
+    eval_seconds = time.perf_counter() - start_time
+
+    prompts = []
+    for text in iter_held_out_texts(training_data_dir):
+        if len(prompts) == generation_samples:
+            break
+        prompts.append(text)
+
+    report = {
+        "checkpoint": os.path.abspath(model_dir),
+        "timestamp": time.strftime("%Y%m%d_%H%M%S"),
+        "held_out_percent": held_out_percent,
+        "batch_size": batch_size,
+        "threads": torch.get_num_threads(),
+        "quality": quality,
+        "eval_seconds": eval_seconds,
+        "eval_tokens_per_second": quality["tokens"] / eval_seconds if eval_seconds > 0 else 0.0,
+        "generation": measure_generation(model, tokenizer, prompts, max_new_tokens)
+    }
+
+    os.makedirs(report_dir, exist_ok=True)
+    checkpoint_name = os.path.basename(os.path.normpath(model_dir))
+    report_path = os.path.join(report_dir, f"{checkpoint_name}_{report['timestamp']}.json")
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=4)
 
-    logits = outputs.logits
-    predictions = torch.argmax(logits, dim=-1)
-    predicted_text = tokenizer.decode(predictions[0])
+    print(f"Checkpoint: {model_dir}")
+    print(f"Perplexity: {quality['perplexity']:.2f} over {quality['tokens']} tokens")
+    print(f"Report saved to {report_path}")
+    return report
 
-    print(f"Input text: {test_text}")
-    print(f"Predicted text: {predicted_text}")
+def find_checkpoints(model_dir):
+    """
+    List the trained model and the intermediate checkpoints saved by the Trainer.
+
+    Parameters:
+        model_dir (str): Directory where the trained model is saved.
+
+    Returns:
+        list: Checkpoint directories containing a model config.
+    """
+    checkpoints = [model_dir]
+    if os.path.isdir(model_dir):
+        checkpoints += [
+            os.path.join(model_dir, name)
+            for name in sorted(os.listdir(model_dir))
+            if name.startswith('checkpoint-')
+        ]
+    return [path for path in checkpoints if os.path.exists(os.path.join(path, 'config.json'))]
 
 if __name__ == "__main__":
-    test_content = "def example_function(x, y): return x + y"
-    summary = summarize_code_veronica(test_content)
-    print(f"Summary: {summary}")
-    verification = verify_code_veronica(test_content)
-    print(f"Verification: {verification}")
-    corrections = get_corrections_veronica(test_content)
-    print(f"Corrections: {corrections}")
-    evaluate_model(model_dir, "This is a test sentence.")
+    parser = argparse.ArgumentParser(description="Evaluate Veronica checkpoints on the held-out training shards.")
+    parser.add_argument('--model-dir', default="models/Veronica")
+    parser.add_argument('--training-data-dir', default="models/Veronica/training_data")
+    parser.add_argument('--checkpoint', action='append', help="Checkpoint to evaluate; defaults to the model and all its checkpoints")
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--generation-samples', type=int, default=8)
+    args = parser.parse_args()
+
+    for checkpoint in args.checkpoint or find_checkpoints(args.model_dir):
+        evaluate_model(checkpoint, args.training_data_dir, args.batch_size, args.generation_samples)
@@ -0,0 +1,42 @@
+import os
+import argparse
+from transformers import GPT2Tokenizer
+
+def export_onnx(model_dir, onnx_dir):
+    """
+    Export the trained Veronica model to ONNX with past key/value inputs and
+    outputs, so onnxruntime can decode incrementally like the PyTorch model.
+
+    Parameters:
+        model_dir (str): Directory where the trained model is saved.
+        onnx_dir (str): Directory to save the ONNX model.
+    """
+    from optimum.onnxruntime import ORTModelForCausalLM
+
+    model = ORTModelForCausalLM.from_pretrained(model_dir, export=True, use_cache=True)
+    model.save_pretrained(onnx_dir)
+    GPT2Tokenizer.from_pretrained(model_dir).save_pretrained(onnx_dir)
+    print(f"ONNX model exported to {onnx_dir}")
+
+def load_onnx_model(onnx_dir):
+    """
+    Load an exported Veronica model on the onnxruntime CPU execution provider.
+
+    Parameters:
+        onnx_dir (str): Directory where the ONNX model is saved.
+
+    Returns:
+        ORTModelForCausalLM: Model exposing the same generate() interface as the PyTorch model.
+    """
+    from optimum.onnxruntime import ORTModelForCausalLM
+
+    if not os.path.exists(onnx_dir):
+        raise FileNotFoundError(f"No ONNX model found in {onnx_dir}. Run export_onnx.py first.")
+    return ORTModelForCausalLM.from_pretrained(onnx_dir, use_cache=True, provider="CPUExecutionProvider")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the Veronica model to ONNX.")
+    parser.add_argument('--model-dir', default="models/Veronica")
+    parser.add_argument('--output-dir', default=None, help="Defaults to <model-dir>/onnx")
+    args = parser.parse_args()
+    export_onnx(args.model_dir, args.output_dir or os.path.join(args.model_dir, "onnx"))
@@ -1,40 +1,239 @@
 import os
+import copy
 import json
 import time
+import weakref
+import torch
 from transformers import GPT2Tokenizer, GPT2LMHeadModel
 
+from speculative import load_draft_model, speculative_generate
+from export_onnx import load_onnx_model
+from utils import read_json
+
 # Define output directory for consistency
 output_dir = os.path.join(os.path.dirname(__file__), '../models/Veronica/training_data')
 os.makedirs(output_dir, exist_ok=True)
 
+# Inference backend selected in config.json: "pytorch" (default) or "onnx"
+config_path = os.path.join(os.path.dirname(__file__), '../../config.json')
+config = read_json(config_path) if os.path.exists(config_path) else {}
+backend = config.get("veronica_backend", "pytorch")
+
 # Load the tokenizer and model
 model_dir = "models/Veronica"
 tokenizer = GPT2Tokenizer.from_pretrained(model_dir)
-model = GPT2LMHeadModel.from_pretrained(model_dir)
+if backend == "onnx":
+    model = load_onnx_model(os.path.join(model_dir, "onnx"))
+    draft_model = None
+else:
+    model = GPT2LMHeadModel.from_pretrained(model_dir)
+    # Optional draft model for speculative decoding, trained with train_model.train_draft_model
+    draft_model = load_draft_model(os.path.join(model_dir, "draft"))
+
+# Beam width used by generate_text; cached prefixes are repeated once per beam
+num_beams = 5
+
+# Fixed instruction headers every Veronica prompt starts with. The header is
+# cached without the trailing blank line so it tokenizes identically on its own
+# and inside the full prompt.
+summarize_header = "Summarize the following code:"
+verify_header = "Verify the following code and its dependencies:"
+corrections_header = "Provide corrections for the following code:"
+# Header for the reduce step of hierarchical summarization
+reduce_header = "Combine the following summaries of consecutive parts of one code file into a single summary:"
+prompt_headers = (summarize_header, verify_header, corrections_header, reduce_header)
+# Header token ids and past key/values per model. Only the fixed headers are
+# cached, and a model's entries go away with it when the model is replaced.
+prefix_cache = weakref.WeakKeyDictionary()
+
+# Number of tokens generated per request, and the model's context window
+default_max_new_tokens = 150
+context_window = model.config.n_positions
+# Slack for token count drift when a decoded window is re-tokenized inside a prompt
+window_margin = 8
+
+def get_prefix_cache(header):
+    """
+    Get the token ids and past key/values of the current model for a fixed
+    prompt header, running the forward pass over it on first use.
+
+    Parameters:
+        header (str): The instruction header to cache, one of prompt_headers.
+
+    Returns:
+        tuple: Header token ids and the past key/values of the header.
+    """
+    if header not in prompt_headers:
+        raise ValueError(f"Only the fixed prompt headers are cached, not {header!r}")
+    model_cache = prefix_cache.setdefault(model, {})
+    if header not in model_cache:
+        input_ids = tokenizer(header, return_tensors='pt')['input_ids']
+        with torch.no_grad():
+            outputs = model(input_ids, use_cache=True)
+        model_cache[header] = (input_ids, outputs.past_key_values)
+    return model_cache[header]
+
+def warm_prefix_cache():
+    """
+    Precompute the past key/values for all fixed prompt headers.
+    """
+    for header in prompt_headers:
+        get_prefix_cache(header)
+
+def expand_past_key_values(past_key_values, num_copies):
+    """
+    Copy cached past key/values and repeat them along the batch dimension.
+    generate() extends the cache in place, so the shared entry is never handed out directly.
+
+    Parameters:
+        past_key_values: Cached past key/values (a Cache object or legacy tuples).
+        num_copies (int): Number of copies per batch entry (one per beam).
+
+    Returns:
+        The expanded past key/values.
+    """
+    if hasattr(past_key_values, 'batch_repeat_interleave'):
+        past_key_values = copy.deepcopy(past_key_values)
+        past_key_values.batch_repeat_interleave(num_copies)
+        return past_key_values
+    return tuple(
+        tuple(tensor.repeat_interleave(num_copies, dim=0) for tensor in layer)
+        for layer in past_key_values
+    )
+
+def get_cached_prefix(input_ids, prompt):
+    """
+    Find the cached past key/values for the header the prompt starts with.
+
+    Parameters:
+        input_ids (torch.Tensor): Token ids of the full prompt.
+        prompt (str): The full prompt text.
+
+    Returns:
+        The past key/values expanded for beam search, or None if the prompt
+        does not start with a cached header.
+    """
+    for header in prompt_headers:
+        if prompt.startswith(header):
+            prefix_ids, past_key_values = get_prefix_cache(header)
+            prefix_length = prefix_ids.shape[1]
+            # At least one token must be left for the forward pass to produce logits
+            if input_ids.shape[1] > prefix_length and torch.equal(input_ids[:, :prefix_length], prefix_ids):
+                return expand_past_key_values(past_key_values, num_beams)
+            return None
+    return None
+
+# Precompute the header caches once, when the model is loaded. The ONNX
+# backend manages its own past key/values inside generate().
+if backend == "pytorch":
+    warm_prefix_cache()
 
-def generate_text(prompt, max_length=150):
+def count_tokens(text):
     """
-    Generate text using the Veronica model.
+    Count the tokens the Veronica tokenizer produces for the given text.
+
+    Parameters:
+        text (str): Text to measure.
+
+    Returns:
+        int: Number of tokens.
+    """
+    return len(tokenizer(text)['input_ids'])
+
+def split_into_windows(text, max_tokens):
+    """
+    Split text into consecutive pieces of at most max_tokens tokens each.
+
+    Parameters:
+        text (str): Text to split.
+        max_tokens (int): Maximum number of tokens per piece.
+
+    Returns:
+        list: Text of each piece, in order.
+    """
+    token_ids = tokenizer(text)['input_ids']
+    return [tokenizer.decode(token_ids[i:i + max_tokens]) for i in range(0, len(token_ids), max_tokens)]
+
+def generate_text(prompt, max_new_tokens=default_max_new_tokens, speculative=False):
+    """
+    Generate text using the Veronica model on the configured backend.
+    On the PyTorch backend, prompts starting with a fixed instruction header reuse
+    the header's cached past key/values, so only the user-specific content runs
+    through the model.
 
     Parameters:
         prompt (str): Prompt text to generate from.
-        max_length (int): Maximum length of the generated text.
+        max_new_tokens (int): Maximum number of tokens to generate. Reduced if
+            the prompt leaves less room in the context window.
+        speculative (bool): Use greedy speculative decoding with the draft model
+            instead of beam search, if a draft model has been trained.
 
     Returns:
-        str: Generated text from the model.
+        str: Generated text from the model, without the prompt.
     """
     inputs = tokenizer(prompt, return_tensors='pt')
+    prompt_tokens = inputs['input_ids'].shape[1]
+    max_new_tokens = min(max_new_tokens, context_window - prompt_tokens)
+    if max_new_tokens <= 0:
+        raise ValueError(f"Prompt of {prompt_tokens} tokens does not fit in the {context_window}-token context window")
+
+    if speculative and draft_model is not None:
+        outputs = speculative_generate(model, draft_model, inputs['input_ids'], max_new_tokens, tokenizer.eos_token_id)
+        return tokenizer.decode(outputs[0][prompt_tokens:], skip_special_tokens=True)
+    past_key_values = get_cached_prefix(inputs['input_ids'], prompt) if backend == "pytorch" else None
     outputs = model.generate(
         inputs['input_ids'],
-        max_length=max_length,
+        past_key_values=past_key_values,
+        max_new_tokens=max_new_tokens,
         num_return_sequences=1,
         no_repeat_ngram_size=2,
-        num_beams=5,
+        num_beams=num_beams,
         temperature=0.7,
         top_k=50,
         top_p=0.95
     )
-    return tokenizer.decode(outputs[0], skip_special_tokens=True)
+    return tokenizer.decode(outputs[0][prompt_tokens:], skip_special_tokens=True)
+
+def generate_for_content(header, file_content, max_new_tokens=default_max_new_tokens):
+    """
+    Run an instruction over the content, splitting content that does not fit
+    in the context window into window-sized pieces and running each one separately.
+
+    Parameters:
+        header (str): The instruction header of the prompt.
+        file_content (str): The content of the code file.
+        max_new_tokens (int): Maximum number of tokens to generate per piece.
+
+    Returns:
+        list: Generated text for each piece, in order.
+    """
+    budget = context_window - max_new_tokens - count_tokens(f"{header}\n\n") - window_margin
+    if budget <= 0:
+        raise ValueError(f"max_new_tokens={max_new_tokens} leaves no room for content in the {context_window}-token context window")
+    if count_tokens(file_content) <= budget:
+        return [generate_text(f"{header}\n\n{file_content}", max_new_tokens)]
+    return [generate_text(f"{header}\n\n{piece}", max_new_tokens) for piece in split_into_windows(file_content, budget)]
+
+def summarize_hierarchically(file_content, max_new_tokens=default_max_new_tokens):
+    """
+    Summarize content of any length: summarize each window-sized piece, then
+    repeatedly combine the piece summaries until a single summary remains.
+
+    Parameters:
+        file_content (str): The content of the code file.
+        max_new_tokens (int): Maximum number of tokens per summary.
+
+    Returns:
+        str: Summary of the whole content.
+    """
+    summaries = generate_for_content(summarize_header, file_content, max_new_tokens)
+    while len(summaries) > 1:
+        combined = generate_for_content(reduce_header, "\n\n".join(summaries), max_new_tokens)
+        if len(combined) >= len(summaries):
+            # The context window is too small to merge the summaries any further
+            return "\n\n".join(combined)
+        summaries = combined
+    return summaries[0]
 
 def summarize_code_veronica(file_content):
     """
@@ -46,8 +245,7 @@ def summarize_code_veronica(file_content):
     Returns:
         str: Summary of the code.
     """
-    prompt = f"Summarize the following code:\n\n{file_content}"
-    summary = generate_text(prompt)
+    summary = summarize_hierarchically(file_content)
     log_training_data('summarize', file_content, summary)
     return summary
 
@@ -61,8 +259,7 @@ def verify_code_veronica(file_content):
     Returns:
         str: Verification result of the code.
     """
-    prompt = f"Verify the following code and its dependencies:\n\n{file_content}"
-    verification = generate_text(prompt)
+    verification = "\n\n".join(generate_for_content(verify_header, file_content))
     log_training_data('verify', file_content, verification)
     return verification
 
@@ -76,8 +273,7 @@ def get_corrections_veronica(file_content):
     Returns:
         str: Corrections for the code.
     """
-    prompt = f"Provide corrections for the following code:\n\n{file_content}"
-    corrections = generate_text(prompt)
+    corrections = "\n\n".join(generate_for_content(corrections_header, file_content))
     log_training_data('corrections', file_content, corrections)
     return corrections
 
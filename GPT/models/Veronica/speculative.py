@@ -0,0 +1,94 @@
+import os
+import time
+import torch
+from transformers import GPT2LMHeadModel
+
+# Number of tokens the draft model proposes before the full model verifies them
+num_draft_tokens = 5
+
+def load_draft_model(draft_model_dir):
+    """
+    Load the distilled draft model used for speculative decoding.
+
+    Parameters:
+        draft_model_dir (str): Directory where the draft model is saved.
+
+    Returns:
+        GPT2LMHeadModel: The draft model, or None if it has not been trained.
+    """
+    if not os.path.exists(os.path.join(draft_model_dir, 'config.json')):
+        return None
+    draft_model = GPT2LMHeadModel.from_pretrained(draft_model_dir)
+    draft_model.eval()
+    draft_model.generation_config.num_assistant_tokens = num_draft_tokens
+    draft_model.generation_config.num_assistant_tokens_schedule = "constant"
+    return draft_model
+
+def greedy_generate(model, input_ids, max_new_tokens, pad_token_id=None):
+    """
+    Generate tokens with plain greedy decoding, one forward pass per token.
+
+    Parameters:
+        model (GPT2LMHeadModel): The model to generate with.
+        input_ids (torch.Tensor): Token ids of the prompt.
+        max_new_tokens (int): Maximum number of tokens to generate.
+        pad_token_id (int): Token id used for padding.
+
+    Returns:
+        torch.Tensor: Prompt and generated token ids.
+    """
+    return model.generate(
+        input_ids,
+        attention_mask=torch.ones_like(input_ids),
+        max_new_tokens=max_new_tokens,
+        do_sample=False,
+        num_beams=1,
+        pad_token_id=pad_token_id
+    )
+
+def speculative_generate(model, draft_model, input_ids, max_new_tokens, pad_token_id=None):
+    """
+    Generate tokens with speculative decoding. The draft model proposes
+    several tokens and the full model verifies them in one forward pass,
+    keeping the longest prefix it agrees with. The output is identical to
+    greedy_generate with the full model.
+
+    Parameters:
+        model (GPT2LMHeadModel): The full model.
+        draft_model (GPT2LMHeadModel): The draft model sharing the full model's vocabulary.
+        input_ids (torch.Tensor): Token ids of the prompt.
+        max_new_tokens (int): Maximum number of tokens to generate.
+        pad_token_id (int): Token id used for padding.
+
+    Returns:
+        torch.Tensor: Prompt and generated token ids.
+    """
+    return model.generate(
+        input_ids,
+        attention_mask=torch.ones_like(input_ids),
+        assistant_model=draft_model,
+        max_new_tokens=max_new_tokens,
+        do_sample=False,
+        num_beams=1,
+        pad_token_id=pad_token_id
+    )
+
+def measure_tokens_per_second(generate_func, input_ids, repeats=3):
+    """
+    Measure generation throughput on the current device.
+
+    Parameters:
+        generate_func (function): Function taking input ids and returning generated ids.
+        input_ids (torch.Tensor): Token ids of the prompt.
+        repeats (int): Number of timed runs.
+
+    Returns:
+        float: Generated tokens per second over all runs.
+    """
+    generated_tokens = 0
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        outputs = generate_func(input_ids)
+        generated_tokens += outputs.shape[1] - input_ids.shape[1]
+    elapsed = time.perf_counter() - start_time
+    return generated_tokens / elapsed if elapsed > 0 else 0.0
@@ -1,11 +1,16 @@
 import json
-from transformers import GPT2Tokenizer, GPT2LMHeadModel, Trainer, TrainingArguments
+import torch
+import torch.nn.functional as F
+from transformers import GPT2Tokenizer, GPT2LMHeadModel, Trainer, TrainingArguments, DataCollatorForLanguageModeling
 from datasets import Dataset
 import os
 
+from evaluate_model import is_held_out
+
 def load_training_data(training_data_dir):
     """
     Load training data from the specified directory.
+    Shards in the held-out split are left out for evaluate_model.
 
     Parameters:
         training_data_dir (str): Directory containing training data files.
@@ -15,7 +20,7 @@ def load_training_data(training_data_dir):
     """
     texts = []
     for filename in os.listdir(training_data_dir):
-        if filename.endswith('.json'):
+        if filename.endswith('.json') and not is_held_out(filename):
             with open(os.path.join(training_data_dir, filename), 'r') as file:
                 data = json.load(file)
                 texts.append(data["input"])
@@ -83,7 +88,86 @@ def train_model(training_data_dir, model_dir):
     tokenizer.save_pretrained(model_dir)
     print(f"Model trained and saved to {model_dir}")
 
+class DistillationTrainer(Trainer):
+    """
+    Trainer that fits a student model to the next-token distribution of a
+    frozen teacher model in addition to the language modeling loss.
+    """
+
+    def __init__(self, *args, teacher_model=None, temperature=2.0, alpha=0.5, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.teacher_model = teacher_model.to(self.args.device)
+        self.teacher_model.eval()
+        self.temperature = temperature
+        self.alpha = alpha
+
+    def compute_loss(self, model, inputs, return_outputs=False, **kwargs):
+        outputs = model(**inputs)
+        with torch.no_grad():
+            teacher_logits = self.teacher_model(
+                input_ids=inputs["input_ids"],
+                attention_mask=inputs["attention_mask"]
+            ).logits
+
+        # KL divergence between the softened distributions on non-padding positions
+        mask = inputs["attention_mask"].unsqueeze(-1).to(outputs.logits.dtype)
+        student_log_probs = F.log_softmax(outputs.logits / self.temperature, dim=-1)
+        teacher_probs = F.softmax(teacher_logits / self.temperature, dim=-1)
+        kl = (teacher_probs * (torch.log(teacher_probs + 1e-9) - student_log_probs) * mask).sum()
+        distillation_loss = kl / mask.sum().clamp(min=1) * self.temperature ** 2
+
+        loss = self.alpha * outputs.loss + (1 - self.alpha) * distillation_loss
+        return (loss, outputs) if return_outputs else loss
+
+def train_draft_model(training_data_dir, model_dir, draft_model_dir, student_model='distilgpt2'):
+    """
+    Distill a small draft model from the trained Veronica model for speculative decoding.
+    The student must share GPT-2's vocabulary so the full model can verify its tokens.
+
+    Parameters:
+        training_data_dir (str): Directory containing training data files.
+        model_dir (str): Directory where the trained Veronica model is saved.
+        draft_model_dir (str): Directory to save the draft model.
+        student_model (str): Pretrained model to initialize the draft model from.
+    """
+    texts = load_training_data(training_data_dir)
+
+    tokenizer = GPT2Tokenizer.from_pretrained(model_dir)
+    tokenizer.pad_token = tokenizer.eos_token
+    teacher_model = GPT2LMHeadModel.from_pretrained(model_dir)
+    model = GPT2LMHeadModel.from_pretrained(student_model)
+
+    dataset = prepare_dataset(texts)
+    tokenized_dataset = dataset.map(
+        lambda examples: tokenize_function(tokenizer, examples),
+        batched=True,
+        remove_columns=["text"]
+    )
+
+    training_args = TrainingArguments(
+        output_dir=draft_model_dir,
+        num_train_epochs=3,
+        per_device_train_batch_size=2,
+        save_steps=10_000,
+        save_total_limit=2,
+        logging_dir=os.path.join(draft_model_dir, 'logs'),
+    )
+
+    trainer = DistillationTrainer(
+        model=model,
+        args=training_args,
+        train_dataset=tokenized_dataset,
+        data_collator=DataCollatorForLanguageModeling(tokenizer, mlm=False),
+        teacher_model=teacher_model
+    )
+
+    trainer.train()
+    model.save_pretrained(draft_model_dir)
+    tokenizer.save_pretrained(draft_model_dir)
+    print(f"Draft model distilled and saved to {draft_model_dir}")
+
 if __name__ == "__main__":
     training_data_dir = "models/Veronica/training_data"
     model_dir = "models/Veronica"
     train_model(training_data_dir, model_dir)
+    train_draft_model(training_data_dir, model_dir, os.path.join(model_dir, "draft"))
@@ -0,0 +1,305 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import multiprocessing
+import multiprocessing.forkserver
+from collections import deque
+from concurrent.futures import Future, wait as wait_futures
+from multiprocessing.connection import wait
+import torch
+
+def _worker_loop(handlers, connection, num_threads):
+    """
+    Serve requests sent over the connection until a None sentinel arrives.
+
+    Parameters:
+        handlers (dict): Operation name to function taking the file content.
+        connection (multiprocessing.connection.Connection): Pipe end receiving
+            (operation, content) requests and sending (result, error) replies.
+        num_threads (int): Torch intra-op threads for this worker.
+    """
+    torch.set_num_threads(num_threads)
+    while True:
+        task = connection.recv()
+        if task is None:
+            break
+        operation, content = task
+        try:
+            connection.send((handlers[operation](content), None))
+        except Exception as e:
+            connection.send((None, f"{type(e).__name__}: {e}"))
+
+def _resolve(future, result, error):
+    if error is None:
+        future.set_result(result)
+    else:
+        future.set_exception(RuntimeError(error))
+
+def _summarize(content):
+    import inference
+    return inference.summarize_code_veronica(content)
+
+def _verify(content):
+    import inference
+    return inference.verify_code_veronica(content)
+
+def _corrections(content):
+    import inference
+    return inference.get_corrections_veronica(content)
+
+def default_handlers():
+    """
+    Return the Veronica operations. The model is not loaded in this process:
+    the inference module is preloaded by the fork server and workers inherit it.
+
+    Returns:
+        dict: Operation name to Veronica function.
+    """
+    config_path = os.path.join(os.path.dirname(__file__), '../../config.json')
+    config = {}
+    if os.path.exists(config_path):
+        with open(config_path, 'r') as file:
+            config = json.load(file)
+    if config.get("veronica_backend", "pytorch") != "pytorch":
+        raise ValueError("The worker pool shares PyTorch weights across processes; set veronica_backend to \"pytorch\".")
+    return {
+        'summarize': _summarize,
+        'verify': _verify,
+        'corrections': _corrections,
+    }
+
+def _start_forkserver(preload):
+    """
+    Start the fork server with the given modules imported.
+    Torch reads OMP_NUM_THREADS when it is imported, so the server keeps a single
+    OpenMP thread and never has a thread pool to carry into the workers it forks.
+    The server is a fresh interpreter that does not always apply this process's
+    sys.path, so it is passed in PYTHONPATH. Has no effect if the server is
+    already running.
+
+    Parameters:
+        preload (list): Names of the modules to import in the server.
+    """
+    multiprocessing.set_forkserver_preload(preload)
+    environment = {'OMP_NUM_THREADS': '1', 'PYTHONPATH': os.pathsep.join(path or os.getcwd() for path in sys.path)}
+    previous = {name: os.environ.get(name) for name in environment}
+    os.environ.update(environment)
+    try:
+        multiprocessing.forkserver.ensure_running()
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                del os.environ[name]
+            else:
+                os.environ[name] = value
+
+class VeronicaWorkerPool:
+    """
+    Pool of forked worker processes serving Veronica requests from a shared queue.
+    Workers are forked by a single-threaded fork server that has imported the
+    handlers' modules, so the model is loaded once and shared copy-on-write, and
+    no worker is forked from a parent with running threads or a warm OpenMP pool.
+    Workers split the machine's cores between their torch intra-op thread pools.
+    Requests wait in the parent's queue and are handed to the next idle worker,
+    so the pool knows which request each worker is running. A worker that dies
+    fails its request and is replaced.
+    """
+
+    def __init__(self, num_workers=None, threads_per_worker=None, handlers=None):
+        cpu_count = os.cpu_count() or 1
+        self.num_workers = num_workers or cpu_count
+        self.threads_per_worker = threads_per_worker or max(1, cpu_count // self.num_workers)
+        self.handlers = handlers if handlers is not None else default_handlers()
+        self.context = multiprocessing.get_context('forkserver')
+        self.preload = sorted({handler.__module__ for handler in self.handlers.values()})
+        if handlers is None:
+            self.preload.append('inference')
+        # (process, connection) per worker
+        self.workers = []
+        self.idle = []
+        # Connection to the future of the request its worker is running
+        self.running = {}
+        self.queue = deque()
+        self.lock = threading.Lock()
+        self.closing = False
+        self.collector = None
+
+    def _start_worker(self):
+        parent_connection, child_connection = self.context.Pipe()
+        worker = self.context.Process(
+            target=_worker_loop,
+            args=(self.handlers, child_connection, self.threads_per_worker),
+            daemon=True
+        )
+        worker.start()
+        child_connection.close()
+        return worker, parent_connection
+
+    def _dispatch(self):
+        # Called with the lock held
+        while self.queue and self.idle:
+            future, operation, file_content = self.queue.popleft()
+            connection = self.idle.pop()
+            self.running[connection] = future
+            try:
+                connection.send((operation, file_content))
+            except OSError:
+                # The worker has exited; the collector fails the request
+                pass
+
+    def start(self):
+        """
+        Fork the workers and start collecting their results.
+        """
+        _start_forkserver(self.preload)
+        workers = [self._start_worker() for _ in range(self.num_workers)]
+        with self.lock:
+            self.workers.extend(workers)
+            self.idle.extend(connection for _, connection in workers)
+            self._dispatch()
+        self.collector = threading.Thread(target=self._collect_results, daemon=True)
+        self.collector.start()
+        return self
+
+    def _collect_results(self):
+        """
+        Wait for replies and worker exits until the pool is closed and all
+        workers have stopped.
+        """
+        while True:
+            with self.lock:
+                workers = list(self.workers)
+            if not workers:
+                break
+            ready = wait([connection for _, connection in workers] + [worker.sentinel for worker, _ in workers])
+            for worker, connection in workers:
+                exited = worker.sentinel in ready
+                if connection in ready:
+                    try:
+                        self._reply(connection, connection.recv())
+                    except (EOFError, OSError):
+                        exited = True
+                if exited:
+                    self._worker_exited(worker, connection)
+
+    def _reply(self, connection, reply):
+        with self.lock:
+            future = self.running.pop(connection)
+            self.idle.append(connection)
+            self._dispatch()
+        _resolve(future, *reply)
+
+    def _worker_exited(self, worker, connection):
+        """
+        Fail the request a worker was running when it exited and, unless the
+        pool is closing, start a replacement.
+        """
+        worker.join()
+        with self.lock:
+            self.workers.remove((worker, connection))
+            if connection in self.idle:
+                self.idle.remove(connection)
+            future = self.running.pop(connection, None)
+            restart = not self.closing
+        # The worker may have replied just before it exited
+        try:
+            if future is not None and connection.poll():
+                _resolve(future, *connection.recv())
+                future = None
+        except (EOFError, OSError):
+            pass
+        connection.close()
+        if restart:
+            replacement = self._start_worker()
+            with self.lock:
+                self.workers.append(replacement)
+                if self.closing:
+                    # close() started after the replacement was forked and only stops the workers it saw
+                    replacement[1].send(None)
+                else:
+                    self.idle.append(replacement[1])
+                    self._dispatch()
+        if future is not None:
+            future.set_exception(RuntimeError(f"Worker {worker.pid} exited with code {worker.exitcode} while running the request"))
+
+    def submit(self, operation, file_content):
+        """
+        Queue a request for the next free worker.
+
+        Parameters:
+            operation (str): The operation to run (summarize, verify, corrections).
+            file_content (str): The content of the code file.
+
+        Returns:
+            Future: Resolves to the operation's result.
+        """
+        if operation not in self.handlers:
+            raise ValueError(f"Unknown operation: {operation}")
+        future = Future()
+        with self.lock:
+            self.queue.append((future, operation, file_content))
+            self._dispatch()
+        return future
+
+    def map(self, operation, contents):
+        """
+        Run an operation over many contents across the workers.
+
+        Parameters:
+            operation (str): The operation to run (summarize, verify, corrections).
+            contents (list): Contents of the code files.
+
+        Returns:
+            list: Results in the order of the contents.
+        """
+        futures = [self.submit(operation, content) for content in contents]
+        return [future.result() for future in futures]
+
+    def close(self):
+        """
+        Let the workers finish queued requests, then stop them.
+        """
+        if self.collector is None:
+            return
+        with self.lock:
+            outstanding = [future for future, _, _ in self.queue] + list(self.running.values())
+        wait_futures(outstanding)
+        with self.lock:
+            self.closing = True
+            workers = list(self.workers)
+        for worker, connection in workers:
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+        for worker, _ in workers:
+            worker.join()
+        self.collector.join()
+        self.collector = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure Veronica throughput with a pool of worker processes.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--threads-per-worker', type=int, default=None)
+    parser.add_argument('--requests', type=int, default=32)
+    args = parser.parse_args()
+
+    if sys.platform == 'win32':
+        sys.exit("The worker pool requires a fork server and is not available on Windows.")
+
+    contents = [f"def example_function_{i}(x, y): return x + y * {i}" for i in range(args.requests)]
+    with VeronicaWorkerPool(args.workers, args.threads_per_worker) as pool:
+        start_time = time.perf_counter()
+        pool.map('summarize', contents)
+        elapsed = time.perf_counter() - start_time
+    print(f"{args.requests} requests on {args.workers} workers in {elapsed:.2f}s "
+          f"({args.requests / elapsed:.2f} requests/s)")
@@ -0,0 +1,247 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+import platform
+import argparse
+import subprocess
+
+# Wheels and ready-made virtual environments, keyed by requirements and Python version
+cache_root = os.getenv('GPT_ENV_CACHE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache'))
+wheelhouse_dir = os.path.join(cache_root, 'wheelhouse')
+venv_cache_dir = os.path.join(cache_root, 'venvs')
+
+# Marker written into a venv once it is fully installed, recording its key
+marker_name = '.requirements_key'
+
+def requirement_lines(requirements_path):
+    """
+    Read the requirements of a file as a sorted list of distinct lines, without
+    blank lines, comments or surrounding whitespace.
+
+    Parameters:
+        requirements_path (str): Path to the requirements file.
+
+    Returns:
+        list: The normalized requirement lines.
+    """
+    with open(requirements_path, 'r', encoding='utf-8') as f:
+        lines = {line.split(' #')[0].strip() for line in f}
+    return sorted(line for line in lines if line and not line.startswith('#'))
+
+def environment_key(requirements_path, extra_requirements=()):
+    """
+    Compute the cache key of an environment from the requirements, any extra
+    requirements and the Python version and platform. Requirements are
+    normalized first, so reordered or repeated lines do not change the key.
+
+    Parameters:
+        requirements_path (str): Path to the requirements file.
+        extra_requirements (tuple): Requirements installed in addition to the file.
+
+    Returns:
+        str: Hex digest identifying the environment.
+    """
+    digest = hashlib.sha256()
+    digest.update("\n".join(requirement_lines(requirements_path)).encode('utf-8'))
+    for requirement in extra_requirements:
+        digest.update(f"\n{requirement}".encode('utf-8'))
+    digest.update(f"\n{platform.python_implementation()} {platform.python_version()} {sys.platform} {platform.machine()}".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def venv_bin_dir(venv_path):
+    """
+    Get the directory holding a virtual environment's executables and scripts.
+    """
+    return os.path.join(venv_path, 'Scripts' if platform.system() == 'Windows' else 'bin')
+
+def venv_python(venv_path):
+    """
+    Get the path of a virtual environment's Python interpreter.
+    """
+    return os.path.join(venv_bin_dir(venv_path), 'python.exe' if platform.system() == 'Windows' else 'python')
+
+def read_marker(venv_path):
+    """
+    Get the environment key a virtual environment was built for, or None.
+    """
+    marker_path = os.path.join(venv_path, marker_name)
+    if not os.path.exists(marker_path):
+        return None
+    with open(marker_path, 'r') as f:
+        return json.load(f).get('key')
+
+def write_marker(venv_path, key):
+    """
+    Record that a virtual environment is fully installed for the key.
+    """
+    with open(os.path.join(venv_path, marker_name), 'w') as f:
+        json.dump({'key': key}, f)
+
+def wheelhouse_complete(key):
+    """
+    Check whether the wheelhouse holds every wheel needed for the environment.
+
+    Parameters:
+        key (str): Environment key from environment_key.
+
+    Returns:
+        bool: True if the environment can be installed without network access.
+    """
+    return os.path.exists(os.path.join(wheelhouse_dir, f"{key}.complete"))
+
+def build_wheelhouse(requirements_path, key, extra_requirements=()):
+    """
+    Download or build wheels for all requirements into the shared wheelhouse.
+    This is the only step that needs network access, and it runs once per key.
+
+    Parameters:
+        requirements_path (str): Path to the requirements file.
+        key (str): Environment key from environment_key.
+        extra_requirements (tuple): Requirements installed in addition to the file.
+    """
+    if wheelhouse_complete(key):
+        return
+    os.makedirs(wheelhouse_dir, exist_ok=True)
+    subprocess.run(
+        [sys.executable, '-m', 'pip', 'wheel', '--wheel-dir', wheelhouse_dir,
+         '--find-links', wheelhouse_dir, '-r', requirements_path, *extra_requirements],
+        check=True
+    )
+    with open(os.path.join(wheelhouse_dir, f"{key}.complete"), 'w') as f:
+        f.write(requirements_path)
+
+def offline_pip_env():
+    """
+    Environment variables that make pip install from the wheelhouse only.
+
+    Returns:
+        dict: A copy of os.environ with pip pointed at the wheelhouse.
+    """
+    env = os.environ.copy()
+    env['PIP_NO_INDEX'] = '1'
+    env['PIP_FIND_LINKS'] = wheelhouse_dir
+    return env
+
+def get_cached_venv(requirements_path, extra_requirements=()):
+    """
+    Get the cached virtual environment for the requirements, creating it from
+    the wheelhouse on a cache miss.
+
+    Parameters:
+        requirements_path (str): Path to the requirements file.
+        extra_requirements (tuple): Requirements installed in addition to the file.
+
+    Returns:
+        str: Path to the cached virtual environment.
+    """
+    key = environment_key(requirements_path, extra_requirements)
+    cached_venv = os.path.join(venv_cache_dir, key)
+    if read_marker(cached_venv) == key:
+        return cached_venv
+
+    build_wheelhouse(requirements_path, key, extra_requirements)
+    building_venv = f"{cached_venv}.building"
+    shutil.rmtree(building_venv, ignore_errors=True)
+    os.makedirs(venv_cache_dir, exist_ok=True)
+    subprocess.run([sys.executable, '-m', 'venv', building_venv], check=True)
+    subprocess.run(
+        [venv_python(building_venv), '-m', 'pip', 'install', '-r', requirements_path, *extra_requirements],
+        check=True,
+        env=offline_pip_env()
+    )
+    write_marker(building_venv, key)
+    shutil.rmtree(cached_venv, ignore_errors=True)
+    os.rename(building_venv, cached_venv)
+    # The venv was built in a different directory, so point its scripts at the final path
+    rewrite_venv_paths(cached_venv, building_venv, cached_venv)
+    return cached_venv
+
+def _link_or_copy(source, target):
+    # Files that may be edited in place would change the cache through a hardlink
+    if (os.path.basename(os.path.dirname(source)) in ('bin', 'Scripts') or source.endswith('.pth')
+            or os.path.basename(source) in ('pyvenv.cfg', marker_name)):
+        shutil.copy2(source, target)
+        return
+    try:
+        os.link(source, target)
+    except OSError:
+        # Hardlinks fail across filesystems and on some Windows volumes
+        shutil.copy2(source, target)
+
+def rewrite_venv_paths(venv_path, old_path, new_path):
+    """
+    Rewrite the absolute venv path in activation scripts, script shebangs and
+    pyvenv.cfg. Rewritten files are replaced rather than edited in place, so
+    files hardlinked from the cache are never modified.
+
+    Parameters:
+        venv_path (str): The virtual environment to fix up.
+        old_path (str): The path the environment was created at.
+        new_path (str): The path the environment now lives at.
+    """
+    old_bytes = os.path.abspath(old_path).encode('utf-8')
+    new_bytes = os.path.abspath(new_path).encode('utf-8')
+    bin_dir = venv_bin_dir(venv_path)
+    candidates = [os.path.join(venv_path, 'pyvenv.cfg')]
+    candidates += [os.path.join(bin_dir, name) for name in os.listdir(bin_dir)]
+    for path in candidates:
+        if os.path.islink(path) or not os.path.isfile(path) or path.endswith('.exe'):
+            continue
+        with open(path, 'rb') as f:
+            content = f.read()
+        if old_bytes not in content:
+            continue
+        temp_path = f"{path}.rewrite"
+        with open(temp_path, 'wb') as f:
+            f.write(content.replace(old_bytes, new_bytes))
+        shutil.copymode(path, temp_path)
+        os.replace(temp_path, path)
+
+def clone_venv(source_venv, target_venv):
+    """
+    Clone a cached virtual environment by hardlinking its files, then fix up
+    the paths baked into its scripts. Scripts, pyvenv.cfg and .pth files are
+    private to the clone; installed package files share their inode with the
+    cache, so they must be replaced rather than edited in place (pip
+    install and uninstall already do this).
+
+    Parameters:
+        source_venv (str): The cached virtual environment.
+        target_venv (str): Where the clone should live.
+    """
+    shutil.rmtree(target_venv, ignore_errors=True)
+    shutil.copytree(source_venv, target_venv, symlinks=True, copy_function=_link_or_copy)
+    rewrite_venv_paths(target_venv, source_venv, target_venv)
+
+def ensure_venv(requirements_path, target_venv, extra_requirements=()):
+    """
+    Make target_venv an environment with the requirements installed.
+    An environment already built for the same key is left as is; otherwise it
+    is cloned from the cache, which is built from the wheelhouse on first use.
+
+    Parameters:
+        requirements_path (str): Path to the requirements file.
+        target_venv (str): Path of the virtual environment to provide.
+        extra_requirements (tuple): Requirements installed in addition to the file.
+
+    Returns:
+        str: The environment key.
+    """
+    key = environment_key(requirements_path, extra_requirements)
+    if read_marker(target_venv) == key:
+        print(f"Reusing virtual environment {target_venv} ({key})")
+        return key
+    cached_venv = get_cached_venv(requirements_path, extra_requirements)
+    clone_venv(cached_venv, target_venv)
+    print(f"Cloned virtual environment {target_venv} from cache ({key})")
+    return key
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Provide a virtual environment from the requirements cache.")
+    parser.add_argument('requirements', help="Path to the requirements file")
+    parser.add_argument('venv', help="Path of the virtual environment to provide")
+    parser.add_argument('--extra', action='append', default=[], help="Additional requirement to install")
+    args = parser.parse_args()
+    ensure_venv(args.requirements, args.venv, tuple(args.extra))
@@ -4,6 +4,10 @@ import sys
 import platform
 from tkinter import Tk, Text, Scrollbar, Button, Label, END
 from dashboard import create_dashboard
+from env_cache import ensure_venv, environment_key, wheelhouse_complete, offline_pip_env
+
+# Installed by the setup scripts in addition to the requirements file
+setup_extra_requirements = ("openai", "flask")
 
 def set_project_root():
     project_root = os.getenv('PROJECT_ROOT')
@@ -33,14 +37,26 @@ def run_setup_script():
     project_root = os.getenv('PROJECT_ROOT')
     setup_directory = os.path.join(project_root, 'GPT', 'setup')
 
+    # Provide the setup venv from the requirements cache, so the setup script
+    # finds its dependencies installed. Once the wheelhouse holds every wheel,
+    # pip in the script installs from it without network access.
+    env = None
+    requirements_path = os.path.join(project_root, 'GPT', 'requirements.txt')
+    if not os.path.exists(requirements_path):
+        print(f"The GPT requirements file does not exist: {requirements_path}")
+        sys.exit(1)
+    ensure_venv(requirements_path, os.path.join(setup_directory, 'venv'), setup_extra_requirements)
+    if wheelhouse_complete(environment_key(requirements_path, setup_extra_requirements)):
+        env = offline_pip_env()
+
     if platform.system() == 'Windows':
         print("Detected Windows OS.")
         setup_script = os.path.join(setup_directory, 'setup_env.bat')
-        subprocess.run(setup_script, shell=True)
+        subprocess.run(setup_script, shell=True, env=env)
     else:
         print("Detected Unix-like OS.")
         setup_script = os.path.join(setup_directory, 'setup_env.sh')
-        subprocess.run(['bash', setup_script])
+        subprocess.run(['bash', setup_script], env=env)
 
 def run_tests():
     project_root = os.getenv('PROJECT_ROOT')
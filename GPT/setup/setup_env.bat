@@ -32,11 +32,14 @@ REM Install necessary dependencies
 pip install -r requirements.txt
 pip install openai flask
 
-REM Append to the project's requirements.txt
-IF EXIST "%PROJECT_ROOT%\requirements.txt" (
-  type requirements.txt >> "%PROJECT_ROOT%\requirements.txt"
-) ELSE (
+REM Add the requirements missing from the project's requirements.txt, so
+REM running the setup again leaves the file (and its environment cache key) unchanged
+IF NOT EXIST "%PROJECT_ROOT%\requirements.txt" (
   copy requirements.txt "%PROJECT_ROOT%\requirements.txt"
+) ELSE (
+  FOR /F "usebackq delims=" %%r IN ("requirements.txt") DO (
+    findstr /X /L /C:"%%r" "%PROJECT_ROOT%\requirements.txt" >nul || echo %%r>> "%PROJECT_ROOT%\requirements.txt"
+  )
 )
 
 echo Environment setup complete.
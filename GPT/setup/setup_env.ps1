@@ -25,8 +25,17 @@ if (-not $env:PROJECT_ROOT) {
   pip install -r requirements.txt
   pip install openai flask
   
-  # Append to the project's requirements.txt
-  Get-Content requirements.txt | Add-Content "$env:PROJECT_ROOT\requirements.txt"
+  # Add the requirements missing from the project's requirements.txt, so
+  # running the setup again leaves the file (and its environment cache key) unchanged
+  $projectRequirements = "$env:PROJECT_ROOT\requirements.txt"
+  $existing = @()
+  if (Test-Path -Path $projectRequirements) {
+    $existing = Get-Content $projectRequirements
+  }
+  $missing = Get-Content requirements.txt | Where-Object { $_.Trim() -and ($existing -notcontains $_) }
+  if ($missing) {
+    $missing | Add-Content $projectRequirements
+  }
   
   Write-Host "Environment setup complete."
   
\ No newline at end of file
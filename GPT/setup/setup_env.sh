@@ -27,7 +27,17 @@ fi
 pip install -r requirements.txt
 pip install openai flask
 
-# Append to the project's requirements.txt
-cat requirements.txt >> "$PROJECT_ROOT/requirements.txt"
+# Add the requirements missing from the project's requirements.txt, so
+# running the setup again leaves the file (and its environment cache key) unchanged
+PROJECT_REQUIREMENTS="$PROJECT_ROOT/requirements.txt"
+touch "$PROJECT_REQUIREMENTS"
+if [ -s "$PROJECT_REQUIREMENTS" ] && [ -n "$(tail -c 1 "$PROJECT_REQUIREMENTS")" ]; then
+  echo >> "$PROJECT_REQUIREMENTS"
+fi
+while IFS= read -r requirement || [ -n "$requirement" ]; do
+  if [ -n "$requirement" ] && ! grep -qxF -- "$requirement" "$PROJECT_REQUIREMENTS"; then
+    echo "$requirement" >> "$PROJECT_REQUIREMENTS"
+  fi
+done < requirements.txt
 
 echo "Environment setup complete."
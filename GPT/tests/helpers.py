@@ -0,0 +1,39 @@
+import os
+import json
+import torch
+from transformers import GPT2Config, GPT2LMHeadModel, GPT2Tokenizer
+
+def byte_tokenizer(directory):
+    """
+    Build a GPT-2 tokenizer with a byte-level vocabulary and no merges, so no
+    pretrained files are needed. Every byte of the text is one token.
+    """
+    byte_chars = list(range(ord("!"), ord("~") + 1)) + list(range(ord("¡"), ord("¬") + 1)) + list(range(ord("®"), ord("ÿ") + 1))
+    chars = byte_chars[:]
+    extra = 0
+    for b in range(256):
+        if b not in byte_chars:
+            chars.append(256 + extra)
+            extra += 1
+    vocab = {chr(c): i for i, c in enumerate(chars)}
+    vocab["<|endoftext|>"] = len(vocab)
+    vocab_file = os.path.join(directory, 'vocab.json')
+    merges_file = os.path.join(directory, 'merges.txt')
+    with open(vocab_file, 'w') as f:
+        json.dump(vocab, f)
+    with open(merges_file, 'w') as f:
+        f.write("#version: 0.2\n")
+    return GPT2Tokenizer(vocab_file, merges_file)
+
+def tiny_model(seed, vocab_size, n_layer=2, n_embd=32, n_positions=128, eos_token_id=None):
+    """
+    Build a small randomly initialized GPT-2 model in eval mode. The end of
+    text token defaults to the last token of the vocabulary.
+    """
+    eos_token_id = vocab_size - 1 if eos_token_id is None else eos_token_id
+    torch.manual_seed(seed)
+    config = GPT2Config(n_layer=n_layer, n_head=2, n_embd=n_embd, vocab_size=vocab_size, n_positions=n_positions,
+                        bos_token_id=eos_token_id, eos_token_id=eos_token_id)
+    model = GPT2LMHeadModel(config)
+    model.eval()
+    return model
@@ -0,0 +1,175 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+import brain.integration_api as integration_api
+from brain.integration_api import app
+from brain.upstream import ResponseCache, RateLimiter, SingleFlight, content_key
+
+class TestBatchApi(unittest.TestCase):
+
+    def setUp(self):
+        self.requests = []
+        self.release = threading.Event()
+        self.release.set()
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.patches = [
+            mock.patch.multiple(integration_api, response_cache=ResponseCache(), rate_limiter=RateLimiter(0), single_flight=SingleFlight(),
+                                error_log_path=os.path.join(self.test_dir.name, "error.txt")),
+            mock.patch.object(integration_api, 'request_operation', side_effect=self._fake_request),
+        ]
+        for patch in self.patches:
+            patch.start()
+        self.client = app.test_client()
+
+    def tearDown(self):
+        self.release.set()
+        for patch in self.patches:
+            patch.stop()
+        self.test_dir.cleanup()
+
+    def _fake_request(self, operation, content):
+        self.requests.append((operation, content))
+        self.release.wait(10)
+        if content == "boom":
+            raise RuntimeError("upstream failed")
+        # Earlier items finish later, so results arrive out of order
+        time.sleep(0.05 if content == "first" else 0)
+        return f"{operation}: {content}"
+
+    def _post(self, path, items):
+        response = self.client.post(path, json={"items": items})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    def test_results_stream_per_item(self):
+        lines = self._post("/summarize/batch", [{"id": "a", "content": "first"}, {"id": "b", "content": "second"}, {"content": "third"}])
+        self.assertEqual(lines[-1], {"id": "a", "summary": "summarize: first", "cached": False})
+        results = {line["id"]: line for line in lines}
+        self.assertEqual(results["b"]["summary"], "summarize: second")
+        self.assertEqual(results[2]["summary"], "summarize: third")
+
+    def test_item_errors_do_not_fail_the_batch(self):
+        lines = self._post("/verify/batch", [{"id": 1, "content": "boom"}, {"id": 2, "content": "fine"}, {"id": 3}, "not an item"])
+        results = {line["id"]: line for line in lines}
+        self.assertEqual(results[1]["error"], "RuntimeError: upstream failed")
+        self.assertEqual(results[2]["verification"], "verify: fine")
+        self.assertIn("error", results[3])
+        self.assertEqual(len(lines), 4)
+
+    def test_repeated_content_is_cached(self):
+        self._post("/corrections/batch", [{"id": "x", "content": "same"}])
+        lines = self._post("/corrections/batch", [{"id": "y", "content": "same"}])
+        self.assertEqual(lines, [{"id": "y", "corrections": "corrections: same", "cached": True}])
+        self.assertEqual(self.requests, [("corrections", "same")])
+        # A failed request is not cached
+        self._post("/corrections/batch", [{"content": "boom"}, {"content": "boom"}])
+        self.assertEqual(self.requests.count(("corrections", "boom")), 2)
+
+    def test_invalid_batches(self):
+        self.assertEqual(self.client.post("/summarize/batch", json={}).status_code, 400)
+        self.assertEqual(self.client.post("/summarize/batch", json={"items": "code"}).status_code, 400)
+        with mock.patch.object(integration_api, 'max_batch_items', 2):
+            self.assertEqual(self.client.post("/summarize/batch", json={"items": [{"content": "x"}] * 3}).status_code, 413)
+
+    def test_disconnect_cancels_pending_items(self):
+        self.release.clear()
+        executor = ThreadPoolExecutor(max_workers=1)
+        with mock.patch.object(integration_api, 'batch_executor', executor):
+            # The invalid item's line is sent at once, while the first valid item blocks the only worker
+            response = self.client.post("/summarize/batch", json={"items": [{"id": "invalid"}] + [{"content": f"item {i}"} for i in range(4)]})
+            # The client goes away after reading the first line
+            response.close()
+            self.release.set()
+            executor.shutdown(wait=True)
+        self.assertEqual(self.requests, [("summarize", "item 0")])
+
+    def _wait_for_coalesced(self, count):
+        deadline = time.time() + 10
+        while integration_api.single_flight.stats()["coalesced"] < count:
+            if time.time() > deadline:
+                self.fail(f"Expected {count} coalesced requests")
+            time.sleep(0.01)
+
+    def test_concurrent_identical_requests_share_one_call(self):
+        self.release.clear()
+        responses = []
+        threads = [threading.Thread(target=lambda: responses.append(self.client.post("/verify", json={"content": "same"}).get_json()))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        self._wait_for_coalesced(4)
+        self.release.set()
+        for thread in threads:
+            thread.join(10)
+
+        self.assertEqual(self.requests, [("verify", "same")])
+        self.assertEqual(len(responses), 5)
+        stats = self.client.get("/upstream/stats").get_json()
+        self.assertEqual(stats["coalescing"], {"calls": 1, "coalesced": 4, "in_flight": 0})
+        # Later requests are answered from the cache
+        self.client.post("/verify", json={"content": "same"})
+        self.assertEqual(len(self.requests), 1)
+
+    def test_errors_are_shared_but_not_kept(self):
+        self.release.clear()
+        lines = []
+        thread = threading.Thread(target=lambda: lines.extend(self._post("/summarize/batch", [{"id": i, "content": "boom"} for i in range(3)])))
+        thread.start()
+        self._wait_for_coalesced(2)
+        self.release.set()
+        thread.join(10)
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(all(line["error"] == "RuntimeError: upstream failed" for line in lines))
+        self.assertEqual(len(self.requests), 1)
+        self._post("/summarize/batch", [{"content": "boom"}])
+        self.assertEqual(len(self.requests), 2)
+
+class TestUpstream(unittest.TestCase):
+
+    def test_cache_evicts_least_recently_used(self):
+        cache = ResponseCache(max_entries=2)
+        cache.put(content_key("summarize", "a"), "A")
+        cache.put(content_key("summarize", "b"), "B")
+        self.assertEqual(cache.get(content_key("summarize", "a")), "A")
+        cache.put(content_key("summarize", "c"), "C")
+        self.assertIsNone(cache.get(content_key("summarize", "b")))
+        self.assertIsNone(cache.get(content_key("verify", "a")))
+        self.assertEqual(cache.stats(), {"entries": 2, "hits": 1, "misses": 2})
+
+    def test_cache_entries_expire(self):
+        cache = ResponseCache(ttl_seconds=0.01)
+        cache.put("key", "value")
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("key"))
+
+    def test_rate_limiter_spaces_requests_after_burst(self):
+        limiter = RateLimiter(requests_per_minute=600, burst=2)
+        self.assertTrue(limiter.acquire(timeout=0))
+        self.assertTrue(limiter.acquire(timeout=0))
+        self.assertFalse(limiter.acquire(timeout=0))
+        start = time.monotonic()
+        self.assertTrue(limiter.acquire(timeout=1))
+        self.assertGreater(time.monotonic() - start, 0.05)
+
+    @unittest.skipIf(sys.platform == 'win32', "The shared rate limit needs fcntl")
+    def test_rate_limiter_with_a_state_file_is_shared(self):
+        with tempfile.TemporaryDirectory() as state_dir:
+            state_path = os.path.join(state_dir, 'bucket')
+            # As in two server workers
+            first = RateLimiter(requests_per_minute=60, burst=2, state_path=state_path)
+            second = RateLimiter(requests_per_minute=60, burst=2, state_path=state_path)
+            self.assertTrue(first.acquire(timeout=0))
+            self.assertTrue(second.acquire(timeout=0))
+            self.assertFalse(first.acquire(timeout=0))
+            self.assertFalse(second.acquire(timeout=0))
+            self.assertTrue(RateLimiter(requests_per_minute=60, burst=2).acquire(timeout=0))
+
+if __name__ == "__main__":
+    unittest.main()
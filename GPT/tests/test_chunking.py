@@ -0,0 +1,123 @@
+import os
+import hashlib
+import tempfile
+import unittest
+import tracemalloc
+from brain.chunking import chunk_references, iter_chunks, iter_block_chunks, chunk_file, read_chunk, chunk_label, materialize_chunk
+
+class TestChunking(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.root_directory = self.test_dir.name
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    def _write(self, name, content):
+        path = os.path.join(self.root_directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def test_references_cover_the_file(self):
+        content = "".join(f"line {i}: naïve café ✓ 🐼\n" for i in range(5000))
+        path = self._write('big.py', content)
+        references = list(chunk_references(path, chunk_size=4096))
+
+        self.assertGreater(len(references), 10)
+        self.assertEqual(references[0].offset, 0)
+        for previous, reference in zip(references, references[1:]):
+            self.assertEqual(reference.offset, previous.offset + previous.length)
+        self.assertEqual(sum(reference.length for reference in references), os.path.getsize(path))
+
+        # Every chunk decodes on its own and the chunks join back into the file
+        self.assertEqual("".join(read_chunk(reference) for reference in references), content)
+        with open(path, 'rb') as f:
+            data = f.read()
+        for reference in references:
+            self.assertLessEqual(reference.length, 4096)
+            chunk_bytes = data[reference.offset:reference.offset + reference.length]
+            self.assertEqual(reference.hash, hashlib.sha256(chunk_bytes).hexdigest())
+            chunk_bytes.decode('utf-8')
+
+    def test_streamed_chunks_match_references(self):
+        content = "🐼é" * 1000 + "tail"
+        path = self._write('wide.py', content)
+        for chunk_size in (4, 5, 7, 4096):
+            chunks = list(chunk_file(path, chunk_size))
+            self.assertEqual("".join(chunks), content)
+            self.assertTrue(all(len(chunk.encode('utf-8')) <= chunk_size for chunk in chunks))
+            pairs = list(iter_chunks(path, chunk_size))
+            self.assertEqual([reference for reference, _ in pairs], list(chunk_references(path, chunk_size)))
+            self.assertEqual([text for _, text in pairs], chunks)
+            self.assertEqual([read_chunk(reference) for reference, _ in pairs], chunks)
+
+    def test_block_chunks_end_before_statements_and_survive_edits(self):
+        functions = [f"@cached\ndef function_{i}(value):\n    return value * {i}  # ✓\n\n" for i in range(300)]
+        path = self._write('module.py', "".join(functions))
+        pairs = list(iter_block_chunks(path, chunk_size=1000))
+        self.assertGreater(len(pairs), 5)
+        self.assertEqual("".join(text for _, text in pairs), "".join(functions))
+        for previous, (reference, text) in zip(pairs, pairs[1:]):
+            self.assertEqual(reference.offset, previous[0].offset + previous[0].length)
+            # Decorators stay with the function they decorate
+            self.assertTrue(text.startswith("@cached\n"))
+        self.assertTrue(all(reference.length <= 1000 for reference, _ in pairs))
+
+        # Growing one function changes its chunk only
+        functions[150] = functions[150].replace("return", "value += 1\n    return")
+        self._write('module.py', "".join(functions))
+        before = {reference.hash for reference, _ in pairs}
+        after = [reference.hash for reference, _ in iter_block_chunks(path, chunk_size=1000)]
+        self.assertEqual(len([chunk_hash for chunk_hash in after if chunk_hash not in before]), 1)
+
+    def test_block_chunks_split_long_lines(self):
+        content = "x = '" + "é" * 3000 + "'\ny = 1\n"
+        path = self._write('long.py', content)
+        pairs = list(iter_block_chunks(path, chunk_size=1000))
+        self.assertEqual("".join(text for _, text in pairs), content)
+        self.assertTrue(all(reference.length <= 1000 for reference, _ in pairs))
+        self.assertEqual([read_chunk(reference) for reference, _ in pairs], [text for _, text in pairs])
+
+    def test_block_chunks_of_a_long_line_use_bounded_memory(self):
+        path = os.path.join(self.root_directory, 'minified.js')
+        with open(path, 'wb') as f:
+            for _ in range(64):
+                f.write(b"a" * (1 << 18))
+        tracemalloc.start()
+        try:
+            total = sum(reference.length for reference, _ in iter_block_chunks(path, chunk_size=5000))
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(total, 64 << 18)
+        self.assertLess(peak, 1 << 20)
+
+    def test_empty_file(self):
+        path = self._write('empty.py', "")
+        self.assertEqual(list(chunk_references(path)), [])
+        self.assertEqual(list(chunk_file(path)), [])
+
+    def test_chunk_label(self):
+        path = self._write('small.py', "x = 1\n")
+        reference = next(chunk_references(path))
+        self.assertEqual(chunk_label(reference), f"{path}@0+6")
+
+    def test_materialize_chunk_is_opt_in_and_does_not_collide(self):
+        first = self._write('a/module.py', "a = 1\n")
+        second = self._write('b/module.py', "b = 2\n")
+        first_reference = next(chunk_references(first))
+        second_reference = next(chunk_references(second))
+        self.assertIsNone(materialize_chunk(first_reference, "a = 1\n"))
+
+        chunk_dir = os.path.join(self.root_directory, 'chunks')
+        first_path = materialize_chunk(first_reference, "a = 1\n", chunk_dir)
+        second_path = materialize_chunk(second_reference, "b = 2\n", chunk_dir)
+        self.assertNotEqual(first_path, second_path)
+        with open(first_path) as f:
+            self.assertEqual(f.read(), "a = 1\n")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,197 @@
+import os
+import json
+import time
+import tempfile
+import unittest
+from unittest import mock
+import brain.dependency_analysis as dependency_analysis
+from brain.dependency_analysis import parse_imports, extract_imports, analyze_dependencies, resolve_dependencies
+
+SAMPLE_SOURCE = '''"""
+Module docstring mentioning
+import fake_docstring_module
+"""
+import os, sys
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from . import sibling
+from ..package.module import name
+
+TEMPLATE = "import fake_string_module"
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+def load():
+    import yaml
+    import os
+'''
+
+class TestDependencyAnalysis(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.root_directory = self.test_dir.name
+        self.cache_patch = mock.patch.multiple(
+            dependency_analysis,
+            import_cache=None,
+            import_cache_path=os.path.join(self.root_directory, "import_cache.json"),
+            dependency_indexes={}
+        )
+        self.cache_patch.start()
+        self.project = os.path.join(self.root_directory, 'project')
+        os.makedirs(self.project)
+        self._write('a.py', "import requests\n")
+        self._write('b.py', "from flask import Flask\n")
+
+    def tearDown(self):
+        self.cache_patch.stop()
+        self.test_dir.cleanup()
+
+    def _write(self, name, content):
+        with open(os.path.join(self.project, name), 'w') as f:
+            f.write(content)
+
+    def test_parse_imports(self):
+        details = parse_imports(SAMPLE_SOURCE)
+        self.assertEqual(details["modules"], ["collections", "json", "os", "simplejson", "sys", "xml", "yaml"])
+        self.assertIn("xml.etree.ElementTree", details["imports"])
+        self.assertIn("collections.OrderedDict", details["imports"])
+        self.assertEqual(details["relative"], ["..package.module", "..package.module.name", ".sibling"])
+        self.assertEqual(details["conditional"], ["json", "simplejson", "yaml"])
+
+    def test_extract_imports_ignores_strings(self):
+        imports = extract_imports(SAMPLE_SOURCE)
+        self.assertNotIn("fake_docstring_module", imports)
+        self.assertNotIn("fake_string_module", imports)
+
+    def test_unparseable_file_reports_error(self):
+        details = parse_imports("def broken(:\n")
+        self.assertEqual(details["modules"], [])
+        self.assertIn("error", details)
+
+    def test_analyze_dependencies_only_parses_changed_files(self):
+        self.assertEqual(analyze_dependencies(self.project), {"requests", "flask"})
+        self._write('b.py', "import numpy\n")
+        with mock.patch.object(dependency_analysis, 'parse_imports', wraps=parse_imports) as parse:
+            self.assertEqual(analyze_dependencies(self.project), {"requests", "numpy"})
+        self.assertEqual(parse.call_count, 1)
+
+    def _age_files(self):
+        old = time.time() - 60
+        for name in os.listdir(self.project):
+            os.utime(os.path.join(self.project, name), (old, old))
+
+    def _project_reads(self, open_mock):
+        return [call for call in open_mock.call_args_list if str(call.args[0]).startswith(self.project)]
+
+    def test_unchanged_files_are_not_read(self):
+        self._age_files()
+        analyze_dependencies(self.project)
+        with mock.patch('builtins.open', wraps=open) as open_mock:
+            self.assertEqual(analyze_dependencies(self.project), {"requests", "flask"})
+        self.assertEqual(self._project_reads(open_mock), [])
+
+        # A touched file is read and hashed again, but not parsed
+        os.utime(os.path.join(self.project, 'a.py'))
+        with mock.patch.object(dependency_analysis, 'parse_imports', wraps=parse_imports) as parse:
+            analyze_dependencies(self.project)
+        self.assertEqual(parse.call_count, 0)
+
+    def test_recently_modified_files_are_checked_again(self):
+        path = os.path.join(self.project, 'a.py')
+        analyze_dependencies(self.project)
+        mtime_ns = os.stat(path).st_mtime_ns
+        # Same size and mtime, different content, as with two writes within one mtime tick
+        self._write('a.py', "import requestz\n")
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+        self.assertEqual(analyze_dependencies(self.project), {"requestz", "flask"})
+
+    def test_cache_saves_merge_with_other_writers_and_drop_deleted_files(self):
+        analyze_dependencies(self.project)
+        other = os.path.join(self.root_directory, 'other.py')
+        with open(other, 'w') as f:
+            f.write("import yaml\n")
+        # Another process saved an entry after this one loaded the cache
+        cache_path = dependency_analysis.import_cache_path
+        with open(cache_path) as f:
+            on_disk = json.load(f)
+        on_disk[other] = {"hash": "0", "size": None, "mtime_ns": None, "imports": parse_imports("import yaml\n")}
+        with open(cache_path, 'w') as f:
+            json.dump(on_disk, f)
+
+        os.remove(os.path.join(self.project, 'b.py'))
+        self._write('c.py', "import numpy\n")
+        analyze_dependencies(self.project)
+        with open(cache_path) as f:
+            saved = json.load(f)
+        self.assertEqual(set(saved), {other} | {os.path.join(self.project, name) for name in ('a.py', 'c.py')})
+        self.assertFalse([name for name in os.listdir(self.root_directory) if name.endswith('.tmp')])
+
+    def test_dependencies_endpoint_supports_etags(self):
+        from brain.integration_api import app
+        client = app.test_client()
+        with mock.patch.dict(os.environ, {"ROOT_DIRECTORY": self.project}):
+            response = client.get("/dependencies")
+            self.assertEqual(response.get_json(), {"dependencies": ["flask", "requests"]})
+            etag = response.headers["ETag"]
+            self.assertEqual(client.get("/dependencies", headers={"If-None-Match": etag}).status_code, 304)
+
+            # Changes that keep the dependencies keep the ETag
+            self._write('c.py', "import requests\n")
+            self.assertEqual(client.get("/dependencies", headers={"If-None-Match": etag}).status_code, 304)
+            self._write('c.py', "import numpy\n")
+            response = client.get("/dependencies", headers={"If-None-Match": etag})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response.headers["ETag"], etag)
+
+    def test_parallel_parsing_matches_serial(self):
+        for i in range(10):
+            self._write(f"module_{i}.py", f"import package_{i}\n")
+        with mock.patch.object(dependency_analysis, 'parallel_parse_threshold', 1):
+            dependencies = analyze_dependencies(self.project)
+        self.assertEqual(dependencies, {"requests", "flask"} | {f"package_{i}" for i in range(10)})
+
+    def test_resolve_dependencies(self):
+        result = resolve_dependencies(
+            ["os\n", "json", "a", "pytest", "yaml_not_installed_anywhere==1.0", "# comment\n", "\n", "yaml"],
+            self.project
+        )
+        self.assertEqual(result["skipped"], ["os", "json", "a"])
+        self.assertIn("pytest", result["installed"])
+        self.assertIn("yaml_not_installed_anywhere==1.0", result["missing"])
+
+    def test_environments_in_the_project_are_not_local(self):
+        files = [
+            'venv/lib/python3.11/site-packages/notinstalledpkg/__init__.py',
+            '.venv/lib/python3.11/site-packages/hiddenpkg/__init__.py',
+            'env/lib/python3.11/site-packages/envpkg/__init__.py',
+            'env/pyvenv.cfg',
+            'app/__init__.py',
+            'tools/scripts/helper.py',
+        ]
+        for name in files:
+            os.makedirs(os.path.dirname(os.path.join(self.project, name)), exist_ok=True)
+            self._write(name, "")
+        result = resolve_dependencies(
+            ["notinstalledpkg", "hiddenpkg", "envpkg", "lib", "app", "tools", "helper", "a"],
+            self.project
+        )
+        self.assertEqual(result["skipped"], ["app", "tools", "helper", "a"])
+        self.assertEqual(result["missing"], ["notinstalledpkg", "hiddenpkg", "envpkg", "lib"])
+
+    def test_verify_dependencies_installs_missing_in_one_call(self):
+        requirements_path = os.path.join(self.root_directory, "requirements.txt")
+        with open(requirements_path, 'w') as f:
+            f.write("os\npytest\nmissing_package_one\nmissing_package_two\n")
+        with mock.patch.object(dependency_analysis, 'output_dir', self.root_directory), \
+                mock.patch.object(dependency_analysis.subprocess, 'check_call') as check_call:
+            result = dependency_analysis.verify_dependencies()
+        self.assertEqual(result["missing"], ["missing_package_one", "missing_package_two"])
+        check_call.assert_called_once()
+        self.assertEqual(check_call.call_args[0][0][-2:], ["missing_package_one", "missing_package_two"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+from setup.env_cache import environment_key, rewrite_venv_paths, clone_venv, venv_bin_dir
+
+class TestEnvCache(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.root = self.test_dir.name
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    def _write(self, path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+
+    def _read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def _make_venv(self, venv_path, built_at=None):
+        # Scripts and pyvenv.cfg refer to the path the environment was created at
+        built_at = built_at or venv_path
+        bin_dir = venv_bin_dir(venv_path)
+        self._write(os.path.join(venv_path, 'pyvenv.cfg'), f"home = /usr/bin\ncommand = python -m venv {built_at}\n")
+        self._write(os.path.join(bin_dir, 'activate'), f'VIRTUAL_ENV="{built_at}"\nexport VIRTUAL_ENV\n')
+        self._write(os.path.join(bin_dir, 'pip'), f"#!{built_at}/bin/python\nimport pip\n")
+        os.chmod(os.path.join(bin_dir, 'pip'), 0o755)
+        self._write(os.path.join(venv_path, 'lib', 'site-packages', 'module.py'), "VALUE = 1\n")
+        os.symlink('/usr/bin/python3', os.path.join(bin_dir, 'python'))
+
+    def test_environment_key(self):
+        requirements = os.path.join(self.root, 'requirements.txt')
+        self._write(requirements, "flask==2.2.5\n")
+        key = environment_key(requirements)
+        self.assertEqual(len(key), 16)
+        self.assertEqual(environment_key(requirements), key)
+        self.assertNotEqual(environment_key(requirements, ("openai",)), key)
+        self.assertNotEqual(environment_key(requirements, ("openai",)), environment_key(requirements, ("flask",)))
+        self._write(requirements, "flask==2.3.0\n")
+        self.assertNotEqual(environment_key(requirements), key)
+
+    def test_environment_key_ignores_order_repeats_and_comments(self):
+        requirements = os.path.join(self.root, 'requirements.txt')
+        self._write(requirements, "flask==2.2.5\nopenai\n")
+        key = environment_key(requirements)
+        # As left by setup scripts that appended the same requirements again
+        self._write(requirements, "# GPT\nopenai  \nflask==2.2.5\n\nflask==2.2.5 # web\nopenai\n")
+        self.assertEqual(environment_key(requirements), key)
+
+    def test_rewrite_venv_paths_replaces_files_instead_of_editing_them(self):
+        old_venv = os.path.join(self.root, 'old')
+        new_venv = os.path.join(self.root, 'new')
+        self._make_venv(new_venv, built_at=old_venv)
+        activate = os.path.join(venv_bin_dir(new_venv), 'activate')
+        # A hardlink shares the file with the cached environment
+        shared = os.path.join(self.root, 'shared_activate')
+        os.link(activate, shared)
+
+        rewrite_venv_paths(new_venv, old_venv, new_venv)
+        self.assertEqual(self._read(activate), f'VIRTUAL_ENV="{new_venv}"\nexport VIRTUAL_ENV\n')
+        self.assertEqual(self._read(os.path.join(new_venv, 'pyvenv.cfg')), f"home = /usr/bin\ncommand = python -m venv {new_venv}\n")
+        pip = os.path.join(venv_bin_dir(new_venv), 'pip')
+        self.assertTrue(self._read(pip).startswith(f"#!{new_venv}/bin/python\n"))
+        self.assertTrue(os.access(pip, os.X_OK))
+        self.assertEqual(self._read(shared), f'VIRTUAL_ENV="{old_venv}"\nexport VIRTUAL_ENV\n')
+        self.assertEqual(os.readlink(os.path.join(venv_bin_dir(new_venv), 'python')), '/usr/bin/python3')
+
+    def test_clone_venv_hardlinks_files_and_fixes_paths(self):
+        source = os.path.join(self.root, 'cache', 'venvs', 'key')
+        target = os.path.join(self.root, 'project', 'venv')
+        self._make_venv(source)
+        self._write(os.path.join(source, 'lib', 'site-packages', 'extra.pth'), "/opt/extra\n")
+        self._write(os.path.join(venv_bin_dir(source), 'helper'), "echo helper\n")
+        self._write(os.path.join(target, 'stale.txt'), "left over\n")
+
+        clone_venv(source, target)
+        self.assertFalse(os.path.exists(os.path.join(target, 'stale.txt')))
+        self.assertEqual(self._read(os.path.join(venv_bin_dir(target), 'activate')), f'VIRTUAL_ENV="{target}"\nexport VIRTUAL_ENV\n')
+        self.assertEqual(self._read(os.path.join(venv_bin_dir(source), 'activate')), f'VIRTUAL_ENV="{source}"\nexport VIRTUAL_ENV\n')
+        module = os.path.join('lib', 'site-packages', 'module.py')
+        self.assertTrue(os.path.samefile(os.path.join(source, module), os.path.join(target, module)))
+        # Files that may be edited in place are not shared with the cache, even without a path to rewrite
+        for path in (os.path.join('lib', 'site-packages', 'extra.pth'), os.path.join(os.path.basename(venv_bin_dir(target)), 'helper')):
+            self.assertFalse(os.path.samefile(os.path.join(source, path), os.path.join(target, path)))
+        self.assertTrue(os.path.islink(os.path.join(venv_bin_dir(target), 'python')))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import os
+import json
+import math
+import tempfile
+import unittest
+from tests.helpers import byte_tokenizer, tiny_model
+from models.Veronica.evaluate_model import compute_perplexity, iter_held_out_texts, is_held_out
+
+class TestEvaluateModel(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.tokenizer = byte_tokenizer(self.test_dir.name)
+        self.model = tiny_model(0, len(self.tokenizer), n_layer=1, n_embd=16)
+        self.texts = ["def f(x): return x", "import os", "print('a much longer line of text than the others')"]
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    def test_perplexity_independent_of_batch_size(self):
+        single = compute_perplexity(self.model, self.tokenizer, self.texts, batch_size=1)
+        batched = compute_perplexity(self.model, self.tokenizer, self.texts, batch_size=3)
+        self.assertEqual(single["tokens"], batched["tokens"])
+        self.assertAlmostEqual(single["perplexity"], batched["perplexity"], places=3)
+        self.assertTrue(math.isfinite(batched["perplexity"]))
+
+    def test_held_out_split_is_stable(self):
+        names = [f"summarize_{i}.json" for i in range(1000)]
+        held_out = [name for name in names if is_held_out(name)]
+        self.assertEqual(held_out, [name for name in names if is_held_out(name)])
+        self.assertTrue(0 < len(held_out) < len(names))
+
+    def test_iter_held_out_texts_streams_only_held_out_shards(self):
+        for i in range(50):
+            with open(os.path.join(self.test_dir.name, f"summarize_{i}.json"), 'w') as f:
+                json.dump({"operation": "summarize", "input": f"input {i}", "output": f"output {i}"}, f)
+        texts = list(iter_held_out_texts(self.test_dir.name))
+        expected = sum(1 for i in range(50) if is_held_out(f"summarize_{i}.json")) * 2
+        self.assertEqual(len(texts), expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import os
+import tempfile
+import unittest
+import subprocess
+from unittest import mock
+import brain.dependency_analysis as dependency_analysis
+import brain.import_graph as import_graph
+import brain.results_store as results_store
+import brain.iterative_improvement as iterative_improvement
+from brain.git_diff import head_commit, changed_hunks, change_spans
+from brain.results_store import start_run, finish_run, last_analyzed_commit, get_result, file_hash, file_statuses
+
+class TestGitDiff(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.output_dir = os.path.join(self.test_dir.name, 'output')
+        os.makedirs(self.output_dir)
+        self.verify = mock.Mock(side_effect=lambda content, context="", usage=None, path=None: "Failed" if "BUG" in content else "Verified")
+        self.patches = [
+            mock.patch.multiple(results_store, current_run_id=None, results_db_path=os.path.join(self.output_dir, "results.db")),
+            mock.patch.multiple(dependency_analysis, import_cache=None, import_cache_path=os.path.join(self.output_dir, "import_cache.json")),
+            mock.patch.object(import_graph, 'import_graph_path', os.path.join(self.output_dir, "import_graph.json")),
+            mock.patch.multiple(iterative_improvement, output_dir=self.output_dir, verify_code=self.verify,
+                                summarize_code=mock.Mock(side_effect=lambda content, usage=None, path=None: f"summary of {len(content)} characters"),
+                                combine_summaries=mock.Mock(side_effect=lambda summaries, kind, usage=None: f"{kind} of {hash(summaries)}"),
+                                get_corrections=mock.Mock(return_value="No corrections.")),
+        ]
+        for patch in self.patches:
+            patch.start()
+        self.project = os.path.join(self.test_dir.name, 'project')
+        os.makedirs(self.project)
+        self._git("init", "-q")
+
+    def tearDown(self):
+        for connection in results_store._local.__dict__.pop('connections', {}).values():
+            connection.close()
+        for patch in self.patches:
+            patch.stop()
+        self.test_dir.cleanup()
+
+    def _git(self, *args):
+        subprocess.run(["git", "-C", self.project, "-c", "user.name=Test", "-c", "user.email=test@example.com", *args],
+                       check=True, capture_output=True)
+
+    def _write(self, name, content):
+        path = os.path.join(self.project, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def _commit(self):
+        self._git("add", "-A")
+        self._git("commit", "-q", "-m", "change")
+        return head_commit(self.project)
+
+    def _methods(self, count, changed=None):
+        lines = ["import os\n\n", "class Service:\n", "    \"\"\"A service.\"\"\"\n\n"]
+        for i in range(count):
+            body = "        value += 1  # BUG\n" if i == changed else ""
+            lines.append(f"    def method_{i}(self, value):\n{body}        return value * {i}\n\n")
+        return "".join(lines)
+
+    def test_changed_hunks(self):
+        path = self._write('module.py', "".join(f"line_{i} = {i}\n" for i in range(1, 11)))
+        commit = self._commit()
+        lines = [f"line_{i} = {i}\n" for i in range(1, 11)]
+        lines[2] = "line_3 = 'changed'\n"
+        del lines[6:8]
+        lines.append("line_11 = 11\n")
+        self._write('module.py', "".join(lines))
+        self.assertEqual(changed_hunks(self.project, commit), {os.path.normpath(path): [(3, 3), (6, 7), (9, 9)]})
+        self.assertIsNone(changed_hunks(self.project, "0" * 40))
+        self.assertIsNone(head_commit(self.test_dir.name))
+
+    def test_spans_widen_to_the_enclosing_method(self):
+        source = self._methods(5, changed=2)
+        spans = change_spans("service.py", source, [(13, 13)])
+        self.assertEqual(len(spans), 1)
+        self.assertEqual(spans[0].text, "Lines 12-14:\nclass Service:\n...\n"
+                                        "    def method_2(self, value):\n        value += 1  # BUG\n        return value * 2")
+        # Changes in the same method are sent once
+        self.assertEqual(len(change_spans("service.py", source, [(13, 13), (14, 14)])), 1)
+        # Other files get the lines around the change
+        self.assertEqual(change_spans("notes.txt", "a\nb\nc\nd\n", [(2, 2)])[0][:2], (1, 5))
+
+    def test_diff_run_sends_only_changed_methods_and_merges_verdicts(self):
+        large = self._write('service.py', self._methods(200))
+        small = self._write('small.py', "VALUE = 1\n")
+        other = self._write('other.py', "OTHER = 1\n")
+        start_run("run1", root_directory=self.project, git_commit=self._commit())
+        iterative_improvement.save_file_list(self.project)
+        finish_run()
+        chunks = len(get_result(large, file_hash(large))["chunks"])
+        self.assertGreater(chunks, 3)
+
+        self._write('service.py', self._methods(200, changed=120))
+        self._write('small.py', "VALUE = 2\n")
+        self.verify.reset_mock()
+        start_run("run2", root_directory=self.project, git_commit=self._commit())
+        diff_base = last_analyzed_commit(self.project, "run2")
+        self.assertEqual(diff_base["run_id"], "run1")
+        iterative_improvement.save_file_list(self.project, diff_base=diff_base)
+
+        # One request for the changed method of the large file and one for the small file
+        sent = sorted((call[0][0] for call in self.verify.call_args_list), key=len)
+        self.assertEqual(len(sent), 2)
+        self.assertTrue(sent[0].startswith("Lines 1-1:\nVALUE = 2"))
+        self.assertIn("def method_120(self, value):\n        value += 1  # BUG", sent[1])
+        self.assertLess(len(sent[1]), 200)
+        self.assertIn("Summary of the file before the change:\n", self.verify.call_args_list[0][0][1])
+        # The path lets minification tell the snippet's language
+        self.assertEqual(sorted(call[1]["path"] for call in self.verify.call_args_list), sorted([large, small]))
+        self.assertEqual(sorted(call[1]["path"] for call in iterative_improvement.get_corrections.call_args_list[-2:]), sorted([large, small]))
+
+        result = get_result(large, file_hash(large))
+        self.assertFalse(result["verified"])
+        self.assertEqual([chunk["verdict"] for chunk in result["chunks"]].count("Failed"), 1)
+        self.assertEqual(len(result["chunks"]), chunks)
+        statuses = {status["path"]: status for status in file_statuses()}
+        self.assertEqual(statuses[other]["verified"], 1)
+        self.assertEqual(statuses[other]["prompt_tokens"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
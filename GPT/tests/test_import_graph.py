@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import brain.dependency_analysis as dependency_analysis
+import brain.import_graph as import_graph
+from brain.import_graph import build_import_graph, topological_order, dependency_context, module_name_for_path
+
+class TestImportGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.root_directory = self.test_dir.name
+        self.patches = [
+            mock.patch.multiple(
+                dependency_analysis,
+                import_cache=None,
+                import_cache_path=os.path.join(self.root_directory, "import_cache.json")
+            ),
+            mock.patch.object(import_graph, 'import_graph_path', os.path.join(self.root_directory, "import_graph.json"))
+        ]
+        for patch in self.patches:
+            patch.start()
+        self.project = os.path.join(self.root_directory, 'project')
+        self._write('main.py', "import os\nfrom pkg.core import run\n")
+        self._write('pkg/__init__.py', "from .core import run\n")
+        self._write('pkg/core.py', "from . import helpers\nimport requests\n")
+        self._write('pkg/helpers.py', "import json\n")
+        self._write('scripts/tool.py', "from sibling import value\n")
+        self._write('scripts/sibling.py', "value = 1\n")
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.test_dir.cleanup()
+
+    def _write(self, name, content):
+        path = os.path.join(self.project, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+
+    def _path(self, name):
+        return os.path.join(self.project, name)
+
+    def test_module_name_for_path(self):
+        self.assertEqual(module_name_for_path(self._path('pkg/core.py'), self.project), 'pkg.core')
+        self.assertEqual(module_name_for_path(self._path('pkg/__init__.py'), self.project), 'pkg')
+
+    def test_build_import_graph(self):
+        graph = build_import_graph(self.project)
+        self.assertEqual(graph[self._path('main.py')], [self._path('pkg/core.py')])
+        self.assertEqual(graph[self._path('pkg/__init__.py')], [self._path('pkg/core.py')])
+        self.assertEqual(graph[self._path('pkg/core.py')], [self._path('pkg/helpers.py')])
+        self.assertEqual(graph[self._path('pkg/helpers.py')], [])
+        self.assertEqual(graph[self._path('scripts/tool.py')], [self._path('scripts/sibling.py')])
+        self.assertTrue(os.path.exists(import_graph.import_graph_path))
+
+    def test_build_import_graph_from_parent_directory(self):
+        # Imports are written relative to "project", but the analysis starts above it
+        graph = build_import_graph(self.root_directory)
+        self.assertEqual(graph[self._path('main.py')], [self._path('pkg/core.py')])
+
+    def test_topological_order_puts_dependencies_first(self):
+        graph = build_import_graph(self.project)
+        order = topological_order(graph)
+        self.assertEqual(sorted(order), sorted(graph))
+        for path, dependencies in graph.items():
+            for dependency in dependencies:
+                self.assertLess(order.index(dependency), order.index(path))
+
+    def test_topological_order_breaks_cycles(self):
+        graph = {'a.py': ['b.py'], 'b.py': ['a.py'], 'c.py': ['a.py'], 'd.py': []}
+        order = topological_order(graph)
+        self.assertEqual(sorted(order), ['a.py', 'b.py', 'c.py', 'd.py'])
+        self.assertEqual(order[0], 'd.py')
+        self.assertEqual(order[-1], 'c.py')
+
+    def test_topological_order_takes_ready_files_in_path_order(self):
+        graph = {'e.py': [], 'c.py': ['d.py'], 'a.py': [], 'd.py': [], 'b.py': ['e.py', 'a.py']}
+        self.assertEqual(topological_order(graph), ['a.py', 'd.py', 'c.py', 'e.py', 'b.py'])
+
+    def test_dependency_context(self):
+        graph = {'main.py': ['core.py', 'helpers.py']}
+        summaries = {'core.py': "Runs the\n   pipeline. " + "x" * 500}
+        context = dependency_context('main.py', graph, summaries, max_chars_per_summary=40)
+        self.assertIn("- core.py: Runs the pipeline.", context)
+        self.assertNotIn("helpers.py", context)
+        self.assertLess(len(context), 120)
+        self.assertEqual(dependency_context('core.py', graph, summaries), "")
+
+if __name__ == "__main__":
+    unittest.main()
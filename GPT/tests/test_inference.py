@@ -0,0 +1,113 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+import torch
+from transformers import GPT2LMHeadModel, GPT2Tokenizer
+from tests.helpers import byte_tokenizer, tiny_model
+
+# inference imports its sibling modules by name
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'models', 'Veronica'))
+
+inference = None
+
+def setUpModule():
+    global inference
+    with tempfile.TemporaryDirectory() as test_dir:
+        tokenizer = byte_tokenizer(test_dir)
+    model = tiny_model(0, len(tokenizer), n_positions=256)
+    # Load inference with the tiny model in place of the trained Veronica model
+    with mock.patch.object(GPT2Tokenizer, 'from_pretrained', return_value=tokenizer), \
+            mock.patch.object(GPT2LMHeadModel, 'from_pretrained', return_value=model):
+        import inference as loaded
+    inference = loaded
+
+class TestPrefixCache(unittest.TestCase):
+
+    def setUp(self):
+        self.prompt = f"{inference.summarize_header}\n\ndef add(x, y): return x + y"
+
+    def _generate_without_cache(self):
+        with mock.patch.object(inference, 'get_cached_prefix', return_value=None):
+            return inference.generate_text(self.prompt, max_new_tokens=12)
+
+    def test_cached_prefix_gives_the_same_output(self):
+        input_ids = inference.tokenizer(self.prompt, return_tensors='pt')['input_ids']
+        self.assertIsNotNone(inference.get_cached_prefix(input_ids, self.prompt))
+        self.assertEqual(inference.generate_text(self.prompt, max_new_tokens=12), self._generate_without_cache())
+        # generate() must not have extended the shared cache entry
+        prefix_ids, past_key_values = inference.get_prefix_cache(inference.summarize_header)
+        self.assertEqual(past_key_values.get_seq_length(), prefix_ids.shape[1])
+        self.assertEqual(inference.generate_text(self.prompt, max_new_tokens=12), self._generate_without_cache())
+
+    def test_cache_is_kept_per_model(self):
+        first = inference.get_prefix_cache(inference.summarize_header)[1]
+        with mock.patch.object(inference, 'model', tiny_model(1, len(inference.tokenizer), n_positions=256)):
+            second = inference.get_prefix_cache(inference.summarize_header)[1]
+            self.assertFalse(torch.equal(first[0][0], second[0][0]))
+            self.assertEqual(inference.generate_text(self.prompt, max_new_tokens=12), self._generate_without_cache())
+        self.assertIs(inference.get_prefix_cache(inference.summarize_header)[1], first)
+
+    def test_only_fixed_headers_are_cached(self):
+        with self.assertRaises(ValueError):
+            inference.get_prefix_cache("Some other header:")
+        input_ids = inference.tokenizer("Translate this:", return_tensors='pt')['input_ids']
+        self.assertIsNone(inference.get_cached_prefix(input_ids, "Translate this:"))
+
+class TestContextWindow(unittest.TestCase):
+
+    def test_split_into_windows(self):
+        text = "".join(f"line {i}\n" for i in range(40))
+        windows = inference.split_into_windows(text, 50)
+        self.assertEqual(len(windows), -(-inference.count_tokens(text) // 50))
+        self.assertTrue(all(inference.count_tokens(window) <= 50 for window in windows))
+        # Consecutive windows neither overlap nor leave gaps
+        self.assertEqual("".join(windows), text)
+        self.assertEqual(inference.split_into_windows("", 50), [])
+
+    def test_max_new_tokens_is_clamped_to_the_context_window(self):
+        prompt = f"{inference.verify_header}\n\nx = 1"
+        prompt_tokens = inference.count_tokens(prompt)
+        with mock.patch.object(inference, 'context_window', prompt_tokens + 3), \
+                mock.patch.object(inference.model, 'generate', wraps=inference.model.generate) as generate:
+            inference.generate_text(prompt, max_new_tokens=150)
+            self.assertEqual(generate.call_args[1]["max_new_tokens"], 3)
+            with self.assertRaises(ValueError):
+                inference.generate_text(prompt + " + 1 + 2 + 3")
+
+    def test_content_is_split_to_fit_the_context_window(self):
+        content = "def f(x):\n    return x\n" * 40
+        with mock.patch.object(inference, 'generate_text', side_effect=lambda prompt, max_new_tokens: prompt) as generate:
+            prompts = inference.generate_for_content(inference.verify_header, content, max_new_tokens=20)
+            self.assertGreater(len(prompts), 1)
+            budget = inference.context_window - 20 - inference.window_margin
+            self.assertTrue(all(inference.count_tokens(prompt) <= budget for prompt in prompts))
+            self.assertEqual("".join(prompt[len(inference.verify_header) + 2:] for prompt in prompts), content)
+            self.assertEqual(len(inference.generate_for_content(inference.verify_header, "x = 1", 20)), 1)
+            self.assertEqual(generate.call_count, len(prompts) + 1)
+        with self.assertRaises(ValueError):
+            inference.generate_for_content(inference.verify_header, content, max_new_tokens=inference.context_window)
+
+    def test_summaries_are_reduced_to_one(self):
+        content = "def f(x):\n    return x\n" * 40
+        with mock.patch.object(inference, 'generate_text', return_value="a short summary") as generate:
+            self.assertEqual(inference.summarize_hierarchically(content, max_new_tokens=20), "a short summary")
+        pieces = [call[0][0] for call in generate.call_args_list if call[0][0].startswith(inference.summarize_header)]
+        self.assertGreater(len(pieces), 1)
+        # One reduce step combines all piece summaries
+        self.assertEqual(generate.call_count, len(pieces) + 1)
+        self.assertTrue(generate.call_args[0][0].startswith(inference.reduce_header))
+
+    def test_reduction_stops_when_summaries_do_not_fit_together(self):
+        content = "def f(x):\n    return x\n" * 40
+        long_summary = "s" * 150
+        with mock.patch.object(inference, 'generate_text', return_value=long_summary) as generate:
+            summary = inference.summarize_hierarchically(content, max_new_tokens=20)
+        # Each reduce window holds less than two summaries, so combining cannot shrink them
+        self.assertGreater(summary.count(long_summary), 1)
+        self.assertEqual(summary, "\n\n".join([long_summary] * summary.count(long_summary)))
+        self.assertTrue(generate.call_args[0][0].startswith(inference.reduce_header))
+
+if __name__ == '__main__':
+    unittest.main()
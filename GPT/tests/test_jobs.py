@@ -0,0 +1,147 @@
+import os
+import sys
+import time
+import subprocess
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import brain.dependency_analysis as dependency_analysis
+import brain.results_store as results_store
+import brain.jobs as jobs
+from brain.integration_api import app
+
+class TestJobs(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.project = os.path.join(self.test_dir.name, 'project')
+        os.makedirs(self.project)
+        for i in range(6):
+            with open(os.path.join(self.project, f"module_{i}.py"), 'w') as f:
+                f.write(f"import requests\nVALUE = {i}\n")
+        self.release = threading.Event()
+        self.release.set()
+        self.patches = [
+            mock.patch.multiple(results_store, current_run_id=None, results_db_path=os.path.join(self.test_dir.name, "results.db")),
+            mock.patch.multiple(dependency_analysis, import_cache=None, import_cache_path=os.path.join(self.test_dir.name, "import_cache.json")),
+            mock.patch.multiple(jobs, jobs={}, job_executor=None, max_job_workers=2),
+            mock.patch.dict(os.environ, {"ROOT_DIRECTORY": self.project}),
+            mock.patch.object(jobs, 'summarize_code', side_effect=self._fake_completion("A summary.")),
+            mock.patch.object(jobs, 'verify_code', side_effect=self._fake_completion("Verified")),
+        ]
+        for patch in self.patches:
+            patch.start()
+        self.client = app.test_client()
+
+    def tearDown(self):
+        self.release.set()
+        if jobs.job_executor is not None:
+            jobs.job_executor.shutdown(wait=True)
+        for patch in self.patches:
+            patch.stop()
+        self.test_dir.cleanup()
+
+    def _fake_completion(self, text):
+        def complete(content, usage=None, path=None):
+            self.release.wait(10)
+            usage["prompt_tokens"] = usage.get("prompt_tokens", 0) + 10
+            usage["completion_tokens"] = usage.get("completion_tokens", 0) + 2
+            return text
+        return complete
+
+    def _wait_for(self, job_id, statuses):
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            job = self.client.get(f"/jobs/{job_id}").get_json()
+            if job["status"] in statuses:
+                return job
+            time.sleep(0.02)
+        self.fail(f"Job {job_id} did not reach {statuses}")
+
+    def test_job_runs_in_background(self):
+        response = self.client.post("/jobs", json={"root_directory": self.project, "operations": ["summarize", "verify", "dependencies"]})
+        self.assertEqual(response.status_code, 202)
+        job = self._wait_for(response.get_json()["job_id"], {"completed"})
+
+        self.assertEqual(job["files_total"], 6)
+        self.assertEqual(job["files_done"], 6)
+        self.assertEqual(job["prompt_tokens"], 6 * 20)
+        self.assertEqual(job["dependencies"], ["requests"])
+        results = self.client.get(f"/results?run_id={job['job_id']}").get_json()["results"]
+        self.assertEqual(len(results), 6)
+        self.assertTrue(all(result["verdict"] == "Verified" for result in results))
+
+    def test_cancel_job(self):
+        self.release.clear()
+        job_id = self.client.post("/jobs", json={"root_directory": self.project}).get_json()["job_id"]
+        self._wait_for(job_id, {"running"})
+        response = self.client.delete(f"/jobs/{job_id}")
+        self.assertEqual(response.status_code, 200)
+        self.release.set()
+        job = self._wait_for(job_id, {"cancelled"})
+        self.assertLess(job["files_done"], job["files_total"])
+        self.assertIsNone(job["eta_seconds"])
+
+    def test_cancel_through_another_worker(self):
+        self.release.clear()
+        job_id = self.client.post("/jobs", json={"root_directory": self.project}).get_json()["job_id"]
+        self._wait_for(job_id, {"running"})
+        # Another server worker only shares the results database with this one
+        with mock.patch.object(jobs, 'cancel_poll_seconds', 0):
+            self.assertTrue(results_store.request_job_cancel(job_id))
+            self.assertEqual(self.client.get(f"/jobs/{job_id}").get_json()["status"], "cancelling")
+            self.release.set()
+            job = self._wait_for(job_id, {"cancelled"})
+        self.assertLess(job["files_done"], job["files_total"])
+        self.assertNotIn(job_id, jobs.jobs)
+
+    def test_jobs_of_exited_workers_are_failed(self):
+        # A process that has exited and been reaped
+        process = subprocess.Popen([sys.executable, "-c", ""])
+        process.wait()
+        job = jobs.ScanJob(self.project, ["summarize"])
+        job.status = "running"
+        job.save()
+        with results_store.get_connection() as connection:
+            connection.execute("UPDATE jobs SET pid = ? WHERE job_id = ?", (process.pid, job.job_id))
+        described = self.client.get(f"/jobs/{job.job_id}").get_json()
+        self.assertEqual(described["status"], "failed")
+        self.assertIsNotNone(described["finished_at"])
+        self.assertNotIn("pid", described)
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.post("/jobs", json={"root_directory": self.project, "operations": ["delete"]}).status_code, 400)
+        self.assertEqual(self.client.post("/jobs", json={"root_directory": os.path.join(self.project, "missing")}).status_code, 400)
+        self.assertEqual(self.client.get("/jobs/unknown").status_code, 404)
+        self.assertEqual(self.client.delete("/jobs/unknown").status_code, 404)
+
+    def test_root_directory_must_be_inside_root_directory(self):
+        outside = os.path.join(self.test_dir.name, 'outside')
+        os.makedirs(outside)
+        os.symlink(outside, os.path.join(self.project, 'link'))
+        for root_directory in (outside, os.path.join(self.project, '..', 'outside'), os.path.join(self.project, 'link'), "/"):
+            response = self.client.post("/jobs", json={"root_directory": root_directory})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("inside ROOT_DIRECTORY", response.get_json()["error"])
+        os.makedirs(os.path.join(self.project, 'sub'))
+        self.assertEqual(self.client.post("/jobs", json={"root_directory": os.path.join(self.project, 'sub')}).status_code, 202)
+        with mock.patch.dict(os.environ, {"ROOT_DIRECTORY": ""}):
+            self.assertEqual(self.client.post("/jobs", json={"root_directory": self.project}).status_code, 400)
+
+    def test_finished_jobs_are_forgotten(self):
+        with mock.patch.object(jobs, 'max_finished_jobs', 2):
+            job_ids = []
+            for _ in range(4):
+                job_ids.append(self.client.post("/jobs", json={"operations": ["dependencies"]}).get_json()["job_id"])
+                self._wait_for(job_ids[-1], {"completed"})
+            # The two most recent finished jobs are kept, besides the new one
+            self.assertEqual([job["job_id"] for job in self.client.get("/jobs").get_json()["jobs"]], job_ids[:0:-1])
+            with results_store.get_connection() as connection:
+                connection.execute("UPDATE jobs SET finished_at = finished_at - ? WHERE job_id = ?", (jobs.finished_job_ttl + 1, job_ids[1]))
+            self.client.post("/jobs", json={"operations": ["dependencies"]})
+        self.assertEqual(self.client.get(f"/jobs/{job_ids[1]}").status_code, 404)
+        self.assertEqual(self.client.get(f"/jobs/{job_ids[3]}").status_code, 200)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import os
+import sys
+import json
+import tempfile
+import subprocess
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+import brain.integration_api as integration_api
+import brain.metrics as metrics
+from brain.integration_api import app
+from brain.upstream import ResponseCache, RateLimiter, SingleFlight
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        metrics.reset()
+        self.patches = [
+            mock.patch.object(metrics, 'metrics_dir', None),
+            mock.patch.multiple(integration_api, response_cache=ResponseCache(), rate_limiter=RateLimiter(0), single_flight=SingleFlight(),
+                                error_log_path=os.path.join(self.test_dir.name, "error.txt"),
+                                training_data_dir=self.test_dir.name),
+            mock.patch.object(integration_api.openai.Completion, 'create', side_effect=self._fake_completion),
+        ]
+        for patch in self.patches:
+            patch.start()
+        self.client = app.test_client()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        metrics.reset()
+        self.test_dir.cleanup()
+
+    def _fake_completion(self, model, prompt, temperature, max_tokens):
+        if "boom" in prompt:
+            raise RuntimeError("upstream failed")
+        return SimpleNamespace(choices=[SimpleNamespace(text=" A summary. ")], usage=SimpleNamespace(prompt_tokens=12, completion_tokens=3))
+
+    def _metrics(self):
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith("text/plain"))
+        samples = {}
+        for line in response.get_data(as_text=True).splitlines():
+            if line and not line.startswith("#"):
+                name, value = line.rsplit(" ", 1)
+                samples[name] = float(value)
+        return samples
+
+    def test_requests_operations_and_upstream(self):
+        self.client.post("/summarize", json={"content": "x = 1"})
+        self.client.post("/summarize", json={"content": "x = 1"})
+        self.client.post("/verify", json={"content": "boom"})
+        samples = self._metrics()
+
+        self.assertEqual(samples['gpt_http_requests_total{endpoint="/summarize",method="POST",status="200"}'], 2)
+        self.assertEqual(samples['gpt_http_request_duration_seconds_count{endpoint="/summarize"}'], 2)
+        self.assertEqual(samples['gpt_operation_duration_seconds_count{operation="summarize"}'], 2)
+        self.assertEqual(samples['gpt_operations_in_flight{operation="summarize"}'], 0)
+        self.assertEqual(samples['gpt_upstream_requests_total{model="gpt-4o-mini",outcome="success"}'], 1)
+        self.assertEqual(samples['gpt_upstream_requests_total{model="gpt-3.5-turbo-0125",outcome="error"}'], 1)
+        self.assertEqual(samples['gpt_tokens_total{model="gpt-4o-mini",type="prompt"}'], 12)
+        self.assertEqual(samples['gpt_cache_requests_total{result="hit"}'], 1)
+        self.assertAlmostEqual(samples['gpt_cache_hit_ratio'], 1 / 3)
+        self.assertEqual(samples['gpt_rate_limiter_wait_seconds_count'], 2)
+        # The /metrics request itself is in flight while it renders
+        self.assertEqual(samples['gpt_http_requests_in_flight'], 1)
+
+    def test_histogram_buckets_are_cumulative(self):
+        for value in (0.003, 0.2, 0.2, 500):
+            metrics.observe("gpt_upstream_duration_seconds", value, model="m")
+        samples = self._metrics()
+        self.assertEqual(samples['gpt_upstream_duration_seconds_bucket{model="m",le="0.005"}'], 1)
+        self.assertEqual(samples['gpt_upstream_duration_seconds_bucket{model="m",le="0.25"}'], 3)
+        self.assertEqual(samples['gpt_upstream_duration_seconds_bucket{model="m",le="120.0"}'], 3)
+        self.assertEqual(samples['gpt_upstream_duration_seconds_bucket{model="m",le="+Inf"}'], 4)
+        self.assertAlmostEqual(samples['gpt_upstream_duration_seconds_sum{model="m"}'], 500.403)
+
+    def test_other_workers_snapshots_are_merged(self):
+        metrics.inc("gpt_tokens_total", 5, model="m", type="prompt")
+        other_worker = {"counters": [["gpt_tokens_total", [["model", "m"], ["type", "prompt"]], 7]], "gauges": [],
+                        "histograms": [["gpt_operation_duration_seconds", [["operation", "verify"]], [[1] + [0] * len(metrics.histogram_buckets), 0.001, 1]]]}
+        with open(os.path.join(self.test_dir.name, "1.json"), 'w') as f:
+            json.dump(other_worker, f)
+        with mock.patch.object(metrics, 'metrics_dir', self.test_dir.name):
+            samples = self._metrics()
+        self.assertEqual(samples['gpt_tokens_total{model="m",type="prompt"}'], 12)
+        self.assertEqual(samples['gpt_operation_duration_seconds_count{operation="verify"}'], 1)
+
+    def test_exited_workers_keep_counters_but_not_gauges(self):
+        process = subprocess.Popen([sys.executable, "-c", "pass"])
+        process.wait()
+        exited_worker = {"counters": [["gpt_tokens_total", [["model", "m"], ["type", "prompt"]], 7]],
+                         "gauges": [["gpt_operations_in_flight", [], 2]], "histograms": []}
+        path = os.path.join(self.test_dir.name, f"{process.pid}.json")
+        with open(path, 'w') as f:
+            json.dump(exited_worker, f)
+        with mock.patch.object(metrics, 'metrics_dir', self.test_dir.name):
+            samples = self._metrics()
+            self.assertEqual(samples['gpt_tokens_total{model="m",type="prompt"}'], 7)
+            self.assertNotIn('gpt_operations_in_flight', samples)
+
+            # Retired snapshots are folded together, so files do not pile up as workers are replaced
+            metrics.retire_snapshot(process.pid)
+            with open(path, 'w') as f:
+                json.dump(exited_worker, f)
+            metrics.retire_snapshot(process.pid)
+            self.assertEqual(os.listdir(self.test_dir.name), [metrics.retired_snapshot_name])
+            samples = self._metrics()
+        self.assertEqual(samples['gpt_tokens_total{model="m",type="prompt"}'], 14)
+        self.assertNotIn('gpt_operations_in_flight', samples)
+
+    def test_label_values_are_escaped(self):
+        metrics.inc("gpt_operation_errors_total", operation='say "hi"\n')
+        self.assertIn('gpt_operation_errors_total{operation="say \\"hi\\"\\n"} 1', metrics.render())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import ast
+import tempfile
+import unittest
+from unittest import mock
+import brain.minify as minify_module
+import brain.results_store as results_store
+import brain.iterative_improvement as iterative_improvement
+from brain.minify import minify, prepare_content
+from brain.results_store import start_run, file_statuses
+
+LICENSE = "# Copyright (c) 2024 Example\n#\n# Licensed under the MIT License.\n"
+
+PYTHON = LICENSE + '''
+import os   
+
+
+# Helpers
+#########
+
+
+def greet(name):  # say hello
+    """Greet someone.   
+
+    The # in strings is kept.
+    """
+    text = f"""{name}   
+
+# not a comment"""
+    return "#" + text  # trailing comment
+'''
+
+class TestMinify(unittest.TestCase):
+
+    def test_python_verify_drops_comments_but_keeps_strings(self):
+        minified = minify("#!/usr/bin/env python\n" + PYTHON, "verify", "greet.py")
+        # The shebang is a comment too
+        self.assertTrue(minified.startswith("import os\n\ndef greet(name):\n"))
+        self.assertNotIn("Copyright", minified)
+        self.assertNotIn("Helpers", minified)
+        self.assertNotIn("say hello", minified)
+        self.assertIn('    """Greet someone.   \n\n    The # in strings is kept.', minified)
+        self.assertIn('{name}   \n\n# not a comment"""', minified)
+        self.assertIn('    return "#" + text\n', minified + "\n")
+        self.assertEqual(ast.dump(ast.parse(minified)), ast.dump(ast.parse(PYTHON)))
+        self.assertLess(len(minified), len(PYTHON) * 0.75)
+
+    def test_summarize_keeps_comments(self):
+        minified = minify(PYTHON, "summarize", "greet.py")
+        self.assertNotIn("Copyright", minified)
+        self.assertIn("# Helpers\n", minified)
+        self.assertIn("# say hello", minified)
+        self.assertNotIn("import os   ", minified)
+
+    def test_other_languages_keep_comments_and_partial_python_is_unchanged(self):
+        css = "/* Copyright 2024 Example. All rights reserved. */\n#header { color: red; }   \n\n\n\n/* Title */\nh1 {}\n"
+        self.assertEqual(minify(css, "verify", "site.css"), "#header { color: red; }\n\n/* Title */\nh1 {}")
+        # Chunks that end inside a call or start inside a string do not tokenize, and are sent unchanged
+        chunk = 'HELP = """Usage:   \n\n\n    run it   \n"""\nvalues = call(  # first\n    1,   \n'
+        self.assertEqual(minify(chunk, "verify", "big.py"), chunk)
+        chunk = 'the end of a docstring.   \n\n\n    """\n    return 1  # one\n'
+        self.assertEqual(minify(chunk, "verify", "big.py"), chunk)
+        # Without a path, content that parses is treated as Python
+        self.assertEqual(minify("x = 1  # one\n", "verify"), "x = 1")
+        nested = "-" * 200000 + "1"
+        self.assertEqual(minify(nested, "verify"), nested)
+
+    def test_prepare_content_is_opt_in(self):
+        self.assertEqual(prepare_content(PYTHON, "verify", "greet.py"), (PYTHON, 0))
+        with mock.patch.object(minify_module, 'minify_enabled', True):
+            content, tokens_saved = prepare_content(PYTHON, "verify", "greet.py")
+        self.assertEqual(content, minify(PYTHON, "verify", "greet.py"))
+        self.assertEqual(tokens_saved, (len(PYTHON) + 3) // 4 - (len(content) + 3) // 4)
+
+    def test_tokens_saved_are_reported_per_file(self):
+        with tempfile.TemporaryDirectory() as test_dir:
+            path = os.path.join(test_dir, "greet.py")
+            with open(path, 'w') as f:
+                f.write(PYTHON)
+            prompts = []
+
+            def complete(model, prompt, max_tokens, temperature=0.5):
+                prompts.append(prompt)
+                return {"text": "Verified", "model": model, "prompt_tokens": 10, "completion_tokens": 2, "latency_seconds": 0.1}
+
+            with mock.patch.multiple(results_store, current_run_id=None, results_db_path=os.path.join(test_dir, "results.db")), \
+                    mock.patch.object(minify_module, 'minify_enabled', True), \
+                    mock.patch.object(iterative_improvement, 'request_completion', side_effect=complete), \
+                    mock.patch.object(iterative_improvement, 'log_training_data'):
+                start_run("run1")
+                iterative_improvement.process_small_file(path)
+                status = file_statuses()[0]
+                for connection in results_store._local.__dict__.pop('connections', {}).values():
+                    connection.close()
+        self.assertEqual(len(prompts), 3)
+        self.assertFalse([prompt for prompt in prompts if "Copyright" in prompt])
+        self.assertGreater(status["tokens_saved"], 0)
+        self.assertEqual(status["prompt_tokens"], 30)
+
+if __name__ == "__main__":
+    unittest.main()
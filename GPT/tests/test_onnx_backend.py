@@ -0,0 +1,41 @@
+import os
+import tempfile
+import unittest
+import importlib.util
+import torch
+from tests.helpers import byte_tokenizer, tiny_model
+
+onnx_available = importlib.util.find_spec("optimum") is not None and importlib.util.find_spec("onnxruntime") is not None
+
+@unittest.skipUnless(onnx_available, "optimum and onnxruntime are not installed")
+class TestOnnxBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.model_dir = os.path.join(self.test_dir.name, 'model')
+        os.makedirs(self.model_dir)
+        self.tokenizer = byte_tokenizer(self.test_dir.name)
+        self.tokenizer.save_pretrained(self.model_dir)
+        self.model = tiny_model(0, len(self.tokenizer))
+        self.model.save_pretrained(self.model_dir)
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    def test_greedy_output_matches_pytorch(self):
+        from models.Veronica.export_onnx import export_onnx, load_onnx_model
+
+        onnx_dir = os.path.join(self.model_dir, 'onnx')
+        export_onnx(self.model_dir, onnx_dir)
+        onnx_model = load_onnx_model(onnx_dir)
+        for prompt in ["Summarize the following code:\n\ndef add(x, y): return x + y", "import os"]:
+            input_ids = self.tokenizer(prompt, return_tensors='pt')['input_ids']
+            outputs = [
+                model.generate(input_ids, attention_mask=torch.ones_like(input_ids), max_new_tokens=20,
+                               do_sample=False, num_beams=1, pad_token_id=self.tokenizer.eos_token_id)
+                for model in (self.model, onnx_model)
+            ]
+            self.assertTrue(torch.equal(outputs[0], outputs[1]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,211 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+import brain.dependency_analysis as dependency_analysis
+import brain.import_graph as import_graph
+import brain.results_store as results_store
+import brain.iterative_improvement as iterative_improvement
+from brain.results_store import file_hash, get_result, store_result, reset_results, start_run, finish_run, list_runs, query_results, file_statuses, render_log, render_corrections, verdict_of
+
+class TestResultsStore(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.output_dir = os.path.join(self.test_dir.name, 'output')
+        os.makedirs(self.output_dir)
+        self.patches = [
+            mock.patch.multiple(results_store, current_run_id=None, results_db_path=os.path.join(self.output_dir, "results.db")),
+            mock.patch.multiple(dependency_analysis, import_cache=None, import_cache_path=os.path.join(self.output_dir, "import_cache.json")),
+            mock.patch.object(import_graph, 'import_graph_path', os.path.join(self.output_dir, "import_graph.json")),
+            mock.patch.object(iterative_improvement, 'output_dir', self.output_dir),
+            mock.patch.object(iterative_improvement, 'summarize_code', return_value="A summary."),
+            mock.patch.object(iterative_improvement, 'get_corrections', return_value="No corrections."),
+            mock.patch.object(iterative_improvement, 'combine_summaries', return_value="A combined summary.")
+        ]
+        for patch in self.patches:
+            patch.start()
+        self.project = os.path.join(self.test_dir.name, 'project')
+        os.makedirs(self.project)
+        self._write('a.py', "import b\n")
+        self._write('b.py', "VALUE = 1\n")
+        self._write('large.py', "x = 1\n" * 1500)
+
+    def tearDown(self):
+        for connection in results_store._local.__dict__.pop('connections', {}).values():
+            connection.close()
+        for patch in self.patches:
+            patch.stop()
+        self.test_dir.cleanup()
+
+    def _write(self, name, content):
+        with open(os.path.join(self.project, name), 'w') as f:
+            f.write(content)
+
+    def test_store_and_get_result(self):
+        path = os.path.join(self.project, 'a.py')
+        content_hash = file_hash(path)
+        chunk = {"path": path, "summary": "s", "verification": "Verified", "corrections": "",
+                 "model": "gpt-4o-mini", "prompt_tokens": 12, "completion_tokens": 3, "latency_seconds": 0.5}
+        store_result(path, content_hash, [chunk])
+        self.assertTrue(get_result(path, content_hash)["verified"])
+        self.assertIsNone(get_result(path, "other hash"))
+
+        # The store survives a new connection
+        results_store._local.connections.clear()
+        self.assertEqual(get_result(path, content_hash)["chunks"],
+                         [dict(chunk, verdict="Verified", chunk_offset=0, chunk_length=0, chunk_hash="", tokens_saved=0)])
+        reset_results()
+        self.assertIsNone(get_result(path, content_hash))
+
+    def test_query_results_and_reports(self):
+        path = os.path.join(self.project, 'large.py')
+        chunks = [
+            {"path": f"{path}.chunk1", "summary": "one", "verification": "Verified", "corrections": ""},
+            {"path": f"{path}.chunk2", "summary": "two", "verification": "Failed: bad", "corrections": "Fix it"}
+        ]
+        self.assertFalse(store_result(path, file_hash(path), chunks)["verified"])
+        self.assertEqual(results_store.get_connection().execute("PRAGMA journal_mode").fetchone()[0], "wal")
+
+        failed = query_results(verdict="Failed")
+        self.assertEqual([(row["chunk_path"], row["corrections"]) for row in failed], [(f"{path}.chunk2", "Fix it")])
+        self.assertEqual(len(query_results(path=path)), 2)
+        self.assertEqual(file_statuses(), [dict(file_statuses()[0], path=path, verified=0, chunks=2)])
+
+        corrections_path = os.path.join(self.output_dir, "corrections_list.txt")
+        render_corrections(corrections_path)
+        with open(corrections_path) as f:
+            self.assertEqual(f.read(), f"Corrections:\n{path}.chunk2 needs correction:\nFix it\n")
+        log_path = os.path.join(self.output_dir, "GPTlog.txt")
+        render_log(log_path)
+        with open(log_path) as f:
+            self.assertIn(f"File: {path}.chunk1\nSummary:\none\n", f.read())
+
+    def test_every_chunk_must_be_verified(self):
+        self.assertEqual(verdict_of("Failed: the loop never ends. Verified the imports."), "Failed")
+        self.assertEqual(verdict_of("Verified"), "Verified")
+        self.assertEqual(verdict_of("Looks fine"), "Unknown")
+        path = os.path.join(self.project, 'large.py')
+        chunks = [
+            {"path": f"{path}.chunk1", "summary": "", "verification": "Verified", "corrections": ""},
+            {"path": f"{path}.chunk2", "summary": "", "verification": "Looks fine", "corrections": ""}
+        ]
+        self.assertFalse(store_result(path, file_hash(path), chunks)["verified"])
+        self.assertEqual(file_statuses()[0]["verified"], 0)
+        chunks[1]["verification"] = "Verified"
+        self.assertTrue(store_result(path, file_hash(path), chunks)["verified"])
+
+    def test_status_is_derived_from_stored_verdicts(self):
+        verify = mock.Mock(side_effect=lambda content, context="", usage=None, path=None: "Failed" if "VALUE" in content else "Verified")
+        with mock.patch.object(iterative_improvement, 'verify_code', verify):
+            reset_results()
+            iterative_improvement.save_file_list(self.project)
+            calls_after_processing = verify.call_count
+            iterative_improvement.update_status_and_logs(self.project)
+        self.assertEqual(verify.call_count, calls_after_processing)
+
+        with open(os.path.join(self.output_dir, "current_status.txt")) as f:
+            status = f.read()
+        self.assertIn(f"File: {os.path.join(self.project, 'a.py')}\nStatus: Verified", status)
+        self.assertIn(f"File: {os.path.join(self.project, 'b.py')}\nStatus: Failed", status)
+        self.assertIn(f"File: {os.path.join(self.project, 'large.py')}\nStatus: Verified", status)
+
+        # Large files are analyzed by chunk reference without writing chunk files
+        large = os.path.join(self.project, 'large.py')
+        chunks = get_result(large, file_hash(large))["chunks"]
+        # Chunks end before a line, so the 6-byte lines fill them to 4998 bytes
+        self.assertEqual([chunk["path"] for chunk in chunks], [f"{large}@0+4998", f"{large}@4998+4002"])
+        self.assertFalse([name for name in os.listdir(self.output_dir) if '.chunk' in name])
+
+    def test_changed_files_are_verified_again(self):
+        verify = mock.Mock(return_value="Verified")
+        with mock.patch.object(iterative_improvement, 'verify_code', verify):
+            reset_results()
+            iterative_improvement.save_file_list(self.project)
+            calls_after_processing = verify.call_count
+            self._write('b.py', "VALUE = 2\n")
+            iterative_improvement.update_status_and_logs(self.project)
+        self.assertEqual(verify.call_count, calls_after_processing + 1)
+
+    def test_resume_skips_finished_files(self):
+        crashing_file = os.path.join(self.project, 'a.py')
+
+        def crash_on_a(content, context="", usage=None, path=None):
+            if "import b" in content:
+                raise KeyboardInterrupt
+            return "Verified"
+
+        run_id = start_run("run1", root_directory=self.project)
+        with mock.patch.object(iterative_improvement, 'verify_code', side_effect=crash_on_a):
+            with self.assertRaises(KeyboardInterrupt):
+                iterative_improvement.save_file_list(self.project)
+        # b.py is imported by a.py, so it was finished before the crash
+        self.assertIsNotNone(get_result(os.path.join(self.project, 'b.py'), file_hash(os.path.join(self.project, 'b.py'))))
+        self.assertIsNone(get_result(crashing_file, file_hash(crashing_file)))
+
+        # A new process resumes the unfinished run and only analyzes what is left
+        results_store.current_run_id = None
+        self.assertEqual(start_run(resume=True), run_id)
+        verify = mock.Mock(return_value="Verified")
+        with mock.patch.object(iterative_improvement, 'verify_code', verify):
+            iterative_improvement.save_file_list(self.project)
+        analyzed = {call.args[0] for call in verify.call_args_list}
+        self.assertIn("import b\n", analyzed)
+        self.assertNotIn("VALUE = 1\n", analyzed)
+        self.assertEqual(len(file_statuses()), 3)
+
+        finish_run()
+        self.assertIsNotNone(list_runs()[0]["finished_at"])
+        results_store.current_run_id = None
+        self.assertNotEqual(start_run(resume=True), run_id)
+
+    def test_new_run_starts_empty(self):
+        path = os.path.join(self.project, 'b.py')
+        chunk = {"path": path, "summary": "s", "verification": "Verified", "corrections": ""}
+        start_run("run1")
+        store_result(path, file_hash(path), [chunk])
+        start_run("run2")
+        self.assertIsNone(get_result(path, file_hash(path)))
+        self.assertEqual(len(query_results(run_id="run1")), 1)
+        start_run("run1")
+        self.assertEqual(query_results(run_id="run1"), [])
+
+    def test_schema_change_keeps_old_tables(self):
+        old = sqlite3.connect(results_store.results_db_path)
+        old.executescript(
+            "CREATE TABLE runs (run_id TEXT PRIMARY KEY, started_at REAL NOT NULL);"
+            "CREATE TABLE results (id INTEGER PRIMARY KEY, run_id TEXT NOT NULL, path TEXT NOT NULL, verdict TEXT NOT NULL);"
+            "CREATE INDEX results_verdict ON results (run_id, verdict);"
+            "INSERT INTO runs VALUES ('old', 1.0); INSERT INTO results VALUES (1, 'old', 'a.py', 'Verified');"
+            "PRAGMA user_version = 4;"
+        )
+        old.close()
+        with self.assertLogs(level='WARNING') as logs:
+            connection = results_store.get_connection()
+        self.assertEqual(len(logs.output), 2)
+        self.assertEqual([tuple(row) for row in connection.execute("SELECT run_id, path FROM results_v4")], [("old", "a.py")])
+        self.assertEqual([tuple(row) for row in connection.execute("SELECT run_id FROM runs_v4")], [("old",)])
+        self.assertEqual(list_runs(), [])
+        # The current schema is in place, with its index on the new table
+        self.assertEqual(connection.execute("PRAGMA user_version").fetchone()[0], results_store.schema_version)
+        self.assertEqual(connection.execute("SELECT tbl_name FROM sqlite_master WHERE name = 'results_verdict'").fetchone()[0], "results")
+        path = os.path.join(self.project, 'b.py')
+        store_result(path, file_hash(path), [{"path": path, "summary": "", "verification": "Verified", "corrections": ""}])
+        self.assertEqual(len(query_results(path=path)), 1)
+
+    def test_verify_code_records_usage(self):
+        response = mock.MagicMock()
+        response.choices[0].text = " Verified "
+        response.get.return_value = {"prompt_tokens": 10, "completion_tokens": 2}
+        with mock.patch.object(iterative_improvement.openai.Completion, 'create', return_value=response), \
+                mock.patch.object(iterative_improvement, 'log_training_data'):
+            usage = {}
+            self.assertEqual(iterative_improvement.verify_code("x = 1", usage=usage), "Verified")
+            iterative_improvement.verify_code("x = 2", usage=usage)
+        self.assertEqual(iterative_improvement.usage_columns(usage)["prompt_tokens"], 20)
+        self.assertEqual(iterative_improvement.usage_columns(usage)["completion_tokens"], 4)
+        self.assertEqual(iterative_improvement.usage_columns(usage)["model"], "gpt-3.5-turbo-0125")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import brain.dependency_analysis as dependency_analysis
+import brain.integration_api as integration_api
+import brain.results_store as results_store
+import brain.jobs as jobs
+from brain.serve import server_options, post_fork, worker_exit
+
+class TestServe(unittest.TestCase):
+
+    def test_options_from_arguments_and_environment(self):
+        with mock.patch.dict(os.environ, {"GPT_WORKERS": "3", "GPT_THREADS": "8", "GPT_GRACEFUL_TIMEOUT": "300"}):
+            options = server_options(bind="127.0.0.1:8000", threads=32)
+        self.assertEqual(options["bind"], "127.0.0.1:8000")
+        self.assertEqual(options["workers"], 3)
+        self.assertEqual(options["threads"], 32)
+        self.assertEqual(options["worker_class"], "gthread")
+        self.assertTrue(options["preload_app"])
+        self.assertEqual(options["graceful_timeout"], 300)
+        # Workers are not killed while they may still be draining
+        self.assertGreaterEqual(options["timeout"], options["graceful_timeout"])
+
+class TestWorkerLifecycle(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.project = os.path.join(self.test_dir.name, 'project')
+        os.makedirs(self.project)
+        for i in range(4):
+            with open(os.path.join(self.project, f"module_{i}.py"), 'w') as f:
+                f.write(f"VALUE = {i}\n")
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.patches = [
+            mock.patch.multiple(results_store, current_run_id=None, results_db_path=os.path.join(self.test_dir.name, "results.db")),
+            mock.patch.multiple(dependency_analysis, import_cache=None, import_cache_path=os.path.join(self.test_dir.name, "import_cache.json")),
+            mock.patch.multiple(jobs, jobs={}, job_executor=None, max_job_workers=1),
+            mock.patch.dict(os.environ, {"ROOT_DIRECTORY": self.project}),
+            mock.patch.multiple(integration_api, batch_executor=None),
+            mock.patch.object(jobs, 'summarize_code', side_effect=self._slow_summary),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        self.release.set()
+        for patch in self.patches:
+            patch.stop()
+        for connection in getattr(results_store._local, 'connections', {}).values():
+            connection.close()
+        self.test_dir.cleanup()
+
+    def _slow_summary(self, content, usage=None, path=None):
+        self.started.set()
+        self.release.wait(10)
+        return "A summary."
+
+    def test_post_fork_resets_pools_and_connections(self):
+        integration_api.get_batch_executor()
+        connection = results_store.get_connection()
+        post_fork(None, None)
+        self.assertIsNone(integration_api.batch_executor)
+        self.assertEqual(getattr(results_store._local, 'connections', {}), {})
+        self.assertIsNot(results_store.get_connection(), connection)
+        connection.close()
+
+    def test_worker_exit_drains_jobs(self):
+        job = jobs.start_job(self.project, ["summarize"])
+        self.assertTrue(self.started.wait(10))
+        threading.Timer(0.1, self.release.set).start()
+        worker_exit(None, None)
+
+        # The file in progress finished and was stored; the rest were dropped
+        self.assertEqual(job.status, "cancelled")
+        self.assertEqual(job.files_done, 1)
+        self.assertIsNone(jobs.job_executor)
+        stored = results_store.query_results(run_id=job.job_id)
+        self.assertEqual(len(stored), 1)
+
+if __name__ == "__main__":
+    unittest.main()
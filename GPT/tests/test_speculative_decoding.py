@@ -0,0 +1,39 @@
+import unittest
+import torch
+from tests.helpers import tiny_model
+from models.Veronica.speculative import greedy_generate, speculative_generate, num_draft_tokens
+
+class TestSpeculativeDecoding(unittest.TestCase):
+
+    def setUp(self):
+        self.model = tiny_model(0, 100, n_layer=2, n_embd=32, eos_token_id=0)
+        self.draft_model = tiny_model(1, 100, n_layer=1, n_embd=16, eos_token_id=0)
+        self.draft_model.generation_config.num_assistant_tokens = num_draft_tokens
+        self.draft_model.generation_config.num_assistant_tokens_schedule = "constant"
+        self.prompts = [
+            torch.tensor([[5, 17, 42, 8]]),
+            torch.tensor([[3, 3, 3, 3, 3, 3, 3, 3, 3, 3]]),
+            torch.tensor([[99]]),
+        ]
+
+    def test_matches_greedy_decoding(self):
+        for input_ids in self.prompts:
+            expected = greedy_generate(self.model, input_ids, 30, pad_token_id=0)
+            actual = speculative_generate(self.model, self.draft_model, input_ids, 30, pad_token_id=0)
+            self.assertTrue(torch.equal(expected, actual))
+
+    def test_matches_greedy_decoding_when_all_drafts_accepted(self):
+        # A draft identical to the full model has every proposed token accepted
+        draft_model = tiny_model(0, 100, n_layer=2, n_embd=32, eos_token_id=0)
+        for input_ids in self.prompts:
+            expected = greedy_generate(self.model, input_ids, 30, pad_token_id=0)
+            actual = speculative_generate(self.model, draft_model, input_ids, 30, pad_token_id=0)
+            self.assertTrue(torch.equal(expected, actual))
+
+    def test_respects_max_new_tokens(self):
+        input_ids = self.prompts[0]
+        outputs = speculative_generate(self.model, self.draft_model, input_ids, 7, pad_token_id=0)
+        self.assertLessEqual(outputs.shape[1] - input_ids.shape[1], 7)
+
+if __name__ == '__main__':
+    unittest.main()
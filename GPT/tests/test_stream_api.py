@@ -0,0 +1,145 @@
+import io
+import os
+import json
+import tempfile
+import unittest
+from unittest import mock
+import brain.integration_api as integration_api
+import brain.uploads as uploads
+from brain.uploads import MultipartUpload
+from brain.integration_api import app
+from brain.upstream import ResponseCache, RateLimiter, SingleFlight
+
+class CountingStream(io.RawIOBase):
+    """
+    Upload body that records how much of it has been read.
+    """
+
+    def __init__(self, data):
+        self.data = io.BytesIO(data)
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=0):
+        return self.data.seek(offset, whence)
+
+    def tell(self):
+        return self.data.tell()
+
+    def readinto(self, buffer):
+        read = self.data.readinto(buffer)
+        self.position += read
+        return read
+
+class TestStreamApi(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.patches = [
+            mock.patch.multiple(integration_api, response_cache=ResponseCache(), rate_limiter=RateLimiter(0), single_flight=SingleFlight(),
+                                error_log_path=os.path.join(self.test_dir.name, "error.txt"), stream_chunk_size=64, stream_window=2),
+            mock.patch.object(integration_api, 'request_operation', side_effect=self._fake_request),
+        ]
+        for patch in self.patches:
+            patch.start()
+        self.client = app.test_client()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.test_dir.cleanup()
+
+    def _fake_request(self, operation, content):
+        if "boom" in content:
+            raise RuntimeError("upstream failed")
+        return f"{operation} of {len(content)} characters"
+
+    def _events(self, response):
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        events = []
+        for block in response.get_data(as_text=True).strip().split("\n\n"):
+            event_line, data_line = block.split("\n")
+            events.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+        return events
+
+    def test_raw_upload_streams_chunk_results_in_order(self):
+        content = "".join(f"value_{i} = {i}  # ✓\n" for i in range(40))
+        events = self._events(self.client.post("/summarize/stream?name=big.py", data=content.encode('utf-8'),
+                                               content_type='application/octet-stream'))
+        chunks = [data for event, data in events if event == "chunk"]
+        self.assertGreater(len(chunks), 5)
+        self.assertEqual([chunk["index"] for chunk in chunks], list(range(len(chunks))))
+        self.assertEqual(chunks[0]["offset"], 0)
+        for previous, chunk in zip(chunks, chunks[1:]):
+            self.assertEqual(chunk["offset"], previous["offset"] + previous["length"])
+        self.assertTrue(all(chunk["length"] <= 64 for chunk in chunks))
+        self.assertEqual(events[-1], ("done", {"name": "big.py", "chunks": len(chunks), "bytes": len(content.encode('utf-8')), "errors": 0}))
+
+    def test_multipart_upload(self):
+        data = {"file": (io.BytesIO(b"import os\n" * 20), "module.py")}
+        events = self._events(self.client.post("/verify/stream", data=data, content_type='multipart/form-data'))
+        self.assertTrue(events[0][1]["verification"].startswith("verify of"))
+        self.assertEqual(events[-1][1]["name"], "module.py")
+        self.assertEqual(self.client.post("/verify/stream", data={}, content_type='multipart/form-data').status_code, 400)
+
+    def test_multipart_file_field_is_read_in_pieces(self):
+        content = "".join(f"line {i} ✓\r\n--not-the-boundary\n" for i in range(200)).encode('utf-8')
+        body = (b"--XyZ\r\nContent-Disposition: form-data; name=\"note\"\r\n\r\nskip me\r\n"
+                b"--XyZ\r\nContent-Disposition: form-data; name=\"file\"; filename=\"big.py\"\r\n"
+                b"Content-Type: text/x-python\r\n\r\n" + content + b"\r\n--XyZ--\r\n")
+        with mock.patch.object(uploads, 'read_size', 7):
+            upload = MultipartUpload(io.BytesIO(body), b"XyZ")
+            self.assertTrue(upload.open())
+            self.assertEqual(upload.filename, "big.py")
+            pieces = []
+            while True:
+                piece = upload.read(100)
+                if not piece:
+                    break
+                self.assertLessEqual(len(piece), 100)
+                pieces.append(piece)
+        self.assertEqual(b"".join(pieces), content)
+
+        truncated = MultipartUpload(io.BytesIO(body[:200]), b"XyZ")
+        self.assertTrue(truncated.open())
+        with self.assertRaises(ValueError):
+            while truncated.read(100):
+                pass
+
+    def test_chunk_errors_do_not_end_the_stream(self):
+        content = "a" * 64 + "boom" + "b" * 60 + "c" * 64
+        events = self._events(self.client.post("/corrections/stream", data=content, content_type='text/plain'))
+        self.assertEqual([event for event, _ in events], ["chunk", "error", "chunk", "done"])
+        self.assertEqual(events[1][1]["error"], "RuntimeError: upstream failed")
+        self.assertEqual(events[-1][1]["errors"], 1)
+
+    def test_results_stream_before_the_upload_is_read(self):
+        body = CountingStream(b"x = 1\n" * 2000)
+        response = self.client.post("/summarize/stream", input_stream=body,
+                                    content_type='application/octet-stream', buffered=False)
+        first_event = next(iter(response.response))
+        self.assertIn(b"event: chunk", first_event)
+        # Reading stays at most a window of chunks ahead of the results
+        self.assertLess(body.position, 64 * 4)
+        response.close()
+
+    def test_upload_size_limit(self):
+        with mock.patch.dict(app.config, {"MAX_CONTENT_LENGTH": 100}):
+            response = self.client.post("/summarize/stream", data=b"x" * 200, content_type='application/octet-stream')
+            self.assertEqual(response.status_code, 413)
+
+            # Without a Content-Length the limit is enforced while reading
+            response = self.client.post("/summarize/stream", input_stream=io.BytesIO(b"x" * 200),
+                                        content_type='application/octet-stream',
+                                        environ_overrides={"wsgi.input_terminated": True, "CONTENT_LENGTH": ""})
+            events = self._events(response)
+            self.assertEqual(events[-1][0], "error")
+            self.assertIn("exceeds", events[-1][1]["error"])
+
+if __name__ == "__main__":
+    unittest.main()
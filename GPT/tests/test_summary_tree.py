@@ -0,0 +1,130 @@
+import os
+import zlib
+import tempfile
+import unittest
+from unittest import mock
+import brain.dependency_analysis as dependency_analysis
+import brain.import_graph as import_graph
+import brain.results_store as results_store
+import brain.summary_tree as summary_tree
+import brain.iterative_improvement as iterative_improvement
+from brain.integration_api import app
+from brain.results_store import start_run, query_summaries
+from brain.summary_tree import reduce_summaries, summarize_tree
+
+class TestSummaryTree(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.output_dir = os.path.join(self.test_dir.name, 'output')
+        os.makedirs(self.output_dir)
+        self.summarize = mock.Mock(side_effect=lambda content, usage=None, path=None: f"summary of {len(content)} characters")
+        self.combine = mock.Mock(side_effect=self._combine)
+        self.patches = [
+            mock.patch.multiple(results_store, current_run_id=None, results_db_path=os.path.join(self.output_dir, "results.db")),
+            mock.patch.multiple(dependency_analysis, import_cache=None, import_cache_path=os.path.join(self.output_dir, "import_cache.json")),
+            mock.patch.object(import_graph, 'import_graph_path', os.path.join(self.output_dir, "import_graph.json")),
+            mock.patch.multiple(iterative_improvement, output_dir=self.output_dir, summarize_code=self.summarize,
+                                combine_summaries=self.combine, verify_code=mock.Mock(return_value="Verified"),
+                                get_corrections=mock.Mock(return_value="No corrections.")),
+        ]
+        for patch in self.patches:
+            patch.start()
+        self.project = os.path.join(self.test_dir.name, 'project')
+
+    def tearDown(self):
+        for connection in results_store._local.__dict__.pop('connections', {}).values():
+            connection.close()
+        for patch in self.patches:
+            patch.stop()
+        self.test_dir.cleanup()
+
+    def _combine(self, summaries, kind, usage=None):
+        return f"{kind} of {summaries.count(chr(10) * 2) + 1} {zlib.crc32(summaries.encode('utf-8')):08x}"
+
+    def _write(self, name, content):
+        path = os.path.join(self.project, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def test_only_combinations_with_a_changed_summary_are_requested_again(self):
+        summaries = [f"part {i:02d} " * 5 for i in range(12)]
+        with mock.patch.object(summary_tree, 'reduce_input_chars', 150):
+            first = reduce_summaries(summaries, "file", self.combine)
+            # 12 summaries in groups of 3, then the 4 results at once
+            self.assertEqual(self.combine.call_count, 4 + 1)
+            self.assertTrue(first.startswith("file of 4 "))
+            self.assertEqual(reduce_summaries(summaries, "file", self.combine), first)
+            self.assertEqual(self.combine.call_count, 5)
+
+            summaries[5] = "changed " * 5
+            reduce_summaries(summaries, "file", self.combine)
+        self.assertEqual(self.combine.call_count, 5 + 2)
+
+        self.assertEqual(reduce_summaries(["", "only"], "file", self.combine), "only")
+
+    def test_failed_combinations_keep_their_summaries(self):
+        summaries = [f"part {i:02d} " * 5 for i in range(6)]
+        failing = mock.Mock(side_effect=lambda text, kind: "" if text.startswith("part 03") else self._combine(text, kind))
+        with mock.patch.object(summary_tree, 'reduce_input_chars', 150):
+            with self.assertLogs(level='WARNING') as logs:
+                summary = reduce_summaries(summaries, "file", failing)
+            self.assertIn("Combining 3 file summaries failed", logs.output[0])
+            # The top-level combination received the failed group's summaries
+            self.assertIn(summaries[3], failing.call_args_list[-1][0][0])
+            self.assertTrue(summary.startswith("file of 4 "))
+
+            # Failed combinations are not cached, so they are requested again
+            reduce_summaries(summaries, "file", self.combine)
+        self.assertEqual(self.combine.call_count, 2)
+        self.assertTrue(self.combine.call_args_list[0][0][0].startswith("part 03"))
+
+    def test_directories_and_packages(self):
+        files = {
+            self._write('pkg/__init__.py', ""): "init",
+            self._write('pkg/core.py', ""): "core",
+            self._write('pkg/sub/util.py', ""): "util",
+            self._write('setup.py', ""): "setup",
+        }
+        start_run("run1")
+        directories = summarize_tree(self.project, files, self.combine)
+
+        # A directory with one entry takes its summary
+        self.assertEqual(directories[os.path.join(self.project, 'pkg', 'sub')], "util")
+        self.assertTrue(directories[os.path.join(self.project, 'pkg')].startswith("package of 3 "))
+        self.assertTrue(directories[self.project].startswith("directory of 2 "))
+        self.assertIn("pkg/: package of 3 ", self.combine.call_args_list[-1][0][0])
+        nodes = {node["path"]: node["kind"] for node in query_summaries()}
+        self.assertEqual(nodes[os.path.join(self.project, 'pkg')], "package")
+        self.assertEqual(nodes[os.path.join(self.project, 'setup.py')], "file")
+        self.assertEqual(len(nodes), 7)
+
+    def test_editing_a_function_summarizes_only_its_chunk(self):
+        functions = [f"def function_{i}(value):\n    return value * {i}\n\n\n" for i in range(400)]
+        large = self._write('large.py', "".join(functions))
+        self._write('small.py', "VALUE = 1\n")
+        start_run("run1", root_directory=self.project)
+        iterative_improvement.save_file_list(self.project)
+        chunks = len(results_store.get_result(large, results_store.file_hash(large))["chunks"])
+        self.assertGreater(chunks, 2)
+        self.assertEqual(self.summarize.call_count, chunks + 1)
+        combines = self.combine.call_count
+
+        functions[200] = functions[200].replace("return", "value += 1\n    return")
+        self._write('large.py', "".join(functions))
+        start_run("run2", root_directory=self.project)
+        iterative_improvement.save_file_list(self.project)
+        self.assertEqual(self.summarize.call_count, chunks + 2)
+        # The file summary and the project summary above it
+        self.assertEqual(self.combine.call_count, combines * 2)
+
+        with open(os.path.join(self.output_dir, "summaries.txt")) as f:
+            self.assertTrue(f.read().startswith(f"Directory: {self.project}\nSummary:\ndirectory of 2 "))
+        response = app.test_client().get("/summaries", query_string={"kind": "file", "run_id": "run2"})
+        self.assertEqual([node["path"] for node in response.get_json()["summaries"]],
+                         [large, os.path.join(self.project, 'small.py')])
+
+if __name__ == "__main__":
+    unittest.main()
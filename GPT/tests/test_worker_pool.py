@@ -0,0 +1,92 @@
+import os
+import sys
+import signal
+import unittest
+import torch
+from models.Veronica.worker_pool import VeronicaWorkerPool
+from tests.helpers import tiny_model
+
+# Loaded once by the fork server and shared copy-on-write by the workers
+shared_weights = torch.arange(1000, dtype=torch.float32)
+model = tiny_model(0, 100)
+input_ids = torch.arange(1, 33).unsqueeze(0)
+
+def _describe(content):
+    return os.getpid(), torch.get_num_threads(), float(shared_weights.sum()), content
+
+def _fail(content):
+    raise ValueError(content)
+
+def _forward(content):
+    with torch.no_grad():
+        return float(model(input_ids).logits.sum())
+
+def _crash(content):
+    if content == "crash":
+        os.kill(os.getpid(), signal.SIGKILL)
+    return _describe(content)
+
+@unittest.skipIf(sys.platform == 'win32', "The worker pool requires a fork server")
+class TestVeronicaWorkerPool(unittest.TestCase):
+
+    def setUp(self):
+        self.handlers = {'describe': _describe, 'fail': _fail, 'crash': _crash, 'forward': _forward}
+
+    def test_results_keep_request_order(self):
+        contents = [f"content {i}" for i in range(20)]
+        with VeronicaWorkerPool(num_workers=2, threads_per_worker=1, handlers=self.handlers) as pool:
+            results = pool.map('describe', contents)
+        self.assertEqual([result[3] for result in results], contents)
+
+    def test_workers_share_weights_and_partition_threads(self):
+        with VeronicaWorkerPool(num_workers=2, threads_per_worker=3, handlers=self.handlers) as pool:
+            results = pool.map('describe', ["x"] * 10)
+        self.assertTrue(all(result[0] != os.getpid() for result in results))
+        self.assertTrue(all(result[1] == 3 for result in results))
+        self.assertTrue(all(result[2] == float(shared_weights.sum()) for result in results))
+
+    def test_errors_are_reported_per_request(self):
+        with VeronicaWorkerPool(num_workers=1, threads_per_worker=1, handlers=self.handlers) as pool:
+            failed = pool.submit('fail', "bad input")
+            succeeded = pool.submit('describe', "good input")
+            with self.assertRaises(RuntimeError):
+                failed.result(timeout=30)
+            self.assertEqual(succeeded.result(timeout=30)[3], "good input")
+
+    def test_killed_worker_fails_its_request_and_is_replaced(self):
+        contents = [f"content {i}" for i in range(10)]
+        contents[4] = "crash"
+        with VeronicaWorkerPool(num_workers=2, threads_per_worker=1, handlers=self.handlers) as pool:
+            futures = [pool.submit('crash', content) for content in contents]
+            with self.assertRaisesRegex(RuntimeError, "exited with code -9"):
+                futures[4].result(timeout=30)
+            self.assertEqual([futures[i].result(timeout=30)[3] for i in range(10) if i != 4],
+                             [content for content in contents if content != "crash"])
+            with self.assertRaises(RuntimeError):
+                pool.map('crash', contents)
+            self.assertEqual(len(pool.workers), 2)
+            self.assertEqual(len(pool.map('describe', ["x"] * 4)), 4)
+
+    def test_worker_is_replaced_after_a_forward_pass_in_the_parent(self):
+        # Warm the parent's intra-op thread pool before any worker is forked
+        threads = torch.get_num_threads()
+        torch.set_num_threads(4)
+        try:
+            expected = _forward(None)
+        finally:
+            torch.set_num_threads(threads)
+        with VeronicaWorkerPool(num_workers=2, threads_per_worker=2, handlers=self.handlers) as pool:
+            self.assertEqual(pool.submit('forward', None).result(timeout=60), expected)
+            with self.assertRaises(RuntimeError):
+                pool.submit('crash', "crash").result(timeout=60)
+            futures = [pool.submit('forward', None) for _ in range(6)]
+            self.assertEqual([future.result(timeout=60) for future in futures], [expected] * 6)
+            self.assertEqual(len(pool.workers), 2)
+
+    def test_unknown_operation_is_rejected(self):
+        pool = VeronicaWorkerPool(num_workers=1, threads_per_worker=1, handlers=self.handlers)
+        with self.assertRaises(ValueError):
+            pool.submit('unknown', "content")
+
+if __name__ == '__main__':
+    unittest.main()